@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 
 from util.logger import log_print
 from util.data_manager import DataManager
@@ -10,28 +11,29 @@ router = APIRouter(prefix="/basic", tags=["基本面 Basic"])
 
 @router.get("/score")
 @log_print
-def basic_score(stock_id: str):
+async def basic_score(stock_id: str):
     """
     取得指定股票「基本面」資訊。
     """
-    from services.ai_generate import ask_AI
+    from services.ai_generate import ask_AI_async
     
     try:
-        cached = DataManager.get_stock_score(stock_id, score_type="basic")
+        cached = await run_in_threadpool(DataManager.get_stock_score, stock_id, score_type="basic")
         if cached:
             return JSONResponse(content={"data": cached["data"]})
 
-        _, stock_name = StockList.query(stock_id)
-        data = basic_info(stock_id)
+        _, stock_name = await run_in_threadpool(StockList.query, stock_id)
+        data = await run_in_threadpool(basic_info, stock_id)
         
         payload_data = data.copy()
         # 移除不必要的欄位以簡化輸入給 AI
         for key in ['TotalScore']:
             data.pop(key, None)
         prompt = f"""以下是{stock_name}的基本面資料，請用繁體中文生成100字內快速摘要，去解釋評級:{data}"""
-        data['ai_insight'] = ask_AI(prompt)
+        data['ai_insight'] = await ask_AI_async(prompt)
         payload_data['ai_insight'] = data['ai_insight']
-        DataManager.save_stock_score(
+        await run_in_threadpool(
+            DataManager.save_stock_score,
             stock_id=stock_id,
             data=payload_data,
             score_type="basic",
@@ -1,10 +1,10 @@
 from fastapi import APIRouter
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-import asyncio
+import json
 
-from services.function_tools import ask_AI_Agent
-from util.logger import log_print
+from services.function_tools import ask_AI_Agent, stream_AI_Agent
+from util.logger import log_print, Log, Color
 
 router = APIRouter(prefix="/chat", tags=["AI 聊天 (Chat)"])
 
@@ -15,6 +15,30 @@ class ChatRequest(BaseModel):
 
 @router.post("/chatBot")
 @log_print
-def ask(req: ChatRequest):
-    chat_response = asyncio.run(ask_AI_Agent(req.question, model=req.model.lower(), session_id=req.uuid))
-    return JSONResponse(content={'response': chat_response})
\ No newline at end of file
+async def ask(req: ChatRequest):
+    chat_response = await ask_AI_Agent(req.question, model=req.model.lower(), session_id=req.uuid)
+    return JSONResponse(content={'response': chat_response})
+
+def _sse(event: str, data: dict) -> str:
+    """組成一則 Server-Sent Event。"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/stream")
+@log_print
+async def ask_stream(req: ChatRequest):
+    """
+    以 Server-Sent Events 串流回應：delta (文字片段)、agent、tool_start、tool_end、done、error。
+    """
+    async def event_stream():
+        try:
+            async for item in stream_AI_Agent(req.question, model=req.model.lower(), session_id=req.uuid):
+                yield _sse(item["event"], item["data"])
+        except Exception as e:
+            Log(f"[Chat] 串流錯誤: {e}", color=Color.RED)
+            yield _sse("error", {"message": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,16 +1,21 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 import pandas as pd
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 
 from util.numpy_extension import nan_to_none
+from util.auth import verify_credentials
 from util.logger import log_print
+from util.nowtime import TaiwanTime
 from util.data_manager import DataManager
 from util.stock_list import StockList
 from services.chip_data import get_margin_data, get_chip_data, main_force_all_days
 
 router = APIRouter(prefix="/chip", tags=["籌碼面 Chip"])
 
+MAX_BACKFILL_DAYS = 120     # 手動補齊的天數上限 (每天 4 份報表，避免被上游限流)
+
 @router.get("/chipInfo")
 @log_print
 def chip_info(stock_id: str):
@@ -40,28 +45,29 @@ def chip_info(stock_id: str):
 
 @router.get("/score")
 @log_print
-def chip_score(stock_id: str):
+async def chip_score(stock_id: str):
     """
     取得股票「籌碼面」指標資訊
     """
     from services.chip_data import calculate_chip_indicators
-    from services.ai_generate import ask_AI
+    from services.ai_generate import ask_AI_async
     
     try:
-        cached = DataManager.get_stock_score(stock_id, score_type="chip")
+        cached = await run_in_threadpool(DataManager.get_stock_score, stock_id, score_type="chip")
         if cached:
             return JSONResponse(content={"data": cached["data"]})
 
-        _, stock_name = StockList.query(stock_id)
-        data = calculate_chip_indicators(stock_id)
+        _, stock_name = await run_in_threadpool(StockList.query, stock_id)
+        data = await run_in_threadpool(calculate_chip_indicators, stock_id)
         payload_data = data.copy()
         # 移除不必要的欄位以簡化輸入給 AI
         for key in ['TotalScore', 'accurate', 'Close', 'close_result', 'foreign', 'dealer', 'investor']:
             data.pop(key, None)
         prompt = f"""以下是{stock_name}的籌碼面資料，請用繁體中文生成100字內快速摘要，去解釋評級:{data}"""
-        data['ai_insight'] = ask_AI(prompt)
+        data['ai_insight'] = await ask_AI_async(prompt)
         payload_data['ai_insight'] = data['ai_insight']
-        DataManager.save_stock_score(
+        await run_in_threadpool(
+            DataManager.save_stock_score,
             stock_id=stock_id,
             data=payload_data,
             score_type="chip",
@@ -70,3 +76,30 @@ def chip_score(stock_id: str):
         return JSONResponse(content={"data": payload_data})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/ingestMarket", dependencies=[Depends(verify_credentials)])
+@log_print
+def ingest_market(
+    background_tasks: BackgroundTasks,
+    target_date: str = None,
+    backfill_days: int = Query(0, ge=0, le=MAX_BACKFILL_DAYS),
+):
+    """
+    手動匯入全市場「籌碼面」資料 (三大法人、融資融券) 至本地資料庫。(需 /docs 帳密)
+    只接受已定案 (ChipStore.final_date()，台灣時間 21:00 後為今天) 的日期，避免匯入上游尚未公布的報表。
+    backfill_days > 0 時於背景補齊最近 N 天，立即回應。
+    """
+    from services.chip_ingest import ChipIngestor
+    from util.chip_store import ChipStore
+    try:
+        if backfill_days > 0:
+            background_tasks.add_task(ChipIngestor.backfill, backfill_days)
+            return JSONResponse(status_code=202, content={'status': 'accepted', 'message': f'Backfilling market chip data for {backfill_days} days in the background.'})
+        final = datetime.strptime(ChipStore.final_date(), "%Y-%m-%d").date()
+        day = date.fromisoformat(target_date) if target_date else TaiwanTime.now().date()
+        if day > final:
+            raise ValueError(f"{day.isoformat()} 的籌碼資料尚未定案 (最後定案日期: {final.isoformat()})")
+        result = ChipIngestor.ingest(day)
+        return JSONResponse(content={'status': 'success', 'date': day.isoformat(), 'result': result})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
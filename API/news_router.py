@@ -1,12 +1,15 @@
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 
 from util.logger import log_print
 from util.nowtime import TaiwanTime
 from util.data_manager import DataManager
 from util.stock_list import StockList
 
-from services.news_data import stock_news_split_word, news_summary
+from services.news_data import stock_news_split_word, news_summary, search_news
 
 router = APIRouter(prefix="/news", tags=["新聞資料 News"])
 
@@ -25,30 +28,51 @@ def get_all_news_summary(stock_id: str, page: int = 1):
     """
     取得指定股票「新聞」資料的摘要。
     """
-    news_summary_df = news_summary(stock_id, page=page)
+    news_summary_df, sources = news_summary(stock_id, page=page)
     result = news_summary_df.to_dict(orient='records')
-    return JSONResponse(content={'news': result, 'updateTime': TaiwanTime.string()})
+    return JSONResponse(content={'news': result, 'sources': sources, 'updateTime': TaiwanTime.string()})
+
+@router.get("/search")
+@log_print
+def search_cached_news(query: str, start: Optional[str] = None, end: Optional[str] = None, limit: int = 10):
+    """
+    搜尋已收錄的「新聞」 (BM25 全文檢索，可依日期 YYYY-MM-DD 篩選)。
+    """
+    try:
+        result_df = search_news(query, start=start, end=end, limit=limit)
+        return JSONResponse(content={'news': result_df.to_dict(orient='records'), 'updateTime': TaiwanTime.string()})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/score")
 @log_print
-def news_score(stock_id: str):
+async def news_score(stock_id: str):
     """
     取得指定股票「新聞」資料的情感分數。
+    分數直接讀取滾動平均 (每 NEWS_REFRESH_MINUTES 分鐘檢查最新新聞)，
+    只有計入的新聞有變動時才重新產生 AI 摘要，否則沿用已儲存的 ai_insight。
     """
     from services.news_sentiment import total_news_sentiment
-    from services.ai_generate import ask_AI
+    from services.ai_generate import ask_AI_async
     try:
-        _, stock_name = StockList.query(stock_id)
-        sentiment_scores = total_news_sentiment(stock_id, page=1)
-        contents = sentiment_scores.get("contents", [])
-        sentiment_scores.pop("contents", None)
+        sentiment_scores = await run_in_threadpool(total_news_sentiment, stock_id, page=1)
+        contents = sentiment_scores.pop("contents", [])
+
+        cached = await run_in_threadpool(DataManager.get_stock_score, stock_id, score_type="news")
+        cached_data = cached["data"] if cached else None
+        if cached_data and (cached_data.get("count"), cached_data.get("latest")) == (sentiment_scores["count"], sentiment_scores["latest"]):
+            sentiment_scores["ai_insight"] = cached_data.get("ai_insight")
+            return JSONResponse(content={"data": sentiment_scores})
+
+        _, stock_name = await run_in_threadpool(StockList.query, stock_id)
         ai_insight = None
         if contents:
             prompt = f"以下是{stock_name}近期新聞內文，請用繁體中文生成100字內快速摘要，不要重述原文，不描述基本面資訊，聚焦重點：\n{contents}"
-            ai_insight = ask_AI(prompt)
+            ai_insight = await ask_AI_async(prompt)
             sentiment_scores["ai_insight"] = ai_insight
 
-        DataManager.save_stock_score(
+        await run_in_threadpool(
+            DataManager.save_stock_score,
             stock_id=stock_id,
             data=sentiment_scores,
             score_type="news",
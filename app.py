@@ -1,17 +1,14 @@
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from fastapi.security import HTTPBasicCredentials
 from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
 from fastapi.openapi.utils import get_openapi
 from util.config import Env  # 確保環境變數被載入
-import secrets
+from util.auth import verify_credentials
 
 from API import basic_router, chip_router, chat_router, news_router, predict_router, stock_router, tech_router
 
-# 初始化 HTTPBasic 認證
-security = HTTPBasic()
-
 app = FastAPI(
     title="ProfiqAI API",
     description="[投資智聊 AI] - API docs",
@@ -20,22 +17,6 @@ app = FastAPI(
     openapi_url=None  # 停用預設的 openapi.json
 )
 
-# 從環境變數讀取 /docs 帳密
-DOCS_USERNAME = Env.DOCS_USERNAME
-DOCS_PASSWORD = Env.DOCS_PASSWORD
-
-# 驗證函數
-def verify_credentials(credentials: HTTPBasicCredentials = Depends(security)):
-    correct_username = secrets.compare_digest(credentials.username, DOCS_USERNAME)
-    correct_password = secrets.compare_digest(credentials.password, DOCS_PASSWORD)
-    if not (correct_username and correct_password):
-        raise HTTPException(
-            status_code=401,
-            detail="無效的憑證",
-            headers={"WWW-Authenticate": "Basic"},
-        )
-    return credentials
-
 # 受保護的 OpenAPI schema
 @app.get("/openapi.json", include_in_schema=False)
 async def get_open_api_endpoint(credentials: HTTPBasicCredentials = Depends(verify_credentials)):
@@ -77,6 +58,22 @@ app.include_router(tech_router.router)
 app.include_router(predict_router.router)
 app.include_router(chat_router.router)
 
+@app.on_event("startup")
+def start_background_jobs():
+    """啟動背景工作 (斷詞字典預載與新聞索引補建、全市場籌碼匯入)"""
+    import threading
+    from services.tokenizer import Tokenizer
+    from services.news_data import backfill_news_index
+
+    def prepare_news():
+        Tokenizer.load()
+        backfill_news_index()
+
+    threading.Thread(target=prepare_news, name="NewsPrepare", daemon=True).start()
+    if Env.CHIP_INGEST_ENABLE:
+        from services.chip_ingest import ChipIngestor
+        ChipIngestor.start_scheduler()
+
 @app.get("/")
 def root():
     """根路由"""
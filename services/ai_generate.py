@@ -1,17 +1,65 @@
-from openai import OpenAI
+import asyncio
+import hashlib
+import re
+
+from openai import AsyncOpenAI
 
 from util.config import Env
+from util.ttl_cache import TTLCache
+
+AI_MODEL = "gpt-4.1-mini"
+AI_SYSTEM_PROMPT = "你是一名台灣股票分析師。請摘要並簡潔分析。(約100字)"
+AI_MAX_CONCURRENCY = 8      # 同時進行的 LLM 請求上限
+
+ai_async = AsyncOpenAI(api_key=Env.OPENAI_API_KEY, base_url=Env.OPENAI_BASE_URL or None)     # 共用連線池
+ai_cache = TTLCache(maxsize=1024, ttl=12 * 3600)        # (模型, 正規化 prompt) 雜湊 → 回應
+_ai_semaphore = None
+_ai_inflight: dict = {}     # 進行中的相同請求共用同一個結果
+
+
+def _cache_key(question: str, model: str) -> str:
+    """以模型 + 正規化 (去除多餘空白) 後的 prompt 計算快取鍵。"""
+    normalized = re.sub(r"\s+", " ", question).strip()
+    return hashlib.sha256(f"{model}\n{normalized}".encode("utf-8")).hexdigest()
+
+def _messages(question: str) -> list:
+    return [
+        {"role": "system", "content": AI_SYSTEM_PROMPT},
+        {"role": "user", "content": question}
+    ]
+
+async def _request_AI(question: str, model: str) -> str:
+    global _ai_semaphore
+    if _ai_semaphore is None:
+        _ai_semaphore = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+    async with _ai_semaphore:
+        response = await ai_async.chat.completions.create(
+            model=model,
+            messages=_messages(question),
+            max_completion_tokens=10000,
+        )
+    return response.choices[0].message.content
+
+async def ask_AI_async(question: str, model: str = AI_MODEL) -> str:
+    """
+    非同步詢問 AI 並取得摘要。
+    相同 (模型, prompt) 的回應快取 12 小時，同時進行的相同請求只會呼叫一次 LLM。
+    Args:
+        question (str): 提示內容
+        model (str): 模型名稱
+    Returns:
+        str: AI 回應文字
+    """
+    key = _cache_key(question, model)
+    cached = ai_cache.get(key)
+    if cached is not None:
+        return cached
 
-ai = OpenAI(api_key=Env.OPENAI_API_KEY)
-
-def ask_AI(question: str) -> str:
-    response = ai.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=[
-            {"role": "system", "content": "你是一名台灣股票分析師。請摘要並簡潔分析。(約100字)"},
-            {"role": "user", "content": question}
-        ],
-        max_completion_tokens=10000,
-    )
-    text = response.choices[0].message.content
-    return text
\ No newline at end of file
+    task = _ai_inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_request_AI(question, model))
+        _ai_inflight[key] = task
+        task.add_done_callback(lambda _: _ai_inflight.pop(key, None))
+    text = await asyncio.shield(task)
+    ai_cache.set(key, text)
+    return text
@@ -0,0 +1,134 @@
+"""
+聊天快速回覆
+常見的簡單問題 (例如「台積電現在技術面如何」、「鴻海基本面評級」) 只需要單一股票的面向評分，
+若當日分數已計算過 (DataManager 有快取)，直接以分數與 ai_insight 回覆，不進入 FinAgent 的多輪工具呼叫。
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from util.data_manager import DataManager
+from util.logger import Log, Color
+from util.stock_list import StockList
+
+# 面向 → 觸發關鍵字
+ASPECT_KEYWORDS = {
+    "tech": ("技術面", "技術分析", "技術指標", "技術評級"),
+    "basic": ("基本面", "財務面", "財報評級", "基本評級"),
+    "chip": ("籌碼面", "籌碼", "法人動向"),
+    "news": ("新聞面", "消息面", "新聞情緒", "市場情緒"),
+}
+ASPECT_NAMES = {"tech": "技術面", "basic": "基本面", "chip": "籌碼面", "news": "新聞面"}
+
+# 出現以下字詞代表需要進一步分析或建議，交給 FinAgent
+COMPLEX_KEYWORDS = ("比較", "為什麼", "為何", "預測", "建議", "買", "賣", "目標價", "價位", "走勢", "歷史", "過去", "上週", "上個月", "去年", "原因")
+QUICK_MAX_CHARS = 40
+
+_CODE_PATTERN = re.compile(r"(?<![0-9A-Za-z])(\d{4,6}[A-Za-z]?)(?![0-9A-Za-z])")
+_name_index: Tuple[Optional[int], Dict[str, Tuple[str, str]], List[str]] = (None, {}, [])
+
+
+@dataclass
+class ChatIntent:
+    """簡單問題的意圖：單一股票 + 查詢的面向"""
+    stock_id: str
+    stock_name: str
+    aspects: List[str]
+
+
+def _stock_index() -> Tuple[Dict[str, Tuple[str, str]], List[str]]:
+    """
+    股票清單索引 (StockList 重新下載時自動重建)。
+    Returns:
+        tuple: ({代號或簡稱: (stock_id, stock_name)}, 由長到短排序的簡稱)
+    """
+    global _name_index
+    version = StockList.version()
+    if _name_index[0] != version:
+        df = StockList.get_all()
+        lookup = {}
+        for stock_id, stock_name in zip(df["stock_id"], df["stock_name"]):
+            lookup[stock_id.split(".")[0].upper()] = (stock_id, stock_name)
+            lookup[stock_name] = (stock_id, stock_name)
+        names = sorted((name for name in df["stock_name"] if len(name) >= 2), key=len, reverse=True)
+        _name_index = (version, lookup, names)
+    return _name_index[1], _name_index[2]
+
+
+def match_stocks(question: str) -> List[Tuple[str, str]]:
+    """
+    找出問題中提到的股票 (代號或簡稱，簡稱以最長者優先，避免「中華」誤判「中華電」)。
+    Returns:
+        list: [(stock_id, stock_name), ...] 不重複
+    """
+    lookup, names = _stock_index()
+    found = {}
+    for code in _CODE_PATTERN.findall(question):
+        stock = lookup.get(code.upper())
+        if stock:
+            found[stock[0]] = stock
+
+    remaining = question
+    for name in names:
+        if name in remaining:
+            stock = lookup[name]
+            found[stock[0]] = stock
+            remaining = remaining.replace(name, " ")
+    return list(found.values())
+
+
+def detect_intent(question: str) -> Optional[ChatIntent]:
+    """
+    判斷是否為可直接以評分回答的簡單問題 (單一股票、明確指定面向、不需進一步分析)。
+    Args:
+        question (str): 使用者的問題
+    Returns:
+        ChatIntent: 簡單問題的意圖，否則回傳 None
+    """
+    question = question.strip()
+    if not question or len(question) > QUICK_MAX_CHARS or any(k in question for k in COMPLEX_KEYWORDS):
+        return None
+    aspects = [aspect for aspect, keywords in ASPECT_KEYWORDS.items() if any(k in question for k in keywords)]
+    if not aspects:
+        return None
+    stocks = match_stocks(question)
+    if len(stocks) != 1:
+        return None
+    stock_id, stock_name = stocks[0]
+    return ChatIntent(stock_id=stock_id, stock_name=stock_name, aspects=aspects)
+
+
+def _format_score(stock_name: str, aspect: str, data: dict) -> str:
+    score = data.get("TotalScore")
+    header = f"**{stock_name} {ASPECT_NAMES[aspect]}：{data.get('direction_label', '無資料')}**"
+    if isinstance(score, (int, float)):
+        header += f" (評分 {round(score, 2):g})"
+    insight = data.get("ai_insight")
+    return f"{header}\n{insight}" if insight else header
+
+
+def quick_answer(question: str) -> Optional[str]:
+    """
+    以已計算的面向評分直接回答簡單問題 (阻塞函數，會查詢 DataManager)。
+    Args:
+        question (str): 使用者的問題
+    Returns:
+        str: 回覆內容；非簡單問題或任一面向尚無當日分數時回傳 None (交給 FinAgent)
+    """
+    intent = detect_intent(question)
+    if intent is None:
+        return None
+
+    sections = []
+    for aspect in intent.aspects:
+        cached = DataManager.get_stock_score(intent.stock_id, score_type=aspect)
+        if not cached or not cached.get("data"):
+            return None
+        sections.append((cached.get("date"), _format_score(intent.stock_name, aspect, cached["data"])))
+
+    dates = sorted({date for date, _ in sections if date})
+    text = "\n\n".join(section for _, section in sections)
+    if dates:
+        text += f"\n\n(資料日期：{'、'.join(dates)}；如需股價走勢或操作建議，請進一步詢問)"
+    Log(f"[Chat] 快速回覆 {intent.stock_id} {','.join(intent.aspects)}", color=Color.GREEN, reload_only=True)
+    return text
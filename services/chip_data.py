@@ -1,29 +1,72 @@
 import pandas as pd
 import cloudscraper
 import numpy as np
+import threading
+from collections import OrderedDict
 from datetime import date, timedelta, datetime
+from typing import Optional
 from bs4 import BeautifulSoup as bs
 
 from util.logger import Log, Color
 from util.nowtime import TaiwanTime
 from util.supabase_client import supabase
 from util.stock_list import StockList
+from util.chip_store import ChipStore
+from util.rule_engine import RuleSet, ScoreRule, TierRule, ValueRule, LabelRule
 
 scraper = cloudscraper.create_scraper()   # 防檔爬蟲用
 
-def get_chip_data(symbol: str, start: str, end: str=TaiwanTime.string(time=False)) -> pd.DataFrame:
+CHIP_COLUMNS = ["外資", "投信", "自營商", "三大法人合計"]
+MARGIN_COLUMNS = ['融資買進','融資賣出','融資現償','融資餘額','融資增減','融資限額','融資使用率%','融券賣出','融券買進','融券券償','融券餘額','融券增減','融券券資比%','資券相抵']
+
+def _load_with_store(kind: str, symbol: str, start: str, end: str, fetcher) -> pd.DataFrame:
     """
-    用於取得最新籌碼面資料。
+    先查本地 ChipStore，只向上游爬取尚未查詢過的日期區間，再從本地讀回完整區間。
+    Args:
+        kind (str): "chip" / "margin"
+        symbol (str): 股票代號 (不含後綴)
+        fetcher: 爬取函數 fetcher(symbol, start, end) -> DataFrame
+    """
+    for range_start, range_end in ChipStore.missing_ranges(kind, symbol, start, end):
+        try:
+            fetched = fetcher(symbol, range_start, range_end)
+        except Exception as e:
+            Log(f"[ChipStore] {symbol} {kind} {range_start}~{range_end} 爬取失敗: {e}", color=Color.RED)
+            continue
+        ChipStore.save(kind, symbol, fetched)
+        ChipStore.mark_covered(kind, symbol, range_start, range_end)
+        Log(f"[ChipStore] {symbol} {kind} 補齊 {range_start}~{range_end} 共 {len(fetched)} 筆", color=Color.ORANGE, reload_only=True)
+    return ChipStore.load(kind, symbol, start, end)
+
+def get_chip_data(symbol: str, start: str, end: Optional[str] = None) -> pd.DataFrame:
+    """
+    用於取得最新籌碼面資料。 (優先使用本地 ChipStore)
     """
     if symbol in ("^TWII", "^TWOII"):
         Log(f"[三大法人] 指數類不提供資料", color=Color.YELLOW)
         return pd.DataFrame()
     symbol = symbol.split(".")[0]  # 去除後綴
+    end = end or TaiwanTime.string(time=False)
+    return _load_with_store("chip", symbol, start, end, _fetch_chip_data).reindex(columns=CHIP_COLUMNS)
+
+def get_margin_data(symbol: str, start: str, end: Optional[str] = None, select_columns=None) -> pd.DataFrame:
+    """
+    用於取得最新融資融券資料。 (優先使用本地 ChipStore)
+    """
+    symbol = symbol.split(".")[0]  # 去除後綴
+    end = end or TaiwanTime.string(time=False)
+    select_columns = select_columns if select_columns else ['融資增減', '融券增減', '融券券資比%']
+    return _load_with_store("margin", symbol, start, end, _fetch_margin_data).reindex(columns=select_columns)
+
+def _fetch_chip_data(symbol: str, start: str, end: str) -> pd.DataFrame:
+    """
+    get_chip_data() 調用的輔助函數：爬取富邦三大法人資料。
+    """
     url = f"https://fubon-ebrokerdj.fbs.com.tw/z/zc/zcl/zcl.djhtm?a={symbol}&c={start}&d={end}"
     scraper = cloudscraper.create_scraper()  # 使用 cloudscraper 爬取
     web = scraper.get(url).text
     bs_table = bs(web, "html.parser").find("table", class_="t01").find_all("tr")[7:-1]  # 跳過前7行和最後一行
-    col = ["外資", "投信", "自營商", "三大法人合計"]
+    col = CHIP_COLUMNS
     data = []
     date_index = []
     for i in bs_table[::-1]: # 反向遍歷，因為最新的資料在最後一行
@@ -43,17 +86,16 @@ def get_chip_data(symbol: str, start: str, end: str=TaiwanTime.string(time=False
     df = pd.DataFrame(data, columns=col, index=date_index)
     return df
 
-def get_margin_data(symbol: str, start: str, end: str=TaiwanTime.string(time=False), select_columns=None) -> pd.DataFrame:
+def _fetch_margin_data(symbol: str, start: str, end: str) -> pd.DataFrame:
     """
-    用於取得最新融資融券資料。
+    get_margin_data() 調用的輔助函數：爬取富邦融資融券資料 (全部欄位)。
     """
     # 取得網頁內容
-    symbol = symbol.split(".")[0]  # 去除後綴
     url = f'https://fubon-ebrokerdj.fbs.com.tw/z/zc/zcn/zcn.djhtm?a={symbol}&c={start}&d={end}'
     scraper = cloudscraper.create_scraper()  # 使用 cloudscraper 爬取
     web = scraper.get(url).text  # 開啟網站
     bs_table = bs(web, "html.parser").find("table", class_="t01").find_all("tr")[7:-1]  # 跳過前7行和最後一行
-    col = ['融資買進','融資賣出','融資現償','融資餘額','融資增減','融資限額','融資使用率%','融券賣出','融券買進','融券券償','融券餘額','融券增減','融券券資比%','資券相抵']
+    col = MARGIN_COLUMNS
 
     def parseNum(text):
             text = text.replace(',', '').replace('%', '')
@@ -79,42 +121,84 @@ def get_margin_data(symbol: str, start: str, end: str=TaiwanTime.string(time=Fal
         # 處理日期
         date_str = f"{int(date[0])+1911}-{date[1]}-{date[2]}"
         date_index.append(date_str)
-    select_columns = select_columns if select_columns else ['融資增減', '融券增減', '融券券資比%']
-    df = pd.DataFrame(data, columns=col, index=date_index)[select_columns]
+    df = pd.DataFrame(data, columns=col, index=date_index)
     return df
 
+class MainForceCache:
+    """
+    主力買賣超的程序內快取 (依股票 LRU，最多 MAX_STOCKS 檔)。
+    每檔股票記錄已向 Supabase 查詢過的起始日 since 與 {date: mainForce}，
+    之後的請求若起始日 >= since 即可完全略過資料庫查詢。
+    """
+    MAX_STOCKS = 256
+    _entries: "OrderedDict[str, dict]" = OrderedDict()
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, stock_id: str) -> Optional[dict]:
+        with cls._lock:
+            entry = cls._entries.get(stock_id)
+            if entry is not None:
+                cls._entries.move_to_end(stock_id)
+            return entry
+
+    @classmethod
+    def merge(cls, stock_id: str, since: str, values: dict) -> dict:
+        """合併查詢結果 (原地更新)，回傳該股票的快取項目。"""
+        with cls._lock:
+            entry = cls._entries.get(stock_id)
+            if entry is None:
+                entry = cls._entries[stock_id] = {"since": since, "values": {}}
+            entry["since"] = min(entry["since"], since)
+            entry["values"].update(values)
+            cls._entries.move_to_end(stock_id)
+            while len(cls._entries) > cls.MAX_STOCKS:
+                cls._entries.popitem(last=False)
+            return entry
+
+def _query_main_force(stock_id: str, start: str, before: Optional[str] = None) -> dict:
+    """從 Supabase 取得 [start, before) 的主力資料，回傳 {date: mainForce}。"""
+    query = (
+        supabase.table("stockMainForceData")
+        .select("date, mainForce")
+        .eq("stock_id", stock_id)
+        .gte("date", start)   # 日期 >= 起始日
+    )
+    if before:
+        query = query.lt("date", before)
+    sql_response = query.order("date").execute()
+    if len(sql_response.data):
+        Log(f"[主力] {stock_id} supabase 已存在！", color=Color.ORANGE, reload_only=True)
+    return {str(row["date"])[:10]: row["mainForce"] for row in sql_response.data}
+
 def main_force_all_days(stock_id, date_list):
     """
-    爬取主力所有資料
+    爬取主力所有資料 (優先使用程序內快取 → Supabase → 爬蟲)
     Args:
         stock_id(str): 股票代號
         date_list(list): 日期列表 ex. ['2024-05-10', '2024-05-11']
     """
     stock_id = stock_id.split('.')[0]  # 去除可能的後綴
+    if len(date_list) == 0:
+        return pd.DataFrame(columns=["主力買賣超"])
+    date_keys = [str(date)[:10] for date in date_list]
     main_force_list = []
-    # 從 Supabase 獲取已存在的主力資料
-    sql_response = (
-        supabase.table("stockMainForceData")
-        .select("date, mainForce")
-        .eq("stock_id", stock_id)
-        .gte("date", date_list[0])   # 日期 >= 起始日
-        .order("date")
-        .execute()
-    )
-    sql_df = None
     sql_preupload = []
 
-    if len(sql_response.data):
-        Log(f"[主力] {stock_id} supabase 已存在！", color=Color.ORANGE, reload_only=True)
-        sql_df = pd.DataFrame(sql_response.data).set_index("date")
-        sql_df.index = pd.to_datetime(sql_df.index)
+    # 快取未涵蓋起始日時，才向 Supabase 查詢缺少的區間
+    entry = MainForceCache.get(stock_id)
+    start = min(date_keys)
+    if entry is None or start < entry["since"]:
+        before = entry["since"] if entry is not None else None
+        entry = MainForceCache.merge(stock_id, start, _query_main_force(stock_id, start, before))
+    known = entry["values"]
 
-    for date in date_list:
-        Log(f"[主力] 資料截取中：{date}", end="\r", reload_only=True)
-        # 檢查 Supabase 是否已有資料
-        if (sql_df is not None) and (date in sql_df.index):
-            main_force_list.append(sql_df.loc[date, "mainForce"])
+    for date in date_keys:
+        # 檢查快取是否已有資料
+        if date in known:
+            main_force_list.append(known[date])
             continue
+        Log(f"[主力] 資料截取中：{date}", end="\r", reload_only=True)
         
         result = None
         while result is None:
@@ -125,18 +209,21 @@ def main_force_all_days(stock_id, date_list):
             continue  # 如果沒有資料，不存入資料庫
         sql_preupload.append({
             "stock_id": stock_id,
-            "date": str(date),
+            "date": date,
             "mainForce": result[0] - result[1]
         })
 
+    # 新爬取的資料直接併入快取
+    if len(sql_preupload):
+        MainForceCache.merge(stock_id, start, {row["date"]: row["mainForce"] for row in sql_preupload})
+
     # 儲存到 Supabase
     if len(sql_preupload):
         Log(f"[主力] 儲存主力資料中...{' '*20}", end="\r", reload_only=True)
-        response = (
-            supabase.table("stockMainForceData")
-            .insert(sql_preupload)
-            .execute()
-        )
+        try:
+            supabase.table("stockMainForceData").insert(sql_preupload).execute()
+        except Exception as e:
+            Log(f"[主力] 儲存主力資料失敗: {e}", color=Color.RED)
 
     main_force_df = pd.DataFrame(main_force_list, columns=["主力買賣超"], index=date_list)
     
@@ -161,17 +248,70 @@ def main_force_one_day(stock_id, date):
         Log(f" \n[主力] {date} 發生錯誤：{e}", color=Color.RED)
         return None
 
+STREAK_COLUMNS = ['外資連續買賣', '投信連續買賣', '自營連續買賣', '主力連續買賣']
+
 #定義計算連續買賣超狀態
-def calculate_consecutive_status(column):
-    result = []
-    last_status = None
-    count = 0
-    for num in column:
-        status = 1 if num >= 0 else -1
-        count = count + 1 if status == last_status else 1
-        last_status = status
-        result.append(status*count)
-    return result
+def calculate_consecutive_status(values) -> np.ndarray:
+    """
+    計算連續買賣超天數 (正數: 連續買超、負數: 連續賣超)。
+    支援 1-D (天數) 或 2-D (股票 × 天數) 陣列，沿最後一軸以累積最大值求出每段起點。
+    """
+    values = np.asarray(values, dtype=float)
+    status = np.where(values >= 0, 1, -1)
+    days = status.shape[-1]
+    if days == 0:
+        return status
+    index = np.broadcast_to(np.arange(days), status.shape)
+    run_start = np.ones(status.shape, dtype=bool)
+    run_start[..., 1:] = status[..., 1:] != status[..., :-1]
+    start_index = np.maximum.accumulate(np.where(run_start, index, 0), axis=-1)
+    return status * (index - start_index + 1)
+
+def score_streaks(streaks, threshold: int = 3) -> np.ndarray:
+    """連續買超 threshold 天以上 +1，連續賣超 threshold 天以上 -1，其餘 0。"""
+    streaks = np.asarray(streaks)
+    return np.select([streaks >= threshold, streaks <= -threshold], [1, -1], default=0)
+
+CHIP_RULES = RuleSet(
+    score_rules=[
+        # 1. 單日買賣超
+        ScoreRule('TotalScore', lambda c: c['外資'] > 0, 1, -1),
+        ScoreRule('TotalScore', lambda c: c['投信'] > 0, 1, -1),
+        ScoreRule('TotalScore', lambda c: c['自營商'] > 0, 1, -1),
+        ScoreRule('TotalScore', lambda c: c['三大法人合計'] > 0, 1, -2),
+        ScoreRule('TotalScore', lambda c: c['主力買賣超'] > 0, 1, -1),
+        # 2. 連續買賣天數 (四類法人一次計算)
+        ValueRule('TotalScore', lambda c: score_streaks(np.vstack([c[col] for col in STREAK_COLUMNS])).sum(axis=0)),
+        # 3. 持股佔比
+        TierRule('TotalScore', [(lambda c: c['外資佔比'] > 0.15, 1), (lambda c: c['外資佔比'] >= 0.05, 0.5)]),
+        TierRule('TotalScore', [(lambda c: c['投信佔比'] > 0.1, 1), (lambda c: c['投信佔比'] >= 0.05, 0.5)]),
+        ScoreRule('TotalScore', lambda c: c['自營商佔比'] > 0.04, 1),
+        TierRule('TotalScore', [(lambda c: c['主力買賣超佔比'] > 0.12, 1), (lambda c: c['主力買賣超佔比'] >= 0.07, 0.5)]),
+        # 4. 融資券
+        TierRule('TotalScore', [
+            (lambda c: c['融資變動比'] > 0.05, -0.5),
+            (lambda c: c['融資變動比'] > 0.02, 1),
+            (lambda c: c['融資變動比'] < -0.05, -1),
+            (lambda c: c['融資變動比'] < -0.02, 0.5),
+        ]),
+        TierRule('TotalScore', [
+            (lambda c: c['融券變動比'] > 0.05, -1),
+            (lambda c: c['融券變動比'] > 0.02, 0.5),
+            (lambda c: c['融券變動比'] < -0.05, -0.5),
+            (lambda c: c['融券變動比'] < -0.02, 1),
+        ]),
+        ScoreRule('TotalScore', lambda c: c['融資增減'] > 0, 1, -1),
+        ScoreRule('TotalScore', lambda c: c['融券增減'] > 0, -1, 1),
+        TierRule('TotalScore', [(lambda c: c['融券券資比%'] < 12, 1), (lambda c: c['融券券資比%'] <= 20, 0.5)], default=-1),
+        ScoreRule('TotalScore', lambda c: (c['融資增減'] > 0) & (c['融券增減'] < 0), 1),
+        ScoreRule('TotalScore', lambda c: (c['融券增減'] > 0) & (c['融資增減'] < 0), -1),
+    ],
+    label_rules=[
+        # 評級標籤
+        LabelRule('direction', 'TotalScore', [-np.inf, -3, 1, 6, np.inf], [-2, -1, 1, 2]),
+        LabelRule('direction_label', 'TotalScore', [-np.inf, -3, 1, 6, np.inf], ['極空', '偏空', '偏多', '極多']),
+    ],
+)
 
 def calculate_chip_indicators(stock_id: str):
     from services.stock_data import getStockPrice
@@ -183,10 +323,9 @@ def calculate_chip_indicators(stock_id: str):
     margin_data = get_margin_data(stock_id, start_date, select_columns=['融資增減', '融資餘額', '融券增減', '融券餘額', '融券券資比%'])
     df = pd.concat([stock_data, main_force_data, margin_data], axis=1, join='inner')
 
-    df['外資連續買賣'] = calculate_consecutive_status(df['外資'])
-    df['投信連續買賣'] = calculate_consecutive_status(df['投信'])
-    df['自營連續買賣'] = calculate_consecutive_status(df['自營商'])
-    df['主力連續買賣'] = calculate_consecutive_status(df['主力買賣超'])
+    # 四類法人一次計算 (股票 × 天數 的矩陣運算，轉置回天數 × 欄位)
+    streaks = calculate_consecutive_status(df[['外資', '投信', '自營商', '主力買賣超']].to_numpy(dtype=float).T)
+    df[STREAK_COLUMNS] = streaks.T
 
     # 求出佔比
     df['外資佔比'] = (df['外資'].abs() / df['Volume']).round(4)
@@ -194,63 +333,18 @@ def calculate_chip_indicators(stock_id: str):
     df['自營商佔比'] = (df['自營商'].abs() / df['Volume']).round(4)
     df['主力買賣超佔比'] = (df['主力買賣超'].abs() / df['Volume']).round(4)
 
-    df['TotalScore'] = 0
-    
-    # 1. 單日買賣超
-    df['TotalScore'] += np.where(df['外資'] > 0, 1, -1)
-    df['TotalScore'] += np.where(df['投信'] > 0, 1, -1)
-    df['TotalScore'] += np.where(df['自營商'] > 0, 1, -1)
-    df['TotalScore'] += np.where(df['三大法人合計'] > 0, 1, -2)
-    df['TotalScore'] += np.where(df['主力買賣超'] > 0, 1, -1)
-    
-    # 2. 連續買賣天數
-    def score_streak(x):
-        if x >= 3: return 1
-        elif x <= -3: return -1
-        else: return 0
-    cols = ['外資連續買賣','投信連續買賣','自營連續買賣','主力連續買賣']
-    df['TotalScore'] += df[cols].map(score_streak).sum(axis=1)
-    
-    # 3. 持股佔比
-    df['TotalScore'] += np.where(df['外資佔比'] > 0.15, 1,
-                        np.where(df['外資佔比'] >= 0.05, 0.5, 0))
-    df['TotalScore'] += np.where(df['投信佔比'] > 0.1, 1,
-                        np.where(df['投信佔比'] >= 0.05, 0.5, 0))
-    df['TotalScore'] += np.where(df['自營商佔比'] > 0.04, 1, 0)
-    df['TotalScore'] += np.where(df['主力買賣超佔比'] > 0.12, 1,
-                        np.where(df['主力買賣超佔比'] >= 0.07, 0.5, 0))
-    
-    # 4. 融資券
+    # 融資券變動比
     df['融資變動比'] = (df['融資增減'] / df['融資餘額']).round(4)
     df['融券變動比'] = (df['融券增減'] / df['融券餘額']).round(4)
     df[['融資變動比', '融券變動比']] = (df[['融資變動比', '融券變動比']].replace([np.inf, -np.inf], np.nan).fillna(0)) # 避免除以0導致-np.inf
-    
-    df['TotalScore'] += np.where(df['融資變動比'] > 0.05, -0.5,
-                        np.where(df['融資變動比'] > 0.02, 1,
-                        np.where(df['融資變動比'] < -0.05,  -1,
-                        np.where(df['融資變動比'] < -0.02,  0.5, 0))))
-    df['TotalScore'] += np.where(df['融券變動比'] > 0.05,  -1,
-                        np.where(df['融券變動比'] > 0.02,  0.5,
-                        np.where(df['融券變動比'] < -0.05, -0.5,
-                        np.where(df['融券變動比'] < -0.02, 1, 0))))
 
-    df['TotalScore'] += np.where(df['融資增減'] > 0, 1, -1)
-    df['TotalScore'] += np.where(df['融券增減'] > 0, -1, 1)
-
-    df['TotalScore'] += np.where(df['融券券資比%'] < 12, 1,
-                        np.where(df['融券券資比%'] <= 20, 0.5, -1))
-
-    df['TotalScore'] += np.where((df['融資增減'] > 0) & (df['融券增減'] < 0), 1, 0)
-    df['TotalScore'] += np.where((df['融券增減'] > 0) & (df['融資增減'] < 0), -1, 0)
+    # 依規則表計算總分與評級標籤
+    df = pd.concat([df, CHIP_RULES.evaluate(df)], axis=1)
     
     df['close_result'] = (df['Close']>df['Close'].shift(1)).astype(int)
     df['accurate'] = ( (df['TotalScore'] > 0).astype(int) == df['close_result'].shift(-1) ).astype(int)
     df.drop(columns=['Open', 'High', 'Low','Volume'], errors='ignore', inplace=True)
     
-    # 評級標籤
-    df['direction'] = pd.cut(df['TotalScore'], bins=[-np.inf, -3, 1, 6, np.inf], labels=[-2, -1, 1, 2]).astype(int)
-    df['direction_label'] = pd.cut(df['TotalScore'], bins=[-np.inf, -3, 1, 6, np.inf], labels=['極空', '偏空', '偏多', '極多'])
-    
     df = df.iloc[::-1]
     latestdata_dict = df.iloc[0].to_dict()      # 取最新一筆資料轉成字典
     latestdata_dict['date'] = str(df.index[0])  # 加入日期
@@ -0,0 +1,267 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from util.logger import Log, Color
+from util.chip_store import ChipStore
+
+# 上游每日全市場報表 (JSON)
+TWSE_CHIP_URL = "https://www.twse.com.tw/rwd/zh/fund/T86?date={date}&selectType=ALLBUT0999&response=json"
+TWSE_MARGIN_URL = "https://www.twse.com.tw/rwd/zh/marginTrading/MI_MARGN?date={date}&selectType=ALL&response=json"
+TPEX_CHIP_URL = "https://www.tpex.org.tw/www/zh-tw/insti/dailyTrade?type=Daily&sect=EW&date={date}&response=json"
+TPEX_MARGIN_URL = "https://www.tpex.org.tw/www/zh-tw/margin/balance?date={date}&response=json"
+HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"}
+
+
+def _fetch_json(url: str) -> Dict[str, Any]:
+    """下載上游 JSON 報表。"""
+    response = requests.get(url, headers=HEADERS, timeout=20)
+    response.raise_for_status()
+    return response.json()
+
+
+def _tables(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """統一新舊格式：回傳 [{fields, data}, ...]。"""
+    if payload.get("tables"):
+        return [t for t in payload["tables"] if t.get("data")]
+    if payload.get("data"):
+        return [{"fields": payload.get("fields", []), "data": payload["data"]}]
+    if payload.get("aaData"):
+        return [{"fields": payload.get("fields", []), "data": payload["aaData"]}]
+    return []
+
+
+def _find_field(fields: List[str], *keywords: str, exclude: tuple = ()) -> Optional[int]:
+    """找出同時包含所有關鍵字、且不含排除字的欄位位置。"""
+    for i, field in enumerate(fields):
+        if all(k in field for k in keywords) and not any(e in field for e in exclude):
+            return i
+    return None
+
+
+def _to_number(text: Any) -> float:
+    text = str(text).replace(",", "").replace("%", "").strip()
+    try:
+        return float(text) if text not in ("", "-", "--") else 0.0
+    except ValueError:
+        return 0.0
+
+
+def parse_chip_report(payload: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    """
+    解析 TWSE/TPEx 三大法人買賣超日報 (單位: 股 → 張)。
+    Returns:
+        dict: {stock_id: {"外資", "投信", "自營商", "三大法人合計"}}，欄位與 get_chip_data() 相同
+    """
+    records: Dict[str, Dict[str, int]] = {}
+    for table in _tables(payload):
+        fields = [str(f) for f in table.get("fields", [])]
+        code = _find_field(fields, "代號")
+        foreign_all = _find_field(fields, "陸資", "買賣超", exclude=("不含",))
+        foreign = _find_field(fields, "陸資", "買賣超", "不含")
+        foreign_dealer = _find_field(fields, "外資自營商", "買賣超", exclude=("不含",))
+        trust = _find_field(fields, "投信", "買賣超")
+        dealer = _find_field(fields, "自營商", "買賣超", exclude=("外資", "自行", "避險"))
+        total = _find_field(fields, "三大法人", "買賣超")
+        if None in (code, trust, dealer, total) or (foreign_all is None and foreign is None):
+            continue
+
+        for row in table["data"]:
+            stock_id = str(row[code]).strip()
+            if foreign_all is not None:
+                foreign_net = _to_number(row[foreign_all])
+            else:
+                foreign_net = _to_number(row[foreign]) + (_to_number(row[foreign_dealer]) if foreign_dealer is not None else 0)
+            records[stock_id] = {
+                "外資": round(foreign_net / 1000),
+                "投信": round(_to_number(row[trust]) / 1000),
+                "自營商": round(_to_number(row[dealer]) / 1000),
+                "三大法人合計": round(_to_number(row[total]) / 1000),
+            }
+    return records
+
+
+def _margin_record(buy, sell, redeem, prev_balance, balance, limit,
+                   short_sell, short_buy, short_redeem, short_prev, short_balance, offset) -> Dict[str, Any]:
+    """組成與 get_margin_data() 相同欄位的融資融券資料。"""
+    return {
+        "融資買進": int(buy),
+        "融資賣出": int(sell),
+        "融資現償": int(redeem),
+        "融資餘額": int(balance),
+        "融資增減": int(balance - prev_balance),
+        "融資限額": int(limit),
+        "融資使用率%": round(balance / limit * 100, 2) if limit else 0,
+        "融券賣出": int(short_sell),
+        "融券買進": int(short_buy),
+        "融券券償": int(short_redeem),
+        "融券餘額": int(short_balance),
+        "融券增減": int(short_balance - short_prev),
+        "融券券資比%": round(short_balance / balance * 100, 2) if balance else 0,
+        "資券相抵": int(offset),
+    }
+
+
+def parse_twse_margin_report(payload: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    解析 TWSE 融資融券彙總 (MI_MARGN，單位: 張)。
+    欄位順序: 代號, 名稱, 融資(買進, 賣出, 現金償還, 前日餘額, 今日餘額, 限額), 融券(買進, 賣出, 現券償還, 前日餘額, 今日餘額, 限額), 資券互抵, 註記
+    """
+    records: Dict[str, Dict[str, Any]] = {}
+    for table in _tables(payload):
+        fields = [str(f) for f in table.get("fields", [])]
+        if _find_field(fields, "代號") != 0 or len(fields) < 15:
+            continue
+        for row in table["data"]:
+            n = [_to_number(v) for v in row[2:15]]
+            records[str(row[0]).strip()] = _margin_record(
+                buy=n[0], sell=n[1], redeem=n[2], prev_balance=n[3], balance=n[4], limit=n[5],
+                short_buy=n[6], short_sell=n[7], short_redeem=n[8], short_prev=n[9], short_balance=n[10],
+                offset=n[12],
+            )
+    return records
+
+
+def parse_tpex_margin_report(payload: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    解析 TPEx 上櫃融資融券餘額 (單位: 張)。
+    欄位順序: 代號, 名稱, 前資餘額, 資買, 資賣, 現償, 資餘額, 資屬證金, 資使用率, 資限額,
+             前券餘額, 券賣, 券買, 券償, 券餘額, 券屬證金, 券使用率, 券限額, 資券相抵, 備註
+    """
+    records: Dict[str, Dict[str, Any]] = {}
+    for table in _tables(payload):
+        fields = [str(f) for f in table.get("fields", [])]
+        if fields and (_find_field(fields, "代號") != 0 or len(fields) < 19):
+            continue
+        for row in table["data"]:
+            if len(row) < 19:
+                continue
+            n = [_to_number(v) for v in row[2:19]]
+            records[str(row[0]).strip()] = _margin_record(
+                prev_balance=n[0], buy=n[1], sell=n[2], redeem=n[3], balance=n[4], limit=n[7],
+                short_prev=n[8], short_sell=n[9], short_buy=n[10], short_redeem=n[11], short_balance=n[12],
+                offset=n[16],
+            )
+    return records
+
+
+class ChipIngestor:
+    """
+    每日 21:00 (CHIP_UPDATE_HOUR) 後一次下載 TWSE/TPEx 全市場三大法人與融資融券報表，
+    批次寫入 ChipStore，之後個股籌碼查詢只需讀本地資料。
+    排程每次會補齊上次完整匯入後漏掉的日期 (例如主機休眠期間)。
+    """
+
+    CHECK_INTERVAL = 10 * 60   # 排程檢查間隔 (秒)
+    CATCH_UP_DAYS = 60         # 排程一次最多補齊的天數
+    _thread: Optional[threading.Thread] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def _sources(cls, day: date) -> Dict[str, List[tuple]]:
+        """各 kind 的上游 (交易所, 網址, 解析函數)。"""
+        twse_date = day.strftime("%Y%m%d")
+        tpex_date = day.strftime("%Y/%m/%d")
+        return {
+            "chip": [
+                ("twse", TWSE_CHIP_URL.format(date=twse_date), parse_chip_report),
+                ("tpex", TPEX_CHIP_URL.format(date=tpex_date), parse_chip_report),
+            ],
+            "margin": [
+                ("twse", TWSE_MARGIN_URL.format(date=twse_date), parse_twse_margin_report),
+                ("tpex", TPEX_MARGIN_URL.format(date=tpex_date), parse_tpex_margin_report),
+            ],
+        }
+
+    @classmethod
+    def ingest(cls, day: date, fetch_json: Callable[[str], Dict[str, Any]] = _fetch_json) -> Dict[str, int]:
+        """
+        匯入指定日期的全市場籌碼資料 (上市、上櫃分別記錄，已匯入的交易所不重複下載)。
+        報表沒有資料時:
+        - 週末，或已定案 (ChipStore.final_date()) 的平日 → 記錄為休市
+        - 尚未定案 (上游可能尚未公布) → 不記錄，留待之後重試
+        - 有資料列但解析不出任何股票 (欄位格式變更) → 不記錄並記錄錯誤
+        Args:
+            day (date): 交易日
+            fetch_json: 下載函數 (url -> JSON)，可替換為本地檔案讀取
+        Returns:
+            dict: {kind: 本次匯入股票數}，本次沒有任何交易所完成匯入的 kind 不會出現
+        """
+        date_str = day.strftime("%Y-%m-%d")
+        finalized = date_str <= ChipStore.final_date()
+        result: Dict[str, int] = {}
+        with cls._lock:
+            for kind, sources in cls._sources(day).items():
+                done = ChipStore.market_exchanges(kind, date_str)
+                for exchange, url, parser in sources:
+                    if exchange in done:
+                        continue
+                    if day.weekday() >= 5:
+                        ChipStore.save_market(kind, exchange, date_str, {})  # 週末無交易
+                        result[kind] = result.get(kind, 0)
+                        continue
+                    try:
+                        payload = fetch_json(url)
+                        records = parser(payload)
+                    except Exception as e:
+                        Log(f"[ChipIngestor] {date_str} {kind}/{exchange} 下載失敗: {e}", color=Color.RED)
+                        continue
+                    if not records:
+                        if _tables(payload):
+                            Log(f"[ChipIngestor] {date_str} {kind}/{exchange} 報表格式無法解析", color=Color.RED)
+                        elif finalized:
+                            ChipStore.save_market(kind, exchange, date_str, {})  # 已定案仍無資料 → 休市
+                            result[kind] = result.get(kind, 0)
+                            Log(f"[ChipIngestor] {date_str} {kind}/{exchange} 休市", color=Color.YELLOW, reload_only=True)
+                        else:
+                            Log(f"[ChipIngestor] {date_str} {kind}/{exchange} 尚未公布，稍後重試", color=Color.YELLOW)
+                        continue
+                    ChipStore.save_market(kind, exchange, date_str, records)
+                    result[kind] = result.get(kind, 0) + len(records)
+                    Log(f"[ChipIngestor] {date_str} {kind}/{exchange} 匯入 {len(records)} 檔", color=Color.GREEN)
+        return result
+
+    @classmethod
+    def pending_kinds(cls, day: date) -> List[str]:
+        """尚有交易所未完成匯入的 kind。"""
+        date_str = day.strftime("%Y-%m-%d")
+        return [k for k in ("chip", "margin") if date_str not in ChipStore.market_days(k, date_str, date_str)]
+
+    @classmethod
+    def backfill(cls, days: int = 60, fetch_json: Callable[[str], Dict[str, Any]] = _fetch_json) -> None:
+        """補齊最近 N 天 (至已定案日期為止) 尚未匯入的日期。"""
+        end = datetime.strptime(ChipStore.final_date(), "%Y-%m-%d").date()
+        day = end - timedelta(days=days - 1)
+        while day <= end:
+            if cls.pending_kinds(day):
+                cls.ingest(day, fetch_json=fetch_json)
+            day += timedelta(days=1)
+
+    @classmethod
+    def catch_up(cls, fetch_json: Callable[[str], Dict[str, Any]] = _fetch_json) -> None:
+        """補齊最後一次完整匯入的日期之後 (至多 CATCH_UP_DAYS 天) 至已定案日期的所有日期。"""
+        final = datetime.strptime(ChipStore.final_date(), "%Y-%m-%d").date()
+        lasts = [ChipStore.last_market_day(kind) for kind in ("chip", "margin")]
+        start = final if None in lasts else datetime.strptime(min(lasts), "%Y-%m-%d").date() + timedelta(days=1)
+        cls.backfill(max(1, min((final - start).days + 1, cls.CATCH_UP_DAYS)), fetch_json=fetch_json)
+
+    @classmethod
+    def _run_scheduler(cls) -> None:
+        while True:
+            try:
+                cls.catch_up()
+            except Exception as e:
+                Log(f"[ChipIngestor] 排程錯誤: {e}", color=Color.RED)
+            time.sleep(cls.CHECK_INTERVAL)
+
+    @classmethod
+    def start_scheduler(cls) -> None:
+        """啟動背景排程 (每個 process 只會啟動一次)。"""
+        if cls._thread is not None and cls._thread.is_alive():
+            return
+        cls._thread = threading.Thread(target=cls._run_scheduler, name="ChipIngestor", daemon=True)
+        cls._thread.start()
+        Log(f"[ChipIngestor] 全市場籌碼排程已啟動", color=Color.GREEN, reload_only=True)
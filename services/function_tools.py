@@ -1,28 +1,59 @@
-from agents import Agent, Runner, function_tool
+from agents import Agent, ModelSettings, RunContextWrapper, Runner, function_tool
+from agents import set_default_openai_api, set_default_openai_client, set_tracing_disabled
 from agents.tool import WebSearchTool, UserLocation
+from openai import AsyncOpenAI
+from openai.types.responses import ResponseTextDeltaEvent
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import AsyncIterator, Optional
+import asyncio
 import uuid
 
-from util.logger import log_print
+from util.concurrency import run_blocking, source_limit
+from util.logger import log_print, Log, Color
+from util.tool_cache import current_session_id, memoize_tool
+from util.tool_format import align_symbols, format_articles, format_price_history
 from util.nowtime import TaiwanTime
-from util.ai_session import trim_session
+from util.ai_session import ConversationSession, get_session
+from util.config import Env
 
 
+# 使用自訂 OpenAI 相容端點 (例如本地 LLM stub) 時，改用 Chat Completions API 並關閉 tracing 上傳
+CUSTOM_LLM_BACKEND = bool(Env.OPENAI_BASE_URL)
+if CUSTOM_LLM_BACKEND:
+    set_default_openai_client(AsyncOpenAI(api_key=Env.OPENAI_API_KEY, base_url=Env.OPENAI_BASE_URL), use_for_tracing=False)
+    set_default_openai_api("chat_completions")
+    set_tracing_disabled(True)
+
+@dataclass
+class ChatContext:
+    """單次對話執行的上下文 (傳給 Runner 的 context，不會送給 LLM)"""
+    today: str = field(default_factory=lambda: TaiwanTime.string(time=False))     # 以「日」為單位，系統提示一天內維持不變
+
+FIN_INSTRUCTIONS = (
+    "你是一名台灣股票分析師，請使用提供的工具，分析股票各面向並給予操作方向＆價位建議。"
+    "（1.如果查無資料，可嘗試使用工具查詢代碼\n"
+    "2.若未提及需要分析的時間&技術指標時，預設為一個月且使用5&10MA\n"
+    "3.若無特別提及分析面向，請查詢股價&新聞 (特定主題的新聞可先用 toolSearchNews 搜尋已收錄新聞；比較多檔股票時用 toolGetStocksPrice 一次查詢)\n"
+    "4.若非股市問題，請禮貌拒絕並告知使用者"
+    "5.用簡單、完整又有禮貌的方式回答問題，若資訊較多請使用markdown格式）\n"
+    "今天是{today}"
+)
+
+def fin_instructions(run_context: RunContextWrapper[ChatContext], agent: Agent) -> str:
+    """依執行上下文產生系統提示 (日期放最後，前段內容固定以利 prompt cache)。"""
+    context = run_context.context if isinstance(run_context.context, ChatContext) else ChatContext()
+    return FIN_INSTRUCTIONS.format(today=context.today)
+
 class FinAgent(Agent):
     '''金融分析師 Agent'''
     def __init__(self, model: str):
-        instructions = (
-            "你是一名台灣股票分析師，請使用提供的工具，分析股票各面向並給予操作方向＆價位建議。"
-            "（1.如果查無資料，可嘗試使用工具查詢代碼\n"
-            f"2.若未提及需要分析的時間&技術指標時，預設為一個月且使用5&10MA，今天是{TaiwanTime.string()}\n"
-            "3.若無特別提及分析面向，請查詢股價&新聞\n"
-            "4.若非股市問題，請禮貌拒絕並告知使用者"
-            "5.用簡單、完整又有禮貌的方式回答問題，若資訊較多請使用markdown格式）"
-        )
         super().__init__(
             name="Finance Agent",
             model=model,
-            instructions=instructions,
-            tools=[toolQueryStock, toolGetStockPrice, toolFetchStockNews, toolFetchTwiiNews, toolFetchETFIngredients],
+            instructions=fin_instructions,
+            tools=[toolQueryStock, toolGetStockPrice, toolGetStocksPrice, toolFetchStockNews, toolSearchNews, toolFetchTwiiNews, toolFetchETFIngredients],
+            model_settings=ModelSettings(parallel_tool_calls=True),   # 同一回合的多個工具呼叫同時執行
             handoffs=[WebAgent(model=model)],
             handoff_description="當使用者的問題是金融相關，且無法從金融分析師 Agent 解決時，才交由 Web Agent 處理。非股票相關問題請直接回覆使用者，不要交給 Web Agent。"
         )
@@ -35,9 +66,30 @@ class WebAgent(Agent):
             name="Web Agent",
             model=model,
             instructions=instructions,
-            tools=[WebSearchTool(UserLocation(type="approximate", country="TW"), search_context_size='low')]
+            # WebSearchTool 為 OpenAI Responses API 內建工具，自訂端點不支援
+            tools=[] if CUSTOM_LLM_BACKEND else [WebSearchTool(UserLocation(type="approximate", country="TW"), search_context_size='low')]
         )
 
+@lru_cache(maxsize=8)
+def get_fin_agent(model: str) -> FinAgent:
+    """每個模型只建立一次 Agent (含工具 schema 與 handoff)，之後重複使用。"""
+    return FinAgent(model=model)
+
+async def _quick_reply(question: str, session: ConversationSession) -> Optional[str]:
+    """簡單問題且已有當日評分時直接回覆 (並寫入對話紀錄)，否則回傳 None 交給 FinAgent。"""
+    from services.chat_intent import quick_answer
+    try:
+        answer = await run_blocking(quick_answer, question)
+    except Exception as e:
+        Log(f"[Chat] 快速回覆失敗: {e}", color=Color.YELLOW)
+        return None
+    if answer:
+        await session.add_items([
+            {"role": "user", "content": question},
+            {"role": "assistant", "content": answer},
+        ])
+    return answer
+
 async def ask_AI_Agent(question: str, model: str, session_id: str = str(uuid.uuid4()) ) -> str:
     """
     詢問 AI 並獲得回應。
@@ -48,16 +100,81 @@ async def ask_AI_Agent(question: str, model: str, session_id: str = str(uuid.uui
     Returns:
         str: AI 的回應內容。
     """
-    session = await trim_session(session_id)
-    result = await Runner.run(FinAgent(model=model), 
+    session = get_session(session_id)
+    answer = await _quick_reply(question, session)
+    if answer:
+        return answer
+    current_session_id.set(session_id)     # 供工具結果快取區分對話
+    result = await Runner.run(get_fin_agent(model), 
                               input= question, 
+                              context= ChatContext(),
                               session= session, 
                               max_turns= 10)
     return result.final_output
 
+def _tool_call_info(raw_item) -> tuple[str, str]:
+    """取得工具呼叫的 (call_id, 名稱)，raw_item 可能是物件或 dict。"""
+    get = raw_item.get if isinstance(raw_item, dict) else (lambda key, default=None: getattr(raw_item, key, default))
+    return get("call_id") or get("id") or "", get("name") or get("type") or "tool"
+
+async def stream_AI_Agent(question: str, model: str, session_id: str) -> AsyncIterator[dict]:
+    """
+    以串流方式詢問 AI，逐步產生事件。
+    Args:
+        question (str): 使用者的問題。
+        model (str): 使用的 AI 模型名稱。
+        session_id (str): 對話會話的唯一識別碼。
+    Yields:
+        dict: {"event": 事件名稱, "data": 內容}
+            - delta: 回應文字片段 {"text"}
+            - agent: 切換 Agent {"agent"}
+            - tool_start / tool_end: 工具開始 / 完成 {"tool"}
+            - done: 最終回應 {"response"}
+    """
+    session = get_session(session_id)
+    answer = await _quick_reply(question, session)
+    if answer:
+        yield {"event": "delta", "data": {"text": answer}}
+        yield {"event": "done", "data": {"response": answer}}
+        return
+    current_session_id.set(session_id)     # 供工具結果快取區分對話 (背景串流工作會繼承)
+    result = Runner.run_streamed(get_fin_agent(model),
+                                 input= question,
+                                 context= ChatContext(),
+                                 session= session,
+                                 max_turns= 10)
+    tool_names = {}     # call_id → 工具名稱
+    async for event in result.stream_events():
+        if event.type == "raw_response_event":
+            if isinstance(event.data, ResponseTextDeltaEvent) and event.data.delta:
+                yield {"event": "delta", "data": {"text": event.data.delta}}
+        elif event.type == "agent_updated_stream_event":
+            yield {"event": "agent", "data": {"agent": event.new_agent.name}}
+        elif event.type == "run_item_stream_event":
+            if event.name == "tool_called":
+                call_id, name = _tool_call_info(event.item.raw_item)
+                tool_names[call_id] = name
+                yield {"event": "tool_start", "data": {"tool": name}}
+            elif event.name == "tool_output":
+                call_id, _ = _tool_call_info(event.item.raw_item)
+                yield {"event": "tool_end", "data": {"tool": tool_names.get(call_id, "tool")}}
+    yield {"event": "done", "data": {"response": result.final_output}}
+
+
+async def _fetch_price(symbol: str, start: str, sdf_indicator_list: list[str], chip_enable: bool = False):
+    """在工具執行緒池抓取單一股票的股價 (受 Yahoo 並行上限限制)，輸出會用到籌碼欄位時才設 chip_enable。"""
+    from services.stock_data import getStockPrice
+    async with source_limit("yahoo"):
+        return await run_blocking(getStockPrice, symbol, start, sdf_indicator_list, chip_enable=chip_enable)
+
+def _indicator_columns(sdf_indicator_list: list[str]) -> list[str]:
+    """技術指標在資料中的欄位名稱 (stockstats 原名與轉換後名稱)。"""
+    from services.tech_data import SDF_INDICATOR_NAMES
+    return [*sdf_indicator_list, *(SDF_INDICATOR_NAMES.get(i, i) for i in sdf_indicator_list)]
 
 @function_tool
 @log_print
+@memoize_tool("lookup")
 async def toolQueryStock(keyword: str) -> str:
     """
     股票代號&名稱查詢。
@@ -70,16 +187,19 @@ async def toolQueryStock(keyword: str) -> str:
     """
     from util.stock_list import StockList
     try:
-        stockID, stockName = StockList.query(keyword)
+        async with source_limit("stock_list"):
+            stockID, stockName = await run_blocking(StockList.query, keyword)
         return stockID, stockName
     except Exception as e:
         return f"Error query stock info: {keyword}!"
 
 @function_tool
 @log_print
+@memoize_tool("price")
 async def toolGetStockPrice(symbol: str, start: str, sdf_indicator_list: list[str]=[] ) -> str:
     """
     抓取 Yahoo Finance 的歷史股價資料與籌碼面資料。
+    近期為日K，較早的資料會合併為週K (精簡輸出)。
     指數代號：（成交量單位為「億元」）
         - 加權指數：使用 "^TWII"
         - 櫃買指數：使用 "^TWOII"
@@ -89,56 +209,125 @@ async def toolGetStockPrice(symbol: str, start: str, sdf_indicator_list: list[st
         start (str): 開始日期（格式："YYYY-MM-DD"），將只返回此日期之後的資料。
         sdf_indicator_list (list[str]): 欲計算的技術指標清單，stockstats - StockDataFrame 的指標名稱。
     Returns:
-        str: 資料表格的字串格式。
+        str: CSV 格式的資料表格。
     Example:
         toolGetStockPrice("2330.TW", "1mo")
         toolGetStockPrice("2330.TW", "2024-01-01", sdf_indicator_list=["close_5_sma", "close_10_ema", "macd", "kdjk", "kdjd", "rsi_5", "rsi_10"])
     """
-    from services.stock_data import getStockPrice
+    from services.chip_data import CHIP_COLUMNS
     try:
-        data = getStockPrice(symbol, start, sdf_indicator_list)
-        return data.to_string()
+        data = await _fetch_price(symbol, start, sdf_indicator_list, chip_enable=True)
+        columns = ["Open", "High", "Low", "Close", "Volume", *_indicator_columns(sdf_indicator_list), *CHIP_COLUMNS]
+        return format_price_history(data, columns=columns)
     except Exception as e:
         return f"Error fetching data for {symbol}!"
 
 @function_tool
 @log_print
-async def toolFetchStockNews(stock_name: str) -> str:
+@memoize_tool("price")
+async def toolGetStocksPrice(symbols: list[str], start: str, sdf_indicator_list: list[str]=[] ) -> str:
+    """
+    同時抓取多檔股票的歷史股價，合併為同一張表 (共用日期，每檔一組收盤價/成交量/指標欄位)，適合比較多檔股票。
+    近期為日K，較早的資料會合併為週K。
+    Args:
+        symbols (list[str]): 股票代號清單，例如 ["2330.TW", "2303.TW", "2317.TW"]。
+        start (str): 開始日期（格式："YYYY-MM-DD"），將只返回此日期之後的資料。
+        sdf_indicator_list (list[str]): 欲計算的技術指標清單，stockstats - StockDataFrame 的指標名稱。
+    Returns:
+        str: CSV 格式的資料表格，欄位為 "代號:欄位"。
+    Example:
+        toolGetStocksPrice(["2330.TW", "2303.TW", "2317.TW"], "2024-01-01", sdf_indicator_list=["close_20_sma"])
+    """
+    symbols = list(dict.fromkeys(s.strip() for s in symbols if s.strip()))
+    results = await asyncio.gather(*(_fetch_price(s, start, sdf_indicator_list) for s in symbols), return_exceptions=True)
+
+    frames, failed = {}, []
+    for symbol, result in zip(symbols, results):
+        if isinstance(result, Exception) or result is None or result.empty:
+            failed.append(symbol)
+        else:
+            frames[symbol.split(".")[0]] = result
+    if not frames:
+        return f"Error fetching data for {', '.join(symbols)}!"
+
+    table = align_symbols(frames, ["Close", "Volume", *_indicator_columns(sdf_indicator_list)])
+    text = format_price_history(table)
+    if failed:
+        text += f"\n# 查詢失敗: {', '.join(failed)}"
+    return text
+
+@function_tool
+@log_print
+@memoize_tool("news")
+async def toolFetchStockNews(stock_name: str, full_text: bool = False) -> str:
     """
     爬取指定股票的最新新聞資料。
     Args:
         stock_name (str): 股票名稱，例如 "台積電" 或 "鴻海"。
+        full_text (bool): 是否需要完整內文，預設 False 只回傳導言；導言不足以回答時再設為 True。
     Returns:
-        str: 包含新聞日期、標題與內文的表格字串。
+        str: 每則新聞的日期、標題與導言 (或內文)。
     Example:
         toolFetchStockNews("台積電")
     """
     from services.news_data import FetchStockNews
     try:
-        data = FetchStockNews(stock_name)
-        return data.to_string()
+        async with source_limit("udn"):
+            data = await run_blocking(FetchStockNews, stock_name)
+        return format_articles(data.to_dict(orient='records'), full_text=full_text)
     except Exception as e:
         return f"Error fetching news for {stock_name}"
 
 @function_tool
 @log_print
-async def toolFetchTwiiNews() -> str:
+@memoize_tool("search")
+async def toolSearchNews(query: str, start: str = "", end: str = "", limit: int = 10) -> str:
+    """
+    在已收錄的新聞中全文搜尋 (毫秒級，不需即時爬取)，依相關度排序。
+    Args:
+        query (str): 查詢關鍵字，可用空白分隔多個詞，例如 "台積電 CoWoS"。
+        start (str): 起始日期（格式："YYYY-MM-DD"），空字串代表不限。
+        end (str): 結束日期（格式："YYYY-MM-DD"，含當天），空字串代表不限。
+        limit (int): 回傳筆數，預設 10。
+    Returns:
+        str: 每則新聞的日期、標題與內文摘錄，查無結果時可改用 toolFetchStockNews。
+    Example:
+        toolSearchNews("台積電 CoWoS", start="2025-01-01")
+    """
+    from services.news_data import search_news
+    try:
+        async with source_limit("news_index"):
+            data = await run_blocking(search_news, query, start=start or None, end=end or None, limit=limit)
+        if data.empty:
+            return f"No cached news found for {query}"
+        return format_articles(data.to_dict(orient='records'))
+    except Exception as e:
+        return f"Error searching news for {query}"
+
+@function_tool
+@log_print
+@memoize_tool("news")
+async def toolFetchTwiiNews(full_text: bool = False) -> str:
     """
     爬取台灣加權指數(^TWII)與櫃買市場(^TWOII)的最新新聞。
+    Args:
+        full_text (bool): 是否需要完整內文，預設 False 只回傳導言。
     Returns:
-        str: 包含新聞時間、標題與內容的表格字串。
+        str: 每則新聞的時間、標題與導言 (或內容)。
     Example:
         toolFetchTwiiNews()
     """
     from services.news_data import FetchTwiiNews
     try:
-        data = FetchTwiiNews()
-        return data.to_string()
+        async with source_limit("cnyes"):
+            data = await run_blocking(FetchTwiiNews)
+        return format_articles(data.to_dict(orient='records'), full_text=full_text)
     except Exception as e:
         return f"Error fetching TWII news"
 
 @function_tool
 @log_print
+@memoize_tool("etf")
 async def toolFetchETFIngredients(ETF_name: str) -> str:
     """
     查詢 ETF 的成分股。
@@ -151,7 +340,8 @@ async def toolFetchETFIngredients(ETF_name: str) -> str:
     """
     from services.stock_data import fetchETFIngredients
     try:
-        data = fetchETFIngredients(ETF_name)
+        async with source_limit("etf"):
+            data = await run_blocking(fetchETFIngredients, ETF_name)
         return data
     except Exception as e:
         return f"Error fetching ETF ingredients for {ETF_name}"
\ No newline at end of file
@@ -0,0 +1,165 @@
+"""
+本地 LLM stub (OpenAI 相容 /v1/chat/completions)
+回傳固定的回應與工具呼叫，並可設定延遲，用於在沒有 OpenAI 金鑰時壓測聊天 / AI 摘要路徑，
+量測本服務自身的開銷 (對話紀錄、工具執行、序列化) 與並行表現。
+
+使用方式:
+    python -m services.llm_stub 8001           # 啟動 stub (預設 port 8001)
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1    # 主服務改連 stub (.env)
+    OPENAI_API_KEY=stub                         # stub 不驗證金鑰，任意非空值即可
+"""
+import asyncio
+import hashlib
+import json
+import time
+from datetime import timedelta
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from util.config import Env
+from util.nowtime import TaiwanTime
+from util.tool_format import estimate_tokens
+
+STREAM_CHUNK_CHARS = 8
+
+# 工具參數的固定值 (依參數名稱)，未列出者依型別給預設值
+STUB_ARGUMENTS = {
+    "keyword": "台積電",
+    "stock_name": "台積電",
+    "symbol": "2330.TW",
+    "symbols": ["2330.TW", "2317.TW"],
+    "query": "台積電 營收",
+    "ETF_name": "0050",
+}
+STUB_TYPE_DEFAULTS = {"string": "", "integer": 1, "number": 1, "boolean": False, "array": [], "object": {}}
+
+stub_app = FastAPI(title="LLM Stub")
+
+
+def _stub_arguments(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """依工具的 JSON schema 產生固定參數 (只填必要參數)。"""
+    properties = parameters.get("properties", {})
+    arguments = {}
+    for name in parameters.get("required", []):
+        if name in STUB_ARGUMENTS:
+            arguments[name] = STUB_ARGUMENTS[name]
+        elif name in ("start", "end"):
+            arguments[name] = (TaiwanTime.now() - timedelta(days=30)).strftime("%Y-%m-%d") if name == "start" else ""
+        else:
+            arguments[name] = STUB_TYPE_DEFAULTS.get(properties.get(name, {}).get("type"), "")
+    return arguments
+
+
+def _content_text(content) -> str:
+    """訊息內容可能是字串或 [{type, text}, ...]。"""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _plan(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    決定回應內容 (相同輸入一定得到相同結果)：
+    - 有可用工具且本回合尚未呼叫過 → 呼叫 Env.LLM_STUB_TOOLS 中存在的工具
+    - 否則 → 根據問題與工具結果回傳固定文字
+    Returns:
+        dict: {"content": str | None, "tool_calls": list}
+    """
+    messages: List[Dict[str, Any]] = body.get("messages", [])
+    last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+    question = _content_text(messages[last_user].get("content")) if last_user >= 0 else ""
+    tool_results = [m for m in messages[last_user + 1:] if m.get("role") == "tool"]
+    digest = hashlib.sha1(question.encode("utf-8")).hexdigest()[:8]
+
+    available = {
+        tool["function"]["name"]: tool["function"].get("parameters", {})
+        for tool in body.get("tools") or []
+        if tool.get("type") == "function"
+    }
+    wanted = [name.strip() for name in Env.LLM_STUB_TOOLS.split(",") if name.strip() in available]
+    if wanted and not tool_results:
+        return {
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": f"call_{digest}_{i}",
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(_stub_arguments(available[name]), ensure_ascii=False)},
+                }
+                for i, name in enumerate(wanted)
+            ],
+        }
+
+    if tool_results:
+        chars = sum(len(_content_text(m.get("content"))) for m in tool_results)
+        content = f"[stub {digest}] 問題「{question[:30]}」已參考 {len(tool_results)} 筆工具結果 (共 {chars} 字)。"
+    else:
+        content = f"[stub {digest}] {question[:60]}"
+    return {"content": content, "tool_calls": []}
+
+
+def _usage(body: Dict[str, Any], plan: Dict[str, Any]) -> Dict[str, int]:
+    prompt_tokens = estimate_tokens(json.dumps(body.get("messages", []), ensure_ascii=False))
+    completion_tokens = estimate_tokens(plan["content"] or json.dumps(plan["tool_calls"], ensure_ascii=False))
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+def _stream(body: Dict[str, Any], plan: Dict[str, Any], completion_id: str, created: int):
+    """以 chat.completion.chunk 格式逐段輸出。"""
+    def chunk(delta: Dict[str, Any], finish_reason=None, **extra) -> str:
+        payload = {
+            "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], **extra,
+        }
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    yield chunk({"role": "assistant", "content": ""})
+    if plan["tool_calls"]:
+        yield chunk({"tool_calls": [{"index": i, **call} for i, call in enumerate(plan["tool_calls"])]})
+        finish_reason = "tool_calls"
+    else:
+        content = plan["content"]
+        for start in range(0, len(content), STREAM_CHUNK_CHARS):
+            yield chunk({"content": content[start:start + STREAM_CHUNK_CHARS]})
+        finish_reason = "stop"
+    yield chunk({}, finish_reason)
+    if (body.get("stream_options") or {}).get("include_usage"):
+        payload = {
+            "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": body.get("model", "stub"),
+            "choices": [], "usage": _usage(body, plan),
+        }
+        yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@stub_app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    """OpenAI Chat Completions 相容端點 (支援 stream)，回應前等待 Env.LLM_STUB_LATENCY_MS 毫秒。"""
+    body = await request.json()
+    plan = _plan(body)
+    await asyncio.sleep(Env.LLM_STUB_LATENCY_MS / 1000)
+
+    completion_id = f"chatcmpl-stub-{hashlib.sha1(json.dumps(body, sort_keys=True).encode('utf-8')).hexdigest()[:12]}"
+    created = int(time.time())
+    if body.get("stream"):
+        return StreamingResponse(_stream(body, plan, completion_id, created), media_type="text/event-stream")
+
+    message = {"role": "assistant", "content": plan["content"]}
+    if plan["tool_calls"]:
+        message["tool_calls"] = plan["tool_calls"]
+    return JSONResponse(content={
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if plan["tool_calls"] else "stop"}],
+        "usage": _usage(body, plan),
+    })
+
+
+if __name__ == "__main__":
+    import sys
+    import uvicorn
+    uvicorn.run(stub_app, host="127.0.0.1", port=int(sys.argv[1]) if len(sys.argv) > 1 else 8001)
@@ -2,24 +2,38 @@ import requests
 import pandas as pd
 import re
 from datetime import datetime, timedelta
-import jieba
 from collections import Counter
 from bs4 import BeautifulSoup as bs
 import html
 import time
+import threading
+from typing import Iterator
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
 
+from util import simhash
+from util.article_store import ArticleStore
+from util.news_index import NewsIndex
 from util.nowtime import TaiwanTime
 from util.logger import Log, Color
 from util.stock_list import StockList
+from util.ttl_cache import TTLCache
+from services.tokenizer import Tokenizer
 
-stopwords_set = set()       # 停用詞集合
+news_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="news")   # 新聞爬取共用執行緒
+summary_cache = TTLCache(maxsize=512, ttl=120)      # (來源, 關鍵字, 頁數) → 新聞摘要，分頁來回切換時直接命中
+SUMMARY_SOURCE_DEADLINES = {'udn': 4, 'cnyes': 4}   # 各來源等待上限 (秒)
+SUMMARY_REQUEST_TIMEOUT = 10                        # 單次請求逾時 (秒)，避免背景執行緒卡住
 
-with open("data/stopWords_TW.txt", 'r', encoding='utf-8') as f:
-    stopwords_set = { line.strip() for line in f if line.strip() }
+ARTICLE_MAX_WORKERS = 8     # 新聞內文並行下載總數
+ARTICLE_PER_HOST = 4        # 單一網站並行上限
+ARTICLE_TIMEOUT = 8         # 單篇請求逾時 (秒)
+article_executor = ThreadPoolExecutor(max_workers=ARTICLE_MAX_WORKERS, thread_name_prefix="article")
+_host_limits: dict[str, threading.BoundedSemaphore] = {}
+_host_limits_lock = threading.Lock()
 
-with open("data/stockName.txt", "r", encoding="utf-8") as f:
-    for line in f: 
-        jieba.add_word(line.strip())  # 將公司名稱加入 jieba 詞庫
+word_cloud_cache = TTLCache(maxsize=128, ttl=600)   # 新聞網址組合 → 詞雲結果
+SEARCH_SNIPPET_CHARS = 300  # 搜尋結果內文摘錄長度
 
 
 def FetchStockNews(stock_name: str, num: int = 10, include_url: bool=False) -> pd.DataFrame:
@@ -39,28 +53,27 @@ def FetchStockNews(stock_name: str, num: int = 10, include_url: bool=False) -> p
     udn_df = udn_df[udn_df['TimeStamp'] >= two_months_ago]
     urls = udn_df['Url'].tolist()[:num]
 
-    # 先批次取得所有 URL 的快取資料
+    # 先取得已儲存的內文 (本地 ArticleStore → newsScores)
     from util.data_manager import DataManager
     cached_news = {}
     for url in urls:
-        cached = DataManager.get_news_score(url=url)
-        if cached and cached.get("content"):
-            cached_news[url] = cached.get("content")
-
-    news_content = []
-    for i, url in enumerate(urls):
-        Log(f"[新聞爬取] 進度 - {i+1}/{len(urls)} ", end="\r", reload_only=True)  # debug 時 顯示進度
-        
-        # 檢查是否有快取
-        if url in cached_news:
-            article = cached_news[url]
-        else:
-            # 沒有快取才去爬取
-            article = parse_article(url, source='udn')
-        
-        news_content.append(article)
+        content = DataManager.get_news_content(url)
+        if content:
+            cached_news[url] = content
+
+    # 沒有快取的新聞才去爬取 (並行下載，結果依原順序放回)
+    # 每篇下載完成就先斷詞 (詞頻存入 ArticleStore)，與其他文章的下載重疊，之後建索引/詞雲直接讀取
+    missing_urls = [url for url in urls if url not in cached_news]
+    fetched = {}
+    for i, content in iter_articles([(url, 'udn') for url in missing_urls]):
+        Log(f"[新聞爬取] 進度 - {len(fetched)+1}/{len(missing_urls)} ", end="\r", reload_only=True)  # debug 時 顯示進度
+        fetched[missing_urls[i]] = content
+        if content:
+            article_word_counts([(missing_urls[i], content)])
+    news_content = [cached_news[url] if url in cached_news else fetched[url] for url in urls]
     Log(f"[新聞爬取] 抓取完成！{' '*20}", end="\r", color=Color.GREEN, reload_only=True)
     udn_df['Content'] = news_content
+    index_articles(zip(urls, news_content, udn_df['Title'], udn_df['TimeStamp']))
     udn_df['Date'] = udn_df['TimeStamp'].apply(lambda x: datetime.fromtimestamp(x).strftime("%Y-%m-%d %H:%M"))  # 轉換 時間戳->日期
     col = ['Date', 'Title', 'Content']
     if include_url: col.append('Url')
@@ -91,23 +104,54 @@ def FetchTwiiNews() -> pd.DataFrame:
         data.append([news_time,title,content])
     return pd.DataFrame(data,columns=col)
 
-def news_summary(stock_id: str, page: int=1) -> pd.DataFrame:
+def _fetch_summary_source(source: str, keyword: str, page: int) -> pd.DataFrame:
+    """爬取單一來源的新聞摘要，並寫入短期快取。"""
+    fetcher = get_udn_news_summary if source == 'udn' else get_cnyes_news_summary
+    df = fetcher(keyword, page=page, timeout=SUMMARY_REQUEST_TIMEOUT)
+    summary_cache.set((source, keyword, page), df)
+    return df
+
+def news_summary(stock_id: str, page: int=1) -> tuple[pd.DataFrame, dict]:
     """
-    爬取 udn新聞網 及 cnyes鉅亨網 指定股票的新聞摘要。
+    同時爬取 udn新聞網 及 cnyes鉅亨網 指定股票的新聞摘要。
+    每個來源有各自的期限，逾時的來源會略過並回傳部分結果 (背景完成後仍會寫入快取)。
     Returns:
-        DataFrame: 時間戳、新聞標題、摘要、網址、來源。
+        tuple: (DataFrame: 時間戳、新聞標題、摘要、網址、來源, dict: 各來源狀態 ok/cached/timeout/error)
     """
     _, stockName = StockList.query(stock_id)
+    keywords = {'udn': f'{stockName} {stock_id}', 'cnyes': stockName}
 
-    udn_df = get_udn_news_summary(f'{stockName} {stock_id}', page=page)
-    cnyes_df = get_cnyes_news_summary(stockName, page=page)
+    frames = []
+    sources = {}
+    futures = {}
+    for source, keyword in keywords.items():
+        cached = summary_cache.get((source, keyword, page))
+        if cached is not None:
+            frames.append(cached)
+            sources[source] = 'cached'
+        else:
+            futures[source] = news_executor.submit(_fetch_summary_source, source, keyword, page)
 
-    df = pd.concat([udn_df, cnyes_df], ignore_index=True)
+    started = time.monotonic()
+    for source, future in futures.items():
+        remaining = max(0, SUMMARY_SOURCE_DEADLINES[source] - (time.monotonic() - started))
+        try:
+            frames.append(future.result(timeout=remaining))
+            sources[source] = 'ok'
+        except FutureTimeoutError:
+            Log(f"[新聞摘要] {source} 超過 {SUMMARY_SOURCE_DEADLINES[source]} 秒，略過", color=Color.YELLOW)
+            sources[source] = 'timeout'
+        except Exception as e:
+            Log(f"[新聞摘要] {source} 錯誤：{e}", color=Color.RED)
+            sources[source] = 'error'
+
+    col = ["TimeStamp", "Title", "Summary", "Url", "Source"]
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=col)
     df.sort_values(by='TimeStamp', ascending=False, inplace=True)
     df.reset_index(drop=True, inplace=True)
-    return df
+    return df, sources
 
-def get_udn_news_summary(keyword, page=1) -> pd.DataFrame:
+def get_udn_news_summary(keyword, page=1, timeout=None) -> pd.DataFrame:
     """
     爬取 udn新聞網 指定股票的新聞資料「摘要」。
     Returns:
@@ -117,7 +161,7 @@ def get_udn_news_summary(keyword, page=1) -> pd.DataFrame:
     col = ["TimeStamp", "Title", "Summary", "Url", "Source"]
 
     udn_url = f"https://udn.com/api/more?page={page}&id=search:{keyword}&channelId=2&type=searchword&last_page=100"
-    udn_json_news = requests.get(udn_url).json()['lists']
+    udn_json_news = requests.get(udn_url, timeout=timeout).json()['lists']
     for item in udn_json_news:
         url = item['titleLink']
         if not url.startswith('https://udn.com/news'): continue  # 跳過專欄文章
@@ -128,7 +172,7 @@ def get_udn_news_summary(keyword, page=1) -> pd.DataFrame:
         data.append([timestamp, title, summary, url, 'udn'])
     return pd.DataFrame(data, columns=col)
 
-def get_cnyes_news_summary(keyword, page=1) -> pd.DataFrame:
+def get_cnyes_news_summary(keyword, page=1, timeout=None) -> pd.DataFrame:
     """
     爬取 cnyes鉅亨網 指定股票的新聞資料「摘要」。
     Returns:
@@ -138,7 +182,7 @@ def get_cnyes_news_summary(keyword, page=1) -> pd.DataFrame:
     col = ["TimeStamp", "Title", "Summary", "Url", "Source"]
 
     cnyes_url = f"https://ess.api.cnyes.com/ess/api/v1/news/keyword?q={keyword}&limit=20&page={page}"
-    cnyes_json_news = requests.get(cnyes_url).json()['data']['items']
+    cnyes_json_news = requests.get(cnyes_url, timeout=timeout).json()['data']['items']
     for item in cnyes_json_news:
         id = item['newsId']
         url = f"https://news.cnyes.com/news/id/{id}"
@@ -151,25 +195,26 @@ def get_cnyes_news_summary(keyword, page=1) -> pd.DataFrame:
     return pd.DataFrame(data, columns=col)
 
 
-def parse_article(url: str, source: str='udn') -> str:
+def parse_article(url: str, source: str='udn', timeout=None) -> str:
     """
     爬取指定新聞網址的完整內容。
     Args:
         url (str): 新聞網址
         source (str): 新聞來源，預設為 'udn'。可選擇 'udn' 或 'cnyes'。
+        timeout (float): 請求逾時秒數，預設不限
     Returns:
         str: 新聞內容文字
     """
     
     try:
         if source == 'udn':
-            news = requests.get(url).text
+            news = requests.get(url, timeout=timeout).text
             news_find = bs(news,'html.parser').find("section",class_="article-content__editor").find_all("p")[:-1]
             news_data = "\n".join(x.text.strip() for x in news_find)
             news_data = news_data.replace("\n\n","\n").strip()
             return news_data
         elif source == 'cnyes':
-            news = requests.get(url).text
+            news = requests.get(url, timeout=timeout).text
             news_bs = bs(news,'html.parser')
             news_find = news_bs.find("main",class_="c1tt5pk2")
             news_data = "\n".join(x.text.strip() for x in news_find)
@@ -186,17 +231,154 @@ def parse_article(url: str, source: str='udn') -> str:
     return ""
 
 
+def _host_limit(url: str) -> threading.BoundedSemaphore:
+    """取得該網站的並行上限 semaphore。"""
+    host = urlparse(url).netloc
+    with _host_limits_lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(ARTICLE_PER_HOST)
+        return _host_limits[host]
+
+def _fetch_article_limited(url: str, source: str) -> str:
+    """讀取本地已存的內文，沒有才下載並寫入 ArticleStore。"""
+    content = ArticleStore.get(url)
+    if content is not None:
+        return content
+    with _host_limit(url):
+        content = parse_article(url, source=source, timeout=ARTICLE_TIMEOUT)
+    ArticleStore.put(url, content)
+    return content
+
+def iter_articles(items: list[tuple[str, str]]) -> Iterator[tuple[int, str]]:
+    """
+    並行下載多篇新聞內文 (總並行數 ARTICLE_MAX_WORKERS、每個網站 ARTICLE_PER_HOST)，依「完成順序」回傳。
+    Args:
+        items (list): [(url, source), ...]
+    Yields:
+        tuple: (items 中的位置, 新聞內文)，失敗時內文為空字串
+    """
+    futures = {article_executor.submit(_fetch_article_limited, url, source): i for i, (url, source) in enumerate(items)}
+    for future in as_completed(futures):
+        try:
+            content = future.result()
+        except Exception as e:
+            Log(f"[新聞爬取] 錯誤：{e}", color=Color.RED)
+            content = ""
+        yield futures[future], content
+
+
+def article_word_counts(articles: list[tuple[str, str]]) -> list[Counter]:
+    """
+    取得多篇新聞的詞頻，已斷詞過的直接讀取 ArticleStore，其餘批次斷詞後存回。
+    Args:
+        articles (list): [(url, 內文), ...]
+    Returns:
+        list: 各篇的 Counter (與輸入順序相同)
+    """
+    version = Tokenizer.version()
+    counts: list = [None] * len(articles)
+    missing = []
+    for i, (url, _) in enumerate(articles):
+        stored = ArticleStore.get_tokens(url, version)
+        if stored is None:
+            missing.append(i)
+        else:
+            counts[i] = Counter(stored)
+
+    for i, tokens in zip(missing, Tokenizer.tokenize_many(articles[i][1] for i in missing)):
+        ArticleStore.put_tokens(articles[i][0], version, dict(tokens))
+        counts[i] = tokens
+    return counts
+
 def stock_news_split_word(stock_id: str):
     """
     對指定股票的新聞內容 進行斷詞處理。
+    各篇詞頻分開保存，詞雲為各篇詞頻合併 (近似重複的新聞只算一次) 後再依門檻過濾；相同新聞組合直接使用快取結果。
     """
     from services.news_data import FetchStockNews
-    df = FetchStockNews(stock_id, num=15)  # 取得新聞資料
-    text = ' '.join(df['Content'].dropna())
-    clean_text = re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9\s]', '', text)  # 移除非中文字、英文字母和數字
-    cut_text = ' '.join(jieba.cut(clean_text))  # 斷詞
-    filtered_words = [word for word in cut_text.split() if ((word not in stopwords_set) and (len(word) > 1) and (not word.isdigit()))]
-    word_counts = Counter(filtered_words)  # 計算詞頻
-    threshold = max(4, len(filtered_words) // 700)
-    filtered_counts = {word: count for word, count in word_counts.items() if count >= threshold}
+    df = FetchStockNews(stock_id, num=15, include_url=True)  # 取得新聞資料
+    articles = [(url, content) for url, content in zip(df['Url'], df['Content']) if isinstance(content, str) and content]
+    articles = [articles[i] for i in simhash.dedupe([content for _, content in articles], ArticleStore.DUPLICATE_DISTANCE)]  # 轉載的相同新聞只算一次
+    df = df.drop(columns=['Url'])
+
+    cache_key = (Tokenizer.version(), frozenset(url for url, _ in articles))
+    filtered_counts = word_cloud_cache.get(cache_key)
+    if filtered_counts is None:
+        word_counts = Counter()
+        for counts in article_word_counts(articles):
+            word_counts.update(counts)  # 計算詞頻
+        threshold = max(4, sum(word_counts.values()) // 700)
+        filtered_counts = {word: count for word, count in word_counts.items() if count >= threshold}
+        word_cloud_cache.set(cache_key, filtered_counts)
     return df, filtered_counts
+
+
+def index_articles(articles) -> None:
+    """
+    將新聞加入全文索引 (已索引過的略過，但補建時以儲存時間暫代的發布時間會改為真實時間)。
+    Args:
+        articles (iterable): [(url, 內文, 標題, 發布時間戳), ...]
+    """
+    articles = {url: (content, title, timestamp) for url, content, title, timestamp in articles
+                if url and isinstance(content, str) and content}
+    missing = NewsIndex.missing(articles)
+    indexed = set(articles) - set(missing)
+    NewsIndex.update_publish_times((url, articles[url][2], articles[url][1]) for url in indexed)
+    if not missing:
+        return
+    counts = article_word_counts([(url, articles[url][0]) for url in missing])
+    for url, tokens in zip(missing, counts):
+        _, title, timestamp = articles[url]
+        NewsIndex.add(url, tokens, publish_time=float(timestamp), title=title)
+
+def backfill_news_index(batch: int = 200) -> int:
+    """
+    為 ArticleStore 中尚未索引的新聞建立索引。
+    ArticleStore 沒有發布時間，先以儲存時間暫代並標記，日期篩選不會納入，之後 index_articles 取得真實時間時更新。
+    Returns:
+        int: 新建立索引的篇數
+    """
+    total = 0
+    while rows := NewsIndex.unindexed(limit=batch):
+        contents = ArticleStore.get_many(url for url, _ in rows)
+        counts = article_word_counts([(url, contents.get(url, "")) for url, _ in rows])
+        for (url, stored_at), tokens in zip(rows, counts):
+            NewsIndex.add(url, tokens, publish_time=stored_at, time_estimated=True)
+        total += len(rows)
+    if total:
+        Log(f"[新聞索引] 補建索引 {total} 篇", color=Color.GREEN, reload_only=True)
+    return total
+
+def search_news(query: str, start: str = None, end: str = None, limit: int = 10) -> pd.DataFrame:
+    """
+    在本地已收錄的新聞中以 BM25 全文搜尋 (不即時爬取)。
+    Args:
+        query (str): 查詢字串，例如 "台積電 CoWoS"
+        start (str): 起始日期 (YYYY-MM-DD)，預設不限
+        end (str): 結束日期 (YYYY-MM-DD，含當天)，預設不限
+        limit (int): 回傳筆數
+    Returns:
+        DataFrame: 日期、標題、內文摘錄、網址、分數
+    """
+    def to_timestamp(date_str, days=0):
+        if not date_str:
+            return None
+        day = datetime.strptime(date_str, "%Y-%m-%d").replace(tzinfo=TaiwanTime.TIMEZONE) + timedelta(days=days)
+        return day.timestamp()
+
+    terms = list(Tokenizer.tokenize(query)) or query.split()
+    results = NewsIndex.search(terms, start=to_timestamp(start), end=to_timestamp(end, days=1) - 1 if end else None, limit=limit)
+
+    col = ['Date', 'Title', 'Content', 'Url', 'Score']
+    contents = ArticleStore.get_many(r['url'] for r in results)
+    data = [
+        [
+            datetime.fromtimestamp(r['publish_time'], tz=TaiwanTime.TIMEZONE).strftime("%Y-%m-%d %H:%M"),
+            r['title'],
+            contents.get(r['url'], "")[:SEARCH_SNIPPET_CHARS],
+            r['url'],
+            r['score'],
+        ]
+        for r in results
+    ]
+    return pd.DataFrame(data, columns=col)
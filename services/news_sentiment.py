@@ -2,16 +2,22 @@ import pandas as pd
 from transformers import BertTokenizer, BertForSequenceClassification
 import torch
 import gc
+import time
+from typing import Optional
 
+from util.article_store import ArticleStore
 from util.logger import Log, Color
 from util.data_manager import DataManager
-from services.news_data import get_udn_news_summary, parse_article
+from util.sentiment_aggregate import SentimentAggregate
+from services.news_data import get_udn_news_summary, index_articles, iter_articles
 
 # 模型 (HuggingFace 路徑)
 model_name = "Ynn22/news_model"
 tokenizer = BertTokenizer.from_pretrained(model_name)
 model = BertForSequenceClassification.from_pretrained(model_name)
 
+NEWS_REFRESH_MINUTES = 30   # 滾動平均多久重新檢查一次最新新聞
+
 @torch.no_grad()
 def predict_sentiment(text: str) -> torch.Tensor:
     """
@@ -48,19 +54,33 @@ def predict_sentiment(text: str) -> torch.Tensor:
     return avg_probs
 
 
+def _duplicate_score(url: str, text: str) -> Optional[list]:
+    """若已有近似重複的新聞算過分數，回傳其 [正向, 中立, 負向]。"""
+    if not url or not text:
+        return None
+    duplicate_url = ArticleStore.find_duplicate(url, text)
+    if duplicate_url is None:
+        return None
+    cached = DataManager.get_news_score(url=duplicate_url, include_content=False)
+    if not cached:
+        return None
+    score = [cached.get("positive"), cached.get("neutral"), cached.get("negative")]
+    if any(v is None for v in score):
+        return None
+    Log(f"[情感分析] 重複新聞，沿用 {duplicate_url} 的分數", reload_only=True)
+    return score
+
 def cal_news_sentiment(stock_id: str, page: int=1) -> pd.DataFrame:
     """
     計算個股的新聞情感分數
     """
     news_summary_df = get_udn_news_summary(stock_id, page=page).iloc[:10]
     
-    scores = []
-    contents = []
+    scores = [None] * len(news_summary_df)
+    contents = [None] * len(news_summary_df)
+    pending = []    # 沒有快取、需要下載並推論的新聞位置
     for i in range(len(news_summary_df)):
         url = news_summary_df['Url'].iloc[i]
-        source = news_summary_df['Source'].iloc[i]
-        title = news_summary_df['Title'].iloc[i]
-        timestamp = news_summary_df['TimeStamp'].iloc[i]
 
         cached = None
         if url:
@@ -74,18 +94,27 @@ def cal_news_sentiment(stock_id: str, page: int=1) -> pd.DataFrame:
             ]
             cached_content = cached_data.get("content")
             if cached_content and all(v is not None for v in cached_score):
-                scores.append(cached_score)
-                contents.append(cached_content)
+                scores[i] = cached_score
+                contents[i] = cached_content
                 continue
+        pending.append(i)
 
-        Log(f"[情感分析] 新聞處理中：{i+1}/{len(news_summary_df)}   ", end="\r", reload_only=True)
-        text = parse_article(url, source=source)
+    # 並行下載新聞，每篇一下載完成就進行情感推論
+    items = [(news_summary_df['Url'].iloc[i], news_summary_df['Source'].iloc[i]) for i in pending]
+    for done, (j, text) in enumerate(iter_articles(items), start=1):
+        i = pending[j]
+        url = news_summary_df['Url'].iloc[i]
+        Log(f"[情感分析] 新聞處理中：{done}/{len(pending)}   ", end="\r", reload_only=True)
 
         try:
-            score = predict_sentiment(text)
-            score_list = score.cpu().tolist()  # 從GPU搬回CPU，避免堆積
-            scores.append(score_list)
-            contents.append(text)
+            duplicate = _duplicate_score(url, text)
+            if duplicate is not None:
+                score_list = duplicate     # 轉載的相同新聞直接沿用已計算的分數
+            else:
+                score = predict_sentiment(text)
+                score_list = score.cpu().tolist()  # 從GPU搬回CPU，避免堆積
+            scores[i] = score_list
+            contents[i] = text
 
             if url:
                 DataManager.save_news_score(
@@ -94,15 +123,24 @@ def cal_news_sentiment(stock_id: str, page: int=1) -> pd.DataFrame:
                     neutral=score_list[1],
                     negative=score_list[2],
                     content=text,
-                    title=title,
-                    publish_time=timestamp,
+                    title=news_summary_df['Title'].iloc[i],
+                    publish_time=news_summary_df['TimeStamp'].iloc[i],
                 )
         except Exception as e:
             Log(f"[情感分析] Error At {i}: {e}", color=Color.RED)
-            scores.append([None, None, None])
-            contents.append(None)
+            scores[i] = [None, None, None]
+            contents[i] = None
         torch.cuda.empty_cache()  # 清理記憶體
         gc.collect()
+    # 計入該股票的滾動加權平均
+    aggregate_id = stock_id.split('.')[0]
+    for i, score in enumerate(scores):
+        url = news_summary_df['Url'].iloc[i]
+        if url and score and all(v is not None for v in score):
+            SentimentAggregate.add(aggregate_id, url, float(news_summary_df['TimeStamp'].iloc[i]), *score)
+    SentimentAggregate.touch(aggregate_id)
+    index_articles(zip(news_summary_df['Url'], contents, news_summary_df['Title'], news_summary_df['TimeStamp']))
+
     score_df = pd.DataFrame(scores, columns=['positive', 'neutral', 'negative'])
     score_df["content"] = contents
     score_df.index = news_summary_df.index
@@ -131,24 +169,34 @@ def classify_sentiment(pos, neu, neg):
 
 def total_news_sentiment(stock_id: str, page: int = 1) -> dict:
     """
-    計算個股的總體新聞情感分數
+    計算個股的總體新聞情感分數 (依發布時間衰減加權的滾動平均)。
+    距上次檢查超過 NEWS_REFRESH_MINUTES 才重新抓取新聞並計入新文章。
+    回傳的 count (計入篇數) 與 latest (最新新聞時間戳) 可用來判斷滾動平均是否有變動。
     """
-    sentiment_df = cal_news_sentiment(stock_id, page=page)
-    contents = sentiment_df['content'].dropna().tolist() if not sentiment_df.empty else []
+    aggregate_id = stock_id.split('.')[0]
+    aggregate = SentimentAggregate.get(aggregate_id)
+    if aggregate is None or time.time() - aggregate["checked_at"] > NEWS_REFRESH_MINUTES * 60:
+        cal_news_sentiment(stock_id, page=page)
+        aggregate = SentimentAggregate.get(aggregate_id)
 
-    if sentiment_df.empty:
+    if aggregate is None:
         return {
             "direction_label": "無資料",
             "direction": 0,
             "positive": 0,
             "neutral": 0,
             "negative": 0,
+            "count": 0,
+            "latest": None,
             "contents": []
         }
 
-    avg_pos = sentiment_df['positive'].mean()
-    avg_neu = sentiment_df['neutral'].mean()
-    avg_neg = sentiment_df['negative'].mean()
+    recent = ArticleStore.get_many(SentimentAggregate.recent_urls(aggregate_id, limit=10))
+    contents = list(recent.values())
+
+    avg_pos = aggregate['positive']
+    avg_neu = aggregate['neutral']
+    avg_neg = aggregate['negative']
     overall, score = classify_sentiment(avg_pos, avg_neu, avg_neg)
 
     return {
@@ -157,5 +205,7 @@ def total_news_sentiment(stock_id: str, page: int = 1) -> dict:
         "positive": avg_pos,
         "neutral": avg_neu,
         "negative": avg_neg,
+        "count": aggregate["count"],
+        "latest": aggregate["latest"],
         "contents": contents,
     }
@@ -1,11 +1,40 @@
 import numpy as np
 import pandas as pd
 import datetime
+from typing import Optional
 from stockstats import StockDataFrame as Sdf
 
 from util.logger import Log, Color
 from util.nowtime import TaiwanTime
-from util.stock_list import StockList
+from util.rule_engine import RuleSet, ScoreRule, LabelRule, StatusRule
+
+# stockstats 指標名稱 → 輸出欄位名稱
+SDF_INDICATOR_NAMES = {
+    'close':'Close',
+    'open':'Open',
+    'high':'High',
+    'low':'Low',
+    'volume':'Volume',
+    'close_5_sma':'SMA_5',
+    'close_10_sma':'SMA_10',
+    'close_20_sma':'SMA_20',
+    'close_60_sma':'SMA_60',
+    'close_5_ema':'EMA_5',
+    'close_10_ema':'EMA_10',
+    'close_20_ema':'EMA_20',
+    'macd': 'MACD',
+    'macds': 'Signal Line',
+    'macdh': 'Histogram',
+    'kdjk': '%K',
+    'kdjd': '%D',
+    'rsi_5': 'RSI_5',
+    'rsi_10': 'RSI_10',
+    'close_5_roc': 'ROC',
+    'boll_ub': 'BOLL_UPPER',
+    'boll': 'BOLL_MIDDLE',
+    'boll_lb': 'BOLL_LOWER',
+    'change': 'PCT'
+}
 
 def get_technical_indicators(data, sdf_indicator_list):
     """
@@ -14,32 +43,6 @@ def get_technical_indicators(data, sdf_indicator_list):
         data(DataFrame): 股價歷史資料
         sdf_indicator_list (list): 欲計算的技術指標清單
     """
-    indicator_dict = {
-        'close':'Close',
-        'open':'Open',
-        'high':'High',
-        'low':'Low',
-        'volume':'Volume',
-        'close_5_sma':'SMA_5',
-        'close_10_sma':'SMA_10',
-        'close_20_sma':'SMA_20',
-        'close_60_sma':'SMA_60',
-        'close_5_ema':'EMA_5',
-        'close_10_ema':'EMA_10',
-        'close_20_ema':'EMA_20',
-        'macd': 'MACD',
-        'macds': 'Signal Line',
-        'macdh': 'Histogram',
-        'kdjk': '%K',
-        'kdjd': '%D',
-        'rsi_5': 'RSI_5',
-        'rsi_10': 'RSI_10',
-        'close_5_roc': 'ROC',
-        'boll_ub': 'BOLL_UPPER',
-        'boll': 'BOLL_MIDDLE',
-        'boll_lb': 'BOLL_LOWER',
-        'change': 'PCT'
-    }
 
     # 計算技術指標
     stock_df = Sdf.retype(data)
@@ -58,7 +61,7 @@ def get_technical_indicators(data, sdf_indicator_list):
     # 取出需要的指標資料
     indicator_data = stock_df[valid_indicators].copy()
     
-    indicator_data.rename(columns=indicator_dict, inplace=True)  # 將指標名稱轉換
+    indicator_data.rename(columns=SDF_INDICATOR_NAMES, inplace=True)  # 將指標名稱轉換
     indicator_data = indicator_data.round(2)
     
     # 避免重複：只保留 data 裡沒有的欄位
@@ -68,160 +71,192 @@ def get_technical_indicators(data, sdf_indicator_list):
     return indicator_data
 
 
-def calculate_technical_indicators(stock_id: str):
-    from services.stock_data import getStockPrice
-    
-    stock_id, _ = StockList.query_from_yahoo(stock_id)
-    df = getStockPrice(symbol=stock_id, 
-                        start='2024-06-10', 
-                        chip_enable=False,
-                        sdf_indicator_list=['close_5_ema', 'close_10_ema','macd', 'macds', 'macdh','kdjk', 'kdjd', 'rsi_5','close_5_roc','close_6_sma'])
-    # 收盤前 → 排除今天資料
-    if TaiwanTime.now().time() < datetime.time(14, 00):  df = df[df.index < TaiwanTime.string(time=False)]
-    df.rename(columns={'close_6_sma': 'SMA_6', 'RSI_5': 'RSI'}, inplace=True, errors='ignore')
+def _cross_up(fast: str, slow: str):
+    """前一期 fast < slow 且本期 fast >= slow (黃金交叉)"""
+    return lambda c: (c.prev(fast) < c.prev(slow)) & (c[fast] >= c[slow])
+
+def _cross_down(fast: str, slow: str):
+    """前一期 fast > slow 且本期 fast <= slow (死亡交叉)"""
+    return lambda c: (c.prev(fast) > c.prev(slow)) & (c[fast] <= c[slow])
+
+TECH_SCORE_TAIL = 10   # /tech/score 僅計算最近 N 筆 (與提供給 AI 的近期走勢筆數相同)
+TECH_LABELS = ['極空', '偏空', '偏多', '極多']
+
+TECH_RULES = RuleSet(
+    score_rules=[
+        # EMA條件
+        ScoreRule('EMA_Score', lambda c: c['EMA_5'] >= c['EMA_10'], 0.7, -0.7),
+        ScoreRule('EMA_Score', lambda c: c['EMA_5'] >= c.prev('EMA_5'), 0.7, -0.7),
+        ScoreRule('EMA_Score', _cross_up('EMA_5', 'EMA_10'), 1),
+        ScoreRule('EMA_Score', _cross_down('EMA_5', 'EMA_10'), -1),
+        # MACD條件
+        ScoreRule('MACD_Score', lambda c: c['MACD'] >= c['Signal Line'], 0.7, -0.7),
+        ScoreRule('MACD_Score', lambda c: c['MACD'] >= c.prev('MACD'), 0.5, -0.5),
+        ScoreRule('MACD_Score', lambda c: c['Signal Line'] >= c.prev('Signal Line'), 0.5, -0.5),
+        ScoreRule('MACD_Score', _cross_up('MACD', 'Signal Line'), 1),
+        ScoreRule('MACD_Score', _cross_down('MACD', 'Signal Line'), -1),
+        ScoreRule('MACD_Score', lambda c: c['Histogram'] >= c.prev('Histogram'), 0.3, -0.3),
+        # KD條件
+        ScoreRule('KD_Score', lambda c: c['%K'] >= c['%D'], 0.7, -0.7),
+        ScoreRule('KD_Score', lambda c: c['%K'] >= c.prev('%K'), 0.5, -0.5),
+        ScoreRule('KD_Score', lambda c: c['%D'] >= c.prev('%D'), 0.5, -0.5),
+        ScoreRule('KD_Score', lambda c: (c['%K'] > 80) & (c['%D'] > 80), -0.5),
+        ScoreRule('KD_Score', lambda c: (c['%K'] < 20) & (c['%D'] < 20), 0.5),
+        ScoreRule('KD_Score', _cross_up('%K', '%D'), 1),
+        ScoreRule('KD_Score', _cross_down('%K', '%D'), -1),
+        # RSI條件
+        ScoreRule('RSI_Score', lambda c: c['RSI'] > 70, -0.5),
+        ScoreRule('RSI_Score', lambda c: c['RSI'] < 30, 0.5),
+        ScoreRule('RSI_Score', lambda c: c['RSI'] > c.prev('RSI'), 0.5, -0.5),
+        # ROC條件
+        ScoreRule('ROC_Score', lambda c: c['ROC'] > c.prev('ROC'), 0.5, -0.5),
+        ScoreRule('ROC_Score', lambda c: (c['ROC'] > 0) & (c.prev('ROC') < 0), 0.7),
+        ScoreRule('ROC_Score', lambda c: (c['ROC'] < 0) & (c.prev('ROC') > 0), -0.7),
+        # BIAS條件
+        ScoreRule('BIAS_Score', lambda c: c['BIAS'] > c.prev('BIAS'), 0.5, -0.5),
+        ScoreRule('BIAS_Score', lambda c: (c['BIAS'] > 0) & (c.prev('BIAS') < 0), 0.7),
+        ScoreRule('BIAS_Score', lambda c: (c['BIAS'] < 0) & (c.prev('BIAS') > 0), -0.7),
+    ],
+    total_column='TotalScore',
+    label_rules=[
+        # 各指標評級標籤
+        LabelRule('EMA_label', 'EMA_Score', [-np.inf, -1.01, 0, 1, np.inf], TECH_LABELS),
+        LabelRule('MACD_label', 'MACD_Score', [-np.inf, -1.21, 0, 1.2, np.inf], TECH_LABELS),
+        LabelRule('KD_label', 'KD_Score', [-np.inf, -1.21, 0, 1.2, np.inf], TECH_LABELS),
+        LabelRule('RSI_label', 'RSI_Score', [-np.inf, -0.51, 0, 0.5, np.inf], TECH_LABELS),
+        LabelRule('ROC_label', 'ROC_Score', [-np.inf, -0.51, 0, 0.5, np.inf], TECH_LABELS),
+        LabelRule('BIAS_label', 'BIAS_Score', [-np.inf, -0.51, 0, 0.5, np.inf], TECH_LABELS),
+        # 總分評級
+        LabelRule('direction', 'TotalScore', [-np.inf, -3, 0, 3, np.inf], [-2, -1, 1, 2], right=False),
+        LabelRule('direction_label', 'TotalScore', [-np.inf, -3, 0, 3, np.inf], TECH_LABELS, right=False),
+    ],
+    status_rules=[
+        # EMA 狀態描述
+        StatusRule('EMA_Status', {
+            "黃金交叉": _cross_up('EMA_5', 'EMA_10'),
+            "死亡交叉": _cross_down('EMA_5', 'EMA_10'),
+            "多頭排列 & 快線向上": lambda c: (c['EMA_5'] >= c['EMA_10']) & (c['EMA_5'] >= c.prev('EMA_5')),
+            "空頭排列 & 快線向下": lambda c: (c['EMA_5'] <= c['EMA_10']) & (c['EMA_5'] <= c.prev('EMA_5')),
+            "多頭排列 & 快線向下": lambda c: (c['EMA_5'] >= c['EMA_10']) & (c['EMA_5'] < c.prev('EMA_5')),
+            "空頭排列 & 快線向上": lambda c: (c['EMA_5'] <= c['EMA_10']) & (c['EMA_5'] > c.prev('EMA_5')),
+        }, default="整理中"),
+        # MACD 狀態描述
+        StatusRule('MACD_Status', {
+            "黃金交叉": _cross_up('MACD', 'Signal Line'),
+            "死亡交叉": _cross_down('MACD', 'Signal Line'),
+            "快線>慢線 & 柱狀圖增強": lambda c: (c['MACD'] >= c['Signal Line']) & (c['Histogram'] >= c.prev('Histogram')),
+            "快線<慢線 & 柱狀圖增強": lambda c: (c['MACD'] <= c['Signal Line']) & (c['Histogram'] <= c.prev('Histogram')),
+            "快線>慢線 & 柱狀圖減弱": lambda c: (c['MACD'] >= c['Signal Line']) & (c['Histogram'] < c.prev('Histogram')),
+            "快線<慢線 & 柱狀圖減弱": lambda c: (c['MACD'] <= c['Signal Line']) & (c['Histogram'] > c.prev('Histogram')),
+        }, default="整理中"),
+        # KD 狀態描述
+        StatusRule('KD_Status', {
+            "超買區死亡交叉": lambda c: _cross_down('%K', '%D')(c) & (c['%K'] > 80) & (c['%D'] > 80),
+            "超賣區黃金交叉": lambda c: _cross_up('%K', '%D')(c) & (c['%K'] < 20) & (c['%D'] < 20),
+            "黃金交叉": _cross_up('%K', '%D'),
+            "死亡交叉": _cross_down('%K', '%D'),
+            "超買區鈍化/盤整": lambda c: (c['%K'] > 80) & (c['%D'] > 80),
+            "超賣區鈍化/盤整": lambda c: (c['%K'] < 20) & (c['%D'] < 20),
+            "K>D & K向上": lambda c: (c['%K'] >= c['%D']) & (c['%K'] >= c.prev('%K')),
+            "K<D & K向下": lambda c: (c['%K'] <= c['%D']) & (c['%K'] <= c.prev('%K')),
+        }, default="整理中"),
+        # RSI 狀態描述
+        StatusRule('RSI_Status', {
+            "超買區高點回落": lambda c: (c['RSI'] > 70) & (c['RSI'] <= c.prev('RSI')),
+            "超買區持續走高": lambda c: (c['RSI'] > 70) & (c['RSI'] > c.prev('RSI')),
+            "超賣區低點回升": lambda c: (c['RSI'] < 30) & (c['RSI'] >= c.prev('RSI')),
+            "超賣區持續走低": lambda c: (c['RSI'] < 30) & (c['RSI'] < c.prev('RSI')),
+            "中性區間走高": lambda c: c['RSI'] > c.prev('RSI'),
+            "中性區間走低": lambda c: c['RSI'] < c.prev('RSI'),
+        }, default="整理中"),
+        # ROC 狀態描述
+        StatusRule('ROC_Status', {
+            "由負轉正": lambda c: (c['ROC'] > 0) & (c.prev('ROC') <= 0),
+            "由正轉負": lambda c: (c['ROC'] < 0) & (c.prev('ROC') >= 0),
+            "正值區持續增強": lambda c: (c['ROC'] > 0) & (c['ROC'] > c.prev('ROC')),
+            "負值區持續減弱": lambda c: (c['ROC'] < 0) & (c['ROC'] < c.prev('ROC')),
+            "正值區減弱/修正": lambda c: (c['ROC'] > 0) & (c['ROC'] <= c.prev('ROC')),
+            "負值區增強/修正": lambda c: (c['ROC'] < 0) & (c['ROC'] >= c.prev('ROC')),
+        }, default="零軸附近整理"),
+        # BIAS 狀態描述
+        StatusRule('BIAS_Status', {
+            "由負轉正": lambda c: (c['BIAS'] > 0) & (c.prev('BIAS') <= 0),
+            "由正轉負": lambda c: (c['BIAS'] < 0) & (c.prev('BIAS') >= 0),
+            "正乖離擴大": lambda c: (c['BIAS'] > 0) & (c['BIAS'] > c.prev('BIAS')),
+            "負乖離擴大": lambda c: (c['BIAS'] < 0) & (c['BIAS'] < c.prev('BIAS')),
+            "正乖離縮小": lambda c: (c['BIAS'] > 0) & (c['BIAS'] <= c.prev('BIAS')),
+            "負乖離縮小": lambda c: (c['BIAS'] < 0) & (c['BIAS'] >= c.prev('BIAS')),
+        }, default="零軸附近整理"),
+    ],
+)
+
+
+TECH_INDICATORS = ['close_5_ema', 'close_10_ema','macd', 'macds', 'macdh','kdjk', 'kdjd', 'rsi_5','close_5_roc','close_6_sma']
+
+
+def score_tech_frame(df: pd.DataFrame, tail: Optional[int] = None) -> pd.DataFrame:
+    """
+    依規則表計算技術面分數、評級與狀態描述。
+    Args:
+        df (DataFrame): 含 TECH_INDICATORS 指標欄位的股價資料 (舊到新)
+        tail (int): 僅計算最後 N 筆的分數與狀態，預設 None 代表計算全部歷史
+    Returns:
+        DataFrame: 含指標與分數欄位的資料，tail 模式只回傳最後 N 筆
+    """
+    df = df.rename(columns={'close_6_sma': 'SMA_6', 'RSI_5': 'RSI'}, errors='ignore')
     
     ma6 = df['SMA_6'] if 'SMA_6' in df.columns else df['Close'].rolling(6).mean()
     df['BIAS'] = ((df['Close'] - ma6) / ma6 * 100).round(2)    
     df = df.round(2)
 
-    # 初始化各指標評分欄位
-    df[['EMA_Score', 'MACD_Score', 'KD_Score', 'RSI_Score', 'ROC_Score', 'BIAS_Score']] = 0.0
-
-    #EMA條件
-    df['EMA_Score'] += np.where(df['EMA_5'] >= df['EMA_10'], 0.7, -0.7)
-    df['EMA_Score'] += np.where(df['EMA_5'] >= df['EMA_5'].shift(1), 0.7, -0.7)
-    df['EMA_Score'] += np.where((df['EMA_5'].shift(1) < df['EMA_10'].shift(1))&(df['EMA_5'] >= df['EMA_10']), 1, 0)
-    df['EMA_Score'] += np.where((df['EMA_5'].shift(1) > df['EMA_10'].shift(1))&(df['EMA_5'] <= df['EMA_10']), -1, 0)
-
-    #MACD條件
-    df['MACD_Score'] += np.where(df['MACD'] >= df['Signal Line'], 0.7, -0.7)
-    df['MACD_Score'] += np.where(df['MACD'] >= df['MACD'].shift(1), 0.5, -0.5)
-    df['MACD_Score'] += np.where(df['Signal Line'] >= df['Signal Line'].shift(1), 0.5, -0.5)
-    df['MACD_Score'] += np.where((df['MACD'].shift(1) < df['Signal Line'].shift(1))&(df['MACD'] >= df['Signal Line']), 1, 0)
-    df['MACD_Score'] += np.where((df['MACD'].shift(1) > df['Signal Line'].shift(1))&(df['MACD'] <= df['Signal Line']), -1, 0)
-    df['MACD_Score'] += np.where(df['Histogram'] >= df['Histogram'].shift(1), 0.3, -0.3)
-
-    #KD條件
-    df['KD_Score'] += np.where(df['%K'] >= df['%D'], 0.7, -0.7)
-    df['KD_Score'] += np.where(df['%K'] >= df['%K'].shift(1), 0.5, -0.5)
-    df['KD_Score'] += np.where(df['%D'] >= df['%D'].shift(1), 0.5, -0.5)
-    df['KD_Score'] += np.where((df['%K'] > 80) & (df['%D'] > 80), -0.5, 0)
-    df['KD_Score'] += np.where((df['%K'] < 20) & (df['%D'] < 20), 0.5, 0)
-    df['KD_Score'] += np.where((df['%K'].shift(1) < df['%D'].shift(1)) & (df['%K'] >= df['%D']), 1, 0)
-    df['KD_Score'] += np.where((df['%K'].shift(1) > df['%D'].shift(1)) & (df['%K'] <= df['%D']), -1, 0)
-
-    #RSI條件
-    df['RSI_Score'] += np.where(df['RSI'] > 70, -0.5, 0)
-    df['RSI_Score'] += np.where(df['RSI'] < 30, 0.5, 0)
-    df['RSI_Score'] += np.where(df['RSI'] > df['RSI'].shift(1), 0.5, -0.5)
-
-    #ROC條件
-    df['ROC_Score'] += np.where(df['ROC'] > df['ROC'].shift(1), 0.5, -0.5)
-    df['ROC_Score'] += np.where((df['ROC'] > 0) & (df['ROC'].shift(1) < 0), 0.7, 0)
-    df['ROC_Score'] += np.where((df['ROC'] < 0) & (df['ROC'].shift(1) > 0), -0.7, 0)
-
-    #BIAS條件
-    df['BIAS_Score'] += np.where(df['BIAS'] > df['BIAS'].shift(1), 0.5, -0.5)
-    df['BIAS_Score'] += np.where((df['BIAS'] > 0) & (df['BIAS'].shift(1) < 0), 0.7, 0)
-    df['BIAS_Score'] += np.where((df['BIAS'] < 0) & (df['BIAS'].shift(1) > 0), -0.7, 0)
-
-    # 總分
-    df['TotalScore'] = df[['EMA_Score','MACD_Score','KD_Score','RSI_Score','ROC_Score','BIAS_Score']].sum(axis=1)
-    
-    # 各指標評級標籤
-    df['EMA_label'] = pd.cut(df['EMA_Score'],  bins=[-np.inf, -1.01, 0, 1, np.inf], labels=['極空', '偏空', '偏多', '極多'])
-    df['MACD_label'] = pd.cut(df['MACD_Score'], bins=[-np.inf, -1.21, 0, 1.2, np.inf], labels=['極空', '偏空', '偏多', '極多'])
-    df['KD_label'] = pd.cut(df['KD_Score'], bins=[-np.inf, -1.21, 0, 1.2, np.inf], labels=['極空', '偏空', '偏多', '極多'])
-    df['RSI_label'] = pd.cut(df['RSI_Score'], bins=[-np.inf, -0.51, 0, 0.5, np.inf], labels=['極空', '偏空', '偏多', '極多'])
-    df['ROC_label'] = pd.cut(df['ROC_Score'], bins=[-np.inf, -0.51, 0, 0.5, np.inf], labels=['極空', '偏空', '偏多', '極多'])
-    df['BIAS_label'] = pd.cut(df['BIAS_Score'], bins=[-np.inf, -0.51, 0, 0.5, np.inf], labels=['極空', '偏空', '偏多', '極多'])
-    
-    # EMA 狀態描述
-    ema_rules = {
-        "黃金交叉": ( (df["EMA_5"].shift(1) < df["EMA_10"].shift(1)) & (df["EMA_5"] >= df["EMA_10"]) ),
-        "死亡交叉": ( (df["EMA_5"].shift(1) > df["EMA_10"].shift(1)) & (df["EMA_5"] <= df["EMA_10"]) ),
-        "多頭排列 & 快線向上": ( (df["EMA_5"] >= df["EMA_10"]) & (df["EMA_5"] >= df["EMA_5"].shift(1)) ),
-        "空頭排列 & 快線向下": ( (df["EMA_5"] <= df["EMA_10"]) & (df["EMA_5"] <= df["EMA_5"].shift(1)) ),
-        "多頭排列 & 快線向下": ( (df["EMA_5"] >= df["EMA_10"]) & (df["EMA_5"] < df["EMA_5"].shift(1)) ),
-        "空頭排列 & 快線向上": ( (df["EMA_5"] <= df["EMA_10"]) & (df["EMA_5"] > df["EMA_5"].shift(1)) ),
-    }
-    # 套用 EMA 狀態欄位
-    df["EMA_Status"] = np.select( list(ema_rules.values()), list(ema_rules.keys()), default="整理中" )
-
-
-    # MACD 狀態描述字典
-    macd_rules = {
-        "黃金交叉": ( (df["MACD"].shift(1) < df["Signal Line"].shift(1)) & (df["MACD"] >= df["Signal Line"]) ),
-        "死亡交叉": ( (df["MACD"].shift(1) > df["Signal Line"].shift(1)) & (df["MACD"] <= df["Signal Line"]) ),
-        "快線>慢線 & 柱狀圖增強": ( (df["MACD"] >= df["Signal Line"]) & (df["Histogram"] >= df["Histogram"].shift(1)) ),
-        "快線<慢線 & 柱狀圖增強": ( (df["MACD"] <= df["Signal Line"]) & (df["Histogram"] <= df["Histogram"].shift(1)) ),
-        "快線>慢線 & 柱狀圖減弱": ( (df["MACD"] >= df["Signal Line"]) & (df["Histogram"] < df["Histogram"].shift(1)) ),
-        "快線<慢線 & 柱狀圖減弱": ( (df["MACD"] <= df["Signal Line"]) & (df["Histogram"] > df["Histogram"].shift(1)) ),
-    }
-    # 套用 MACD 狀態欄位
-    df["MACD_Status"] = np.select( list(macd_rules.values()), list(macd_rules.keys()), default="整理中" )
-
-
-    # KD 狀態描述
-    kd_rules = {
-        "超買區死亡交叉": ( (df["%K"].shift(1) > df["%D"].shift(1)) & (df["%K"] <= df["%D"]) & (df["%K"] > 80) & (df["%D"] > 80) ),
-        "超賣區黃金交叉": ( (df["%K"].shift(1) < df["%D"].shift(1)) & (df["%K"] >= df["%D"]) & (df["%K"] < 20) & (df["%D"] < 20) ),
-        "黃金交叉": ( (df["%K"].shift(1) < df["%D"].shift(1)) & (df["%K"] >= df["%D"]) ),
-        "死亡交叉": ( (df["%K"].shift(1) > df["%D"].shift(1)) & (df["%K"] <= df["%D"]) ),
-        "超買區鈍化/盤整": ( (df["%K"] > 80) & (df["%D"] > 80) ),
-        "超賣區鈍化/盤整": ( (df["%K"] < 20) & (df["%D"] < 20) ),
-        "K>D & K向上": ( (df["%K"] >= df["%D"]) & (df["%K"] >= df["%K"].shift(1)) ),
-        "K<D & K向下": ( (df["%K"] <= df["%D"]) & (df["%K"] <= df["%K"].shift(1)) ),
-    }
-    # 新增 KD 狀態欄位
-    df["KD_Status"] = np.select( list(kd_rules.values()), list(kd_rules.keys()), default="整理中" )
-
-
-    # RSI 狀態描述
-    rsi_rules = {
-        "超買區高點回落": ( (df["RSI"] > 70) & (df["RSI"] <= df["RSI"].shift(1)) ),
-        "超買區持續走高": ( (df["RSI"] > 70) & (df["RSI"] > df["RSI"].shift(1)) ),
-        "超賣區低點回升": ( (df["RSI"] < 30) & (df["RSI"] >= df["RSI"].shift(1)) ),
-        "超賣區持續走低": ( (df["RSI"] < 30) & (df["RSI"] < df["RSI"].shift(1)) ),
-        "中性區間走高":  ( df["RSI"] > df["RSI"].shift(1) ),
-        "中性區間走低":  ( df["RSI"] < df["RSI"].shift(1) ),
-    }
-    # 套用 RSI 狀態欄位
-    df["RSI_Status"] = np.select( list(rsi_rules.values()), list(rsi_rules.keys()), default="整理中" )
-
-
-    # ROC 狀態描述
-    roc_rules = {
-        "由負轉正":        (df["ROC"] > 0) & (df["ROC"].shift(1) <= 0),
-        "由正轉負":        (df["ROC"] < 0) & (df["ROC"].shift(1) >= 0),
-        "正值區持續增強":   (df["ROC"] > 0) & (df["ROC"] > df["ROC"].shift(1)),
-        "負值區持續減弱":   (df["ROC"] < 0) & (df["ROC"] < df["ROC"].shift(1)),
-        "正值區減弱/修正":  (df["ROC"] > 0) & (df["ROC"] <= df["ROC"].shift(1)),
-        "負值區增強/修正":  (df["ROC"] < 0) & (df["ROC"] >= df["ROC"].shift(1)),
-    }
-    # 套用 ROC 狀態欄位
-    df["ROC_Status"] = np.select( list(roc_rules.values()), list(roc_rules.keys()), default="零軸附近整理" )
-
-
-    # BIAS 狀態描述
-    bias_rules = {
-        "由負轉正":    (df["BIAS"] > 0) & (df["BIAS"].shift(1) <= 0),
-        "由正轉負":    (df["BIAS"] < 0) & (df["BIAS"].shift(1) >= 0),
-        "正乖離擴大":  (df["BIAS"] > 0) & (df["BIAS"] > df["BIAS"].shift(1)),
-        "負乖離擴大":  (df["BIAS"] < 0) & (df["BIAS"] < df["BIAS"].shift(1)),
-        "正乖離縮小":  (df["BIAS"] > 0) & (df["BIAS"] <= df["BIAS"].shift(1)),
-        "負乖離縮小":  (df["BIAS"] < 0) & (df["BIAS"] >= df["BIAS"].shift(1)),
-    }
-    # 套用 BIAS 狀態欄位
-    df["BIAS_Status"] = np.select( list(bias_rules.values()), list(bias_rules.keys()), default="零軸附近整理" )
-
     # 評級
     df['result'] = (df['Close']>df['Close'].shift(1)).astype(int)
+
+    # 依規則表計算各指標分數、評級標籤與狀態描述
+    scores = TECH_RULES.evaluate(df, tail=tail)
+    if tail is not None:
+        df = df.iloc[-len(scores):]
+    df = pd.concat([df, scores], axis=1)
     df['accurate'] = ( (df['TotalScore'] > 0).astype(int) == df['result'].shift(-1) ).astype(int)
-    df['direction'] = pd.cut(df['TotalScore'], bins=[-np.inf, -3, 0, 3, np.inf], labels=[-2, -1, 1, 2], right=False).astype(int)
-    df['direction_label'] = pd.cut(df['TotalScore'], bins=[-np.inf, -3, 0, 3, np.inf], labels=['極空', '偏空', '偏多', '極多'], right=False)
+    return df
 
-    df = df.iloc[::-1]
+
+def build_tech_frame(stock_id: str, tail: Optional[int] = None) -> pd.DataFrame:
+    """
+    取得股價與技術指標，並依規則表計算分數、評級與狀態描述。
+    Args:
+        stock_id (str): 股票代號
+        tail (int): 僅計算最後 N 筆的分數與狀態，預設 None 代表計算全部歷史
+    Returns:
+        DataFrame: 含指標與分數欄位的資料 (舊到新)，tail 模式只回傳最後 N 筆
+    """
+    from services.stock_data import getStockPrice
+    from util.stock_list import StockList
+    
+    # tail 模式只縮短規則評分的範圍，股價仍下載完整 2 年：EMA / MACD / KD 為遞迴指標，
+    # 需完整暖機期才能與全量結果一致，start 只影響指標計算後回傳的筆數
+    # tail 模式只需多保留 1 筆作為 shift(1) 的前一期 (日曆天換算交易日，預留連假緩衝)
+    start = '2024-06-10' if tail is None else (TaiwanTime.now().date() - datetime.timedelta(days=tail * 2 + 20)).strftime("%Y-%m-%d")
+    stock_id, _ = StockList.query_from_yahoo(stock_id)
+    df = getStockPrice(symbol=stock_id, 
+                        start=start, 
+                        chip_enable=False,
+                        sdf_indicator_list=TECH_INDICATORS)
+    # 收盤前 → 排除今天資料
+    if TaiwanTime.now().time() < datetime.time(14, 00):  df = df[df.index < TaiwanTime.string(time=False)]
+    return score_tech_frame(df, tail=tail)
+
+
+def calculate_technical_indicators(stock_id: str, tail: Optional[int] = None):
+    """
+    計算股票技術面分數、評級與狀態描述。
+    Args:
+        stock_id (str): 股票代號
+        tail (int): 僅計算最後 N 筆的分數與狀態，預設 None 代表計算全部歷史
+    Returns:
+        tuple: (最新一筆資料 dict, 技術指標 DataFrame (新到舊))
+    """
+    df = build_tech_frame(stock_id, tail=tail).iloc[::-1]
 
     latestdata = df.iloc[0]
     latestdata_dict = latestdata.to_dict()
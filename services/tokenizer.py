@@ -0,0 +1,160 @@
+"""
+中文斷詞服務
+- 將 jieba 預設字典與股票名稱合併為 data/jieba_dict.txt，並把前綴字典快取於 data/ (marshal)
+  之後啟動只需讀取快取，不必逐一 add_word 或在第一次斷詞時建立字典
+- tokenize_many() 在文章數量多時改用 process pool 平行斷詞
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional
+
+import jieba
+
+from util.local_db import LocalDB
+from util.logger import Log, Color
+
+STOPWORDS_PATH = "data/stopWords_TW.txt"
+STOCK_NAME_PATH = "data/stockName.txt"
+DICT_NAME = "jieba_dict.txt"            # 合併後的字典 (data/ 底下)
+CACHE_NAME = "jieba_dict.cache"         # jieba 前綴字典快取 (data/ 底下)
+TOKENIZER_RULES_VERSION = "1"           # 清理/過濾規則變動時需更新
+
+CLEAN_PATTERN = re.compile(r'[^\u4e00-\u9fa5a-zA-Z0-9\s]')   # 移除非中文字、英文字母和數字
+
+jieba.setLogLevel(logging.WARNING)
+
+
+class Tokenizer:
+    """jieba 斷詞器單例 (含股票名稱字典與停用詞)"""
+
+    PARALLEL_MIN_TEXTS = 16         # 文章數達此數量才使用 process pool
+    MAX_PROCESSES = min(4, os.cpu_count() or 1)
+    _tokenizer: Optional[jieba.Tokenizer] = None
+    _stopwords: set = set()
+    _version: str = ""
+    _pool: Optional[ProcessPoolExecutor] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _read_lines(path: str) -> List[str]:
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+
+    @classmethod
+    def _build_dictionary(cls, dict_path: str, stock_names: List[str]) -> None:
+        """以 jieba 預設字典加上股票名稱 (頻率同 add_word 的建議值) 產生合併字典。"""
+        base = jieba.Tokenizer()
+        base.initialize()
+        for name in stock_names:
+            base.add_word(name)
+
+        tmp_path = f"{dict_path}.tmp"
+        with base.get_dict_file() as src, open(tmp_path, "wb") as dst:
+            dst.write(src.read().rstrip(b"\n") + b"\n")
+            dst.write("".join(f"{name} {base.FREQ[name]}\n" for name in stock_names).encode("utf-8"))
+        os.replace(tmp_path, dict_path)
+
+    @classmethod
+    def load(cls) -> jieba.Tokenizer:
+        """
+        載入斷詞器 (只會執行一次)。股票名稱清單比合併字典新時會重建字典。
+        Returns:
+            jieba.Tokenizer: 已初始化的斷詞器
+        """
+        if cls._tokenizer is not None:
+            return cls._tokenizer
+        with cls._lock:
+            if cls._tokenizer is not None:
+                return cls._tokenizer
+
+            stock_names = cls._read_lines(STOCK_NAME_PATH)
+            stopwords = set(cls._read_lines(STOPWORDS_PATH))
+
+            dict_path = LocalDB.path(DICT_NAME)
+            if not os.path.isfile(dict_path) or os.path.getmtime(dict_path) < os.path.getmtime(STOCK_NAME_PATH):
+                Log("[Tokenizer] 建立合併字典...", color=Color.YELLOW, reload_only=True)
+                cls._build_dictionary(dict_path, stock_names)
+
+            tokenizer = jieba.Tokenizer(dict_path)
+            tokenizer.tmp_dir = LocalDB.DATA_DIR
+            tokenizer.cache_file = CACHE_NAME
+            tokenizer.initialize()
+
+            digest = hashlib.sha1("\n".join(stock_names + sorted(stopwords)).encode("utf-8")).hexdigest()[:8]
+            cls._version = f"{TOKENIZER_RULES_VERSION}-{digest}"
+            cls._stopwords = stopwords
+            cls._tokenizer = tokenizer
+            Log("[Tokenizer] 斷詞字典載入完成", color=Color.GREEN, reload_only=True)
+            return tokenizer
+
+    @classmethod
+    def version(cls) -> str:
+        """斷詞結果的版本 (規則 + 字典 + 停用詞)，用於判斷已儲存的詞頻是否仍有效。"""
+        cls.load()
+        return cls._version
+
+    @classmethod
+    def cut(cls, text: str) -> List[str]:
+        """斷詞 (不做過濾)。"""
+        return cls.load().lcut(text)
+
+    @classmethod
+    def tokenize(cls, text: str) -> Counter:
+        """
+        對單篇內文清理、斷詞，並過濾停用詞、單字與純數字。
+        Returns:
+            Counter: 詞頻
+        """
+        tokenizer = cls.load()
+        clean_text = CLEAN_PATTERN.sub('', text)
+        cut_text = ' '.join(tokenizer.cut(clean_text))
+        return Counter(
+            word for word in cut_text.split()
+            if ((word not in cls._stopwords) and (len(word) > 1) and (not word.isdigit()))
+        )
+
+    @classmethod
+    def _get_pool(cls) -> ProcessPoolExecutor:
+        with cls._lock:
+            if cls._pool is None:
+                # forkserver 只預先載入本模組 (jieba)，子 process 由其 fork 而來，不帶入主服務其他執行緒持有的鎖
+                # 不支援 forkserver 的平台 (Windows) 改用 spawn
+                if "forkserver" in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context("forkserver")
+                    context.set_forkserver_preload([__name__])
+                else:
+                    context = multiprocessing.get_context("spawn")
+                cls._pool = ProcessPoolExecutor(
+                    max_workers=cls.MAX_PROCESSES,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(LocalDB.DATA_DIR,),
+                )
+            return cls._pool
+
+    @classmethod
+    def tokenize_many(cls, texts: Iterable[str]) -> List[Counter]:
+        """
+        批次斷詞，依輸入順序回傳詞頻。文章數量少時直接在目前 process 處理。
+        """
+        texts = list(texts)
+        if len(texts) < cls.PARALLEL_MIN_TEXTS or cls.MAX_PROCESSES < 2:
+            return [cls.tokenize(text) for text in texts]
+        cls.load()  # 確保字典與快取檔已建立，子 process 只需讀取快取
+        chunksize = max(1, len(texts) // (cls.MAX_PROCESSES * 4))
+        return list(cls._get_pool().map(_tokenize_worker, texts, chunksize=chunksize))
+
+
+def _init_worker(data_dir: str) -> None:
+    """子 process 使用與主 process 相同的 data/ 目錄讀取字典快取。"""
+    LocalDB.DATA_DIR = data_dir
+    Tokenizer.load()
+
+def _tokenize_worker(text: str) -> Counter:
+    return Tokenizer.tokenize(text)
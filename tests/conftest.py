@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from util.local_db import LocalDB  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def local_db(tmp_path, monkeypatch):
+    """每個測試使用獨立的 data/ 目錄，並重新建立資料表。"""
+    monkeypatch.setattr(LocalDB, "DATA_DIR", str(tmp_path))
+    for conn in getattr(LocalDB._local, "connections", {}).values():
+        conn.close()
+    LocalDB._local.connections = {}
+    from util.chip_store import ChipStore
+    monkeypatch.setattr(ChipStore, "_initialized", False)
+    yield tmp_path
+    for conn in LocalDB._local.connections.values():
+        conn.close()
+    LocalDB._local.connections = {}
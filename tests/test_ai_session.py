@@ -0,0 +1,58 @@
+import json
+import sqlite3
+
+import pytest
+
+from util.ai_session import ConversationSession
+from util.local_db import LocalDB
+
+
+@pytest.fixture(autouse=True)
+def session_db(monkeypatch):
+    monkeypatch.setattr(ConversationSession, "_initialized", False)
+
+
+def turn(question: str, answer: str) -> list:
+    return [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+
+
+def test_keeps_recent_turns():
+    session = ConversationSession("s1", max_turns=2)
+    for i in range(4):
+        session._add_items(turn(f"q{i}", f"a{i}"))
+
+    items = session._get_items(None)
+    assert [item["content"] for item in items] == ["q2", "a2", "q3", "a3"]
+    assert session._pop_item()["content"] == "a3"
+
+
+def test_migrates_legacy_sqlite_session(monkeypatch):
+    monkeypatch.setattr("util.ai_session.env.SESSION_MAX_ITEMS", 2)
+    # 舊版 agents SDK SQLiteSession 的資料表
+    legacy = sqlite3.connect(LocalDB.path(ConversationSession.DB_NAME))
+    legacy.executescript(
+        """
+        CREATE TABLE agent_sessions (session_id TEXT PRIMARY KEY, created_at TIMESTAMP, updated_at TIMESTAMP);
+        CREATE TABLE agent_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL,
+            message_data TEXT NOT NULL, created_at TIMESTAMP
+        );
+        """
+    )
+    rows = [("old", json.dumps(item)) for i in range(3) for item in turn(f"q{i}", f"a{i}")]
+    rows.append(("other", json.dumps({"role": "user", "content": "hi"})))
+    legacy.executemany("INSERT INTO agent_messages (session_id, message_data) VALUES (?, ?)", rows)
+    legacy.commit()
+    legacy.close()
+
+    items = ConversationSession("old")._get_items(None)
+    assert [item["content"] for item in items] == ["q1", "a1", "q2", "a2"]
+    assert ConversationSession("other")._get_items(None) == [{"role": "user", "content": "hi"}]
+
+    # 新增的項目接續舊紀錄的回合
+    session = ConversationSession("old")
+    session._add_items(turn("q3", "a3"))
+    assert [item["content"] for item in session._get_items(None)] == ["q2", "a2", "q3", "a3"]
+
+    tables = {name for (name,) in LocalDB.connect(ConversationSession.DB_NAME).execute("SELECT name FROM sqlite_master")}
+    assert "agent_messages" not in tables and "agent_sessions" not in tables
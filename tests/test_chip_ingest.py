@@ -0,0 +1,195 @@
+import json
+import os
+from datetime import date
+
+import pytest
+
+from services.chip_ingest import (
+    ChipIngestor,
+    parse_chip_report,
+    parse_tpex_margin_report,
+    parse_twse_margin_report,
+)
+from util.chip_store import ChipStore
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "chip")
+
+# 上游網址片段 → 報表檔案
+FIXTURES = {
+    "fund/T86": "twse_t86_20261014.json",
+    "marginTrading/MI_MARGN": "twse_mi_margn_20261014.json",
+    "insti/dailyTrade": "tpex_daily_trade_20261014.json",
+    "margin/balance": "tpex_margin_balance_20261014.json",
+}
+
+
+def load_fixture(name: str) -> dict:
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FakeUpstream:
+    """以本地報表代替 TWSE/TPEx，overrides 可指定某些網址回傳的報表。"""
+
+    def __init__(self, overrides: dict = None):
+        self.overrides = overrides or {}
+        self.calls = []
+
+    def __call__(self, url: str) -> dict:
+        self.calls.append(url)
+        for fragment, name in {**FIXTURES, **self.overrides}.items():
+            if fragment in url:
+                return load_fixture(name)
+        raise AssertionError(f"unexpected url: {url}")
+
+
+@pytest.fixture
+def final_date(monkeypatch):
+    """預設已定案至 2026-10-14 (週三)。"""
+    value = {"date": "2026-10-14"}
+    monkeypatch.setattr(ChipStore, "final_date", classmethod(lambda cls: value["date"]))
+    return value
+
+
+# ==================== 報表解析 ====================
+
+def test_parse_twse_chip_report():
+    records = parse_chip_report(load_fixture("twse_t86_20261014.json"))
+    assert set(records) == {"2330", "2317"}
+    # 外資 = 外陸資 (不含外資自營商) + 外資自營商，單位 股 → 張
+    assert records["2330"] == {"外資": 7102, "投信": 753, "自營商": -1250, "三大法人合計": 6605}
+    assert records["2317"]["投信"] == -820
+
+
+def test_parse_tpex_chip_report():
+    records = parse_chip_report(load_fixture("tpex_daily_trade_20261014.json"))
+    assert set(records) == {"6488", "8069"}
+    assert records["6488"] == {"外資": 700, "投信": 95, "自營商": -32, "三大法人合計": 763}
+    assert records["8069"]["外資"] == -1149
+
+
+def test_parse_twse_margin_report_skips_summary_table():
+    records = parse_twse_margin_report(load_fixture("twse_mi_margn_20261014.json"))
+    assert set(records) == {"2330", "2317"}
+    record = records["2330"]
+    assert record["融資買進"] == 1532
+    assert record["融資餘額"] == 21650
+    assert record["融資增減"] == 310
+    assert record["融資限額"] == 6483225
+    assert record["融券賣出"] == 120
+    assert record["融券買進"] == 35
+    assert record["融券餘額"] == 397
+    assert record["融券增減"] == 85
+    assert record["融券券資比%"] == round(397 / 21650 * 100, 2)
+    assert record["資券相抵"] == 8
+
+
+def test_parse_tpex_margin_report():
+    records = parse_tpex_margin_report(load_fixture("tpex_margin_balance_20261014.json"))
+    assert set(records) == {"6488", "8069"}
+    record = records["6488"]
+    assert record["融資買進"] == 320
+    assert record["融資賣出"] == 180
+    assert record["融資現償"] == 5
+    assert record["融資餘額"] == 5345
+    assert record["融資增減"] == 135
+    assert record["融資限額"] == 434562
+    assert record["融券賣出"] == 60
+    assert record["融券買進"] == 25
+    assert record["融券增減"] == 35
+    assert record["資券相抵"] == 3
+
+
+def test_no_data_reports_parse_empty():
+    for name in ("twse_no_data.json", "tpex_no_data.json"):
+        payload = load_fixture(name)
+        assert parse_chip_report(payload) == {}
+        assert parse_twse_margin_report(payload) == {}
+        assert parse_tpex_margin_report(payload) == {}
+
+
+# ==================== 匯入 ====================
+
+def test_ingest_weekday(final_date):
+    upstream = FakeUpstream()
+    result = ChipIngestor.ingest(date(2026, 10, 14), fetch_json=upstream)
+
+    assert result == {"chip": 4, "margin": 4}
+    assert ChipIngestor.pending_kinds(date(2026, 10, 14)) == []
+    chip = ChipStore.load("chip", "6488", "2026-10-14", "2026-10-14")
+    assert chip.loc["2026-10-14", "三大法人合計"] == 763
+    margin = ChipStore.load("margin", "2330", "2026-10-14", "2026-10-14")
+    assert margin.loc["2026-10-14", "融資增減"] == 310
+
+    # 已匯入的日期不重複下載
+    ChipIngestor.ingest(date(2026, 10, 14), fetch_json=upstream)
+    assert len(upstream.calls) == 4
+
+
+def test_ingest_weekend_is_recorded_without_download(final_date):
+    upstream = FakeUpstream()
+    result = ChipIngestor.ingest(date(2026, 10, 10), fetch_json=upstream)
+
+    assert result == {"chip": 0, "margin": 0}
+    assert upstream.calls == []
+    assert ChipIngestor.pending_kinds(date(2026, 10, 10)) == []
+
+
+def test_ingest_unpublished_weekday_is_retried(final_date):
+    final_date["date"] = "2026-10-13"   # 10-14 21:00 前，尚未定案
+    upstream = FakeUpstream({"fund/T86": "twse_no_data.json", "insti/dailyTrade": "tpex_no_data.json"})
+    result = ChipIngestor.ingest(date(2026, 10, 14), fetch_json=upstream)
+
+    assert result == {"margin": 4}
+    assert ChipIngestor.pending_kinds(date(2026, 10, 14)) == ["chip"]
+    assert ChipStore.market_exchanges("chip", "2026-10-14") == set()
+
+
+def test_ingest_one_exchange_missing_keeps_day_pending(final_date):
+    final_date["date"] = "2026-10-13"
+    upstream = FakeUpstream({"insti/dailyTrade": "tpex_no_data.json"})
+    ChipIngestor.ingest(date(2026, 10, 14), fetch_json=upstream)
+
+    assert ChipStore.market_exchanges("chip", "2026-10-14") == {"twse"}
+    assert "chip" in ChipIngestor.pending_kinds(date(2026, 10, 14))
+
+    # 之後重試只下載缺少的交易所
+    upstream = FakeUpstream()
+    ChipIngestor.ingest(date(2026, 10, 14), fetch_json=upstream)
+    assert upstream.calls and all("tpex" in url for url in upstream.calls)
+    assert ChipIngestor.pending_kinds(date(2026, 10, 14)) == []
+
+
+def test_ingest_finalized_empty_weekday_is_closed(final_date):
+    upstream = FakeUpstream({fragment: "twse_no_data.json" for fragment in FIXTURES})
+    result = ChipIngestor.ingest(date(2026, 10, 9), fetch_json=upstream)
+
+    assert result == {"chip": 0, "margin": 0}
+    assert ChipIngestor.pending_kinds(date(2026, 10, 9)) == []
+
+
+def test_ingest_unparseable_report_is_not_recorded(final_date):
+    layout_changed = load_fixture("twse_t86_20261014.json")
+    layout_changed["fields"] = [f"欄位{i}" for i in range(len(layout_changed["fields"]))]
+
+    def fetch_json(url):
+        return layout_changed if "fund/T86" in url else FakeUpstream()(url)
+
+    ChipIngestor.ingest(date(2026, 10, 14), fetch_json=fetch_json)
+    assert ChipStore.market_exchanges("chip", "2026-10-14") == {"tpex"}
+
+
+def test_catch_up_fills_days_since_last_ingest(final_date):
+    ChipIngestor.ingest(date(2026, 10, 9), fetch_json=FakeUpstream())
+    upstream = FakeUpstream()
+    ChipIngestor.catch_up(fetch_json=upstream)
+
+    # 10-10/11 週末不下載，10-12~14 各下載 4 份報表
+    assert len(upstream.calls) == 12
+    for day in range(9, 15):
+        assert ChipIngestor.pending_kinds(date(2026, 10, day)) == []
+
+    # 已補齊後不再下載
+    upstream = FakeUpstream()
+    ChipIngestor.catch_up(fetch_json=upstream)
+    assert upstream.calls == []
@@ -0,0 +1,36 @@
+import pytest
+
+from util.chip_store import ChipStore
+
+
+@pytest.fixture
+def final_date(monkeypatch):
+    monkeypatch.setattr(ChipStore, "final_date", classmethod(lambda cls: "2026-10-14"))
+
+
+def test_market_days_require_every_exchange(final_date):
+    ChipStore.save_market("chip", "twse", "2026-10-09", {"2330": {"外資": 1}})
+    assert ChipStore.market_days("chip", "2026-10-09", "2026-10-09") == set()
+    ChipStore.save_market("chip", "tpex", "2026-10-09", {"6488": {"外資": 1}})
+    assert ChipStore.market_days("chip", "2026-10-09", "2026-10-09") == {"2026-10-09"}
+
+
+def test_gap_between_coverage_and_ingested_days_is_fetched_once(final_date):
+    # 個股已查詢至 10-08；全市場匯入 10-09、10-12~14，但漏掉 10-10/11 週末
+    ChipStore.mark_covered("chip", "2330", "2026-09-01", "2026-10-08")
+    for day in ("2026-10-09", "2026-10-12", "2026-10-13", "2026-10-14"):
+        for exchange in ChipStore.EXCHANGES:
+            ChipStore.save_market("chip", exchange, day, {"2330": {"外資": 1}})
+
+    missing = ChipStore.missing_ranges("chip", "2330", "2026-09-15", "2026-10-14")
+    assert missing == [("2026-10-10", "2026-10-11")]
+    for start, end in missing:
+        ChipStore.mark_covered("chip", "2330", start, end)
+
+    assert ChipStore.missing_ranges("chip", "2330", "2026-09-15", "2026-10-14") == []
+
+
+def test_unbridged_gap_is_not_merged(final_date):
+    ChipStore.mark_covered("chip", "2330", "2026-09-01", "2026-10-08")
+    ChipStore.mark_covered("chip", "2330", "2026-10-12", "2026-10-14")
+    assert ChipStore.missing_ranges("chip", "2330", "2026-09-15", "2026-10-14") == [("2026-10-09", "2026-10-14")]
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.tech_data import TECH_INDICATORS, TECH_SCORE_TAIL, get_technical_indicators, score_tech_frame
+
+
+@pytest.fixture
+def price_frame():
+    """固定亂數種子產生的 300 個交易日 OHLCV，並以 getStockPrice 相同方式計算指標。"""
+    rng = np.random.default_rng(2330)
+    index = pd.bdate_range("2025-01-02", periods=300).strftime("%Y-%m-%d")
+    close = 600 * np.exp(np.cumsum(rng.normal(0, 0.015, len(index))))
+    open_ = close * (1 + rng.normal(0, 0.005, len(index)))
+    data = pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, len(index))),
+        "Low": np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, len(index))),
+        "Close": close,
+        "Volume": rng.integers(5_000, 50_000, len(index)).astype(float),
+    }, index=index).round(2)
+
+    indicator_df = get_technical_indicators(data, TECH_INDICATORS)
+    return pd.concat([data, indicator_df], axis=1).dropna().round(2)
+
+
+def test_tail_matches_full_history(price_frame):
+    full = score_tech_frame(price_frame).iloc[-TECH_SCORE_TAIL:]
+    # tail 模式只保留近期資料 (與 build_tech_frame 相同，多留緩衝筆數)
+    short = score_tech_frame(price_frame.iloc[-(TECH_SCORE_TAIL * 2):], tail=TECH_SCORE_TAIL)
+
+    assert list(short.index) == list(full.index)
+    assert list(short.columns) == list(full.columns)
+    for column in full.columns:
+        if pd.api.types.is_numeric_dtype(full[column]):
+            np.testing.assert_allclose(
+                short[column].astype(float), full[column].astype(float), rtol=0, atol=1e-9, err_msg=column,
+            )
+        else:
+            assert short[column].astype(str).tolist() == full[column].astype(str).tolist(), column
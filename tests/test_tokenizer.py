@@ -0,0 +1,31 @@
+import pytest
+
+from services.tokenizer import Tokenizer
+
+TEXTS = [
+    "台積電今日法說會公布第三季營收創新高，外資連續三日買超",
+    "鴻海電動車布局加速，市場看好明年出貨成長",
+    "聯發科發表新一代晶片，股價盤中一度漲停",
+    "央行維持利率不變，金融股走勢分歧",
+]
+
+
+@pytest.fixture
+def tokenizer(monkeypatch):
+    """每個測試重新載入斷詞器，結束時關閉 process pool。"""
+    monkeypatch.setattr(Tokenizer, "_tokenizer", None)
+    monkeypatch.setattr(Tokenizer, "_pool", None)
+    monkeypatch.setattr(Tokenizer, "MAX_PROCESSES", 2)
+    yield Tokenizer
+    if Tokenizer._pool is not None:
+        Tokenizer._pool.shutdown()
+
+
+def test_pool_matches_in_process(tokenizer):
+    texts = [TEXTS[i % len(TEXTS)] + f" 第{i}則" for i in range(tokenizer.PARALLEL_MIN_TEXTS * 2)]
+    expected = [tokenizer.tokenize(text) for text in texts]
+
+    result = tokenizer.tokenize_many(texts)
+    assert tokenizer._pool is not None
+    assert result == expected
+    assert any("台積電" in counts for counts in result)
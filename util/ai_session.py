@@ -1,28 +1,173 @@
-from agents import SQLiteSession
+import json
+import threading
+from typing import List, Optional
 
+from agents.memory import SessionABC
+
+from util.concurrency import run_blocking
 from util.config import env
+from util.local_db import LocalDB
+from util.logger import Log, Color
+
+
+class ConversationSession(SessionABC):
+    """
+    AI 對話紀錄 (實作 agents SDK 的 Session 介面)，存放於 SQLite。
+
+    - 每個項目記錄流水號 seq 與所屬回合 turn (每則 user 訊息開始新的一回合)
+    - 寫入時只保留最近 max_turns 回合，以單一 DELETE ... WHERE seq < ? 刪除較舊的項目
+    - 讀取只取最近 max_turns 回合，成本與歷史長度無關
+    """
+
+    DB_NAME = "conversations.db"
+    _initialized = False
+    _lock = threading.Lock()
+
+    def __init__(self, session_id: str, max_turns: Optional[int] = None):
+        self.session_id = session_id
+        self.max_turns = env.SESSION_MAX_ITEMS if max_turns is None else max_turns
+
+    @classmethod
+    def _conn(cls):
+        conn = LocalDB.connect(cls.DB_NAME)
+        if not cls._initialized:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS conversation_items (
+                    session_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    turn INTEGER NOT NULL,
+                    item TEXT NOT NULL,
+                    PRIMARY KEY (session_id, seq)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_items_turn ON conversation_items (session_id, turn);
+                """
+            )
+            cls._migrate_legacy(conn)
+            cls._initialized = True
+        return conn
+
+    @classmethod
+    def _migrate_legacy(cls, conn) -> None:
+        """
+        將舊版 SQLiteSession 的 agent_messages 轉入 conversation_items (每個對話只保留最近 SESSION_MAX_ITEMS 回合)，
+        完成後刪除 agent_messages / agent_sessions。
+        """
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='agent_messages'"
+        ).fetchone()
+        if not exists:
+            return
+
+        with cls._lock, conn:
+            sessions = {}
+            for session_id, message_data in conn.execute(
+                "SELECT session_id, message_data FROM agent_messages ORDER BY session_id, id"
+            ):
+                try:
+                    item = json.loads(message_data)
+                except json.JSONDecodeError:
+                    continue
+                sessions.setdefault(session_id, []).append(item)
+
+            rows = []
+            for session_id, items in sessions.items():
+                if conn.execute("SELECT 1 FROM conversation_items WHERE session_id=? LIMIT 1", (session_id,)).fetchone():
+                    continue
+                turn = 0
+                numbered = []
+                for seq, item in enumerate(items, start=1):
+                    turn += cls._is_user(item)
+                    numbered.append((session_id, seq, turn, json.dumps(item, ensure_ascii=False)))
+                rows.extend(row for row in numbered if row[2] > turn - env.SESSION_MAX_ITEMS)
+            conn.executemany("INSERT INTO conversation_items (session_id, seq, turn, item) VALUES (?, ?, ?, ?)", rows)
+            conn.execute("DROP TABLE agent_messages")
+            conn.execute("DROP TABLE IF EXISTS agent_sessions")
+        Log(f"[ConversationSession] 已轉移舊版對話紀錄 {len(sessions)} 個對話、{len(rows)} 筆項目", color=Color.GREEN)
+
+    @staticmethod
+    def _is_user(item) -> bool:
+        role = item.get("role") if isinstance(item, dict) else getattr(item, "role", None)
+        return role == "user"
+
+    def _last(self, conn) -> tuple:
+        """目前最後一個項目的 (seq, turn)，無資料則為 (0, 0)。"""
+        row = conn.execute(
+            "SELECT seq, turn FROM conversation_items WHERE session_id=? ORDER BY seq DESC LIMIT 1",
+            (self.session_id,),
+        ).fetchone()
+        return row or (0, 0)
+
+    def _get_items(self, limit: Optional[int]) -> List[dict]:
+        conn = self._conn()
+        _, last_turn = self._last(conn)
+        rows = conn.execute(
+            "SELECT item FROM conversation_items WHERE session_id=? AND turn > ? ORDER BY seq DESC"
+            + (" LIMIT ?" if limit is not None else ""),
+            (self.session_id, last_turn - self.max_turns, *((limit,) if limit is not None else ())),
+        ).fetchall()
+        return [json.loads(item) for (item,) in reversed(rows)]
+
+    def _add_items(self, items: List[dict]) -> None:
+        conn = self._conn()
+        with self._lock, conn:
+            seq, turn = self._last(conn)
+            rows = []
+            for item in items:
+                seq += 1
+                turn += self._is_user(item)
+                rows.append((self.session_id, seq, turn, json.dumps(item, ensure_ascii=False)))
+            conn.executemany("INSERT INTO conversation_items (session_id, seq, turn, item) VALUES (?, ?, ?, ?)", rows)
+
+            # 刪除最近 max_turns 回合之前的項目
+            row = conn.execute(
+                "SELECT MIN(seq) FROM conversation_items WHERE session_id=? AND turn > ?",
+                (self.session_id, turn - self.max_turns),
+            ).fetchone()
+            if row and row[0] is not None:
+                conn.execute("DELETE FROM conversation_items WHERE session_id=? AND seq < ?", (self.session_id, row[0]))
+
+    def _pop_item(self) -> Optional[dict]:
+        conn = self._conn()
+        with self._lock, conn:
+            row = conn.execute(
+                "SELECT seq, item FROM conversation_items WHERE session_id=? ORDER BY seq DESC LIMIT 1",
+                (self.session_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM conversation_items WHERE session_id=? AND seq=?", (self.session_id, row[0]))
+        return json.loads(row[1])
+
+    def _clear_session(self) -> None:
+        conn = self._conn()
+        with self._lock, conn:
+            conn.execute("DELETE FROM conversation_items WHERE session_id=?", (self.session_id,))
+
+    async def get_items(self, limit: Optional[int] = None) -> List[dict]:
+        """取得最近 max_turns 回合的對話項目 (由舊到新)，limit 為最多回傳的項目數。"""
+        return await run_blocking(self._get_items, limit)
+
+    async def add_items(self, items: List[dict]) -> None:
+        """新增對話項目，並刪除超出保留回合數的舊項目。"""
+        if items:
+            await run_blocking(self._add_items, items)
+
+    async def pop_item(self) -> Optional[dict]:
+        """移除並回傳最新的一個項目。"""
+        return await run_blocking(self._pop_item)
+
+    async def clear_session(self) -> None:
+        """清除此對話的所有項目。"""
+        await run_blocking(self._clear_session)
+
 
-async def trim_session(session_id: str) -> SQLiteSession:
+def get_session(session_id: str) -> ConversationSession:
     """
-    修剪對話紀錄至最近的 N 次 user->assistant 對話。
+    取得對話會話 (只保留最近 SESSION_MAX_ITEMS 次 user->assistant 對話)。
     Args:
         session_id (str): 對話會話的唯一識別碼。
     Returns:
-        SQLiteSession: 修剪後的對話會話物件。
+        ConversationSession: 對話會話物件。
     """
-    max_turns = env.SESSION_MAX_ITEMS
-    session = SQLiteSession(session_id, "data/conversations.db")
-    items = await session.get_items()
-
-    # 找出所有 user 訊息的 index 值
-    user_indices = [
-        idx for idx, item in enumerate(items)
-        if (item.get("role") if isinstance(item, dict) else getattr(item, "role", None)) == "user"
-    ]
-    # 若 user 訊息數量超過 max_turns，則修剪對話紀錄
-    if len(user_indices) > max_turns:
-        start_idx = user_indices[-max_turns]
-        trimmed = items[start_idx:]
-        await session.clear_session()
-        await session.add_items(trimmed)
-    return session
\ No newline at end of file
+    return ConversationSession(session_id)
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from util import simhash
+from util.local_db import LocalDB
+
+try:
+    import zstandard   # 選用套件，未安裝時改用 zlib
+except ImportError:
+    zstandard = None
+
+
+class ArticleStore:
+    """
+    新聞內文的本地儲存，以網址雜湊 (sha1) 為主鍵，壓縮後存放於 SQLite。
+
+    - codec: 寫入時使用 zstd (有安裝 zstandard) 或 zlib，讀取時依各列記錄的 codec 解壓
+    - 最近讀寫的內文保留在記憶體 LRU (MAX_MEMORY 篇)，重複請求不需解壓
+    - 內文下載一次後永久保存，newsScores 只需以 url 參照
+    - article_tokens: 每篇內文斷詞後的詞頻 (附斷詞版本)，詞雲只需合併各篇結果
+    - article_fingerprints: 內文的 SimHash 指紋 (分段建索引於 article_fingerprint_bands)，用來找出不同來源轉載的相同新聞
+    """
+
+    DB_NAME = "articles.db"
+    MAX_MEMORY = 256
+    ZSTD_LEVEL = 6
+    ZLIB_LEVEL = 6
+    DUPLICATE_DISTANCE = 6      # 指紋漢明距離 <= 此值視為重複新聞 (需小於分段數)
+    _initialized = False
+    _memory: "OrderedDict[str, str]" = OrderedDict()
+    _lock = threading.Lock()
+
+    @classmethod
+    def _conn(cls):
+        conn = LocalDB.connect(cls.DB_NAME)
+        if not cls._initialized:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS articles (
+                    url_hash TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    codec TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    stored_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS article_tokens (
+                    url_hash TEXT PRIMARY KEY,
+                    version TEXT NOT NULL,
+                    counts TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS article_fingerprints (
+                    url_hash TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    fingerprint INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS article_fingerprint_bands (
+                    band INTEGER NOT NULL,
+                    url_hash TEXT NOT NULL,
+                    PRIMARY KEY (band, url_hash)
+                ) WITHOUT ROWID;
+                """
+            )
+            cls._initialized = True
+        return conn
+
+    @staticmethod
+    def key(url: str) -> str:
+        """網址的雜湊值 (主鍵)。"""
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def _compress(cls, text: str) -> tuple[str, bytes]:
+        raw = text.encode("utf-8")
+        if zstandard is not None:
+            return "zstd", zstandard.ZstdCompressor(level=cls.ZSTD_LEVEL).compress(raw)
+        return "zlib", zlib.compress(raw, cls.ZLIB_LEVEL)
+
+    @staticmethod
+    def _decompress(codec: str, body: bytes) -> str:
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("內文以 zstd 壓縮，但未安裝 zstandard")
+            return zstandard.ZstdDecompressor().decompress(body).decode("utf-8")
+        return zlib.decompress(body).decode("utf-8")
+
+    @classmethod
+    def _remember(cls, key: str, text: str) -> None:
+        with cls._lock:
+            cls._memory[key] = text
+            cls._memory.move_to_end(key)
+            while len(cls._memory) > cls.MAX_MEMORY:
+                cls._memory.popitem(last=False)
+
+    @classmethod
+    def get(cls, url: str) -> Optional[str]:
+        """
+        讀取新聞內文。
+        Args:
+            url (str): 新聞網址
+        Returns:
+            str: 新聞內文，未儲存過則回傳 None
+        """
+        key = cls.key(url)
+        with cls._lock:
+            if key in cls._memory:
+                cls._memory.move_to_end(key)
+                return cls._memory[key]
+
+        row = cls._conn().execute("SELECT codec, body FROM articles WHERE url_hash=?", (key,)).fetchone()
+        if row is None:
+            return None
+        text = cls._decompress(row[0], row[1])
+        cls._remember(key, text)
+        return text
+
+    @classmethod
+    def get_many(cls, urls: Iterable[str]) -> Dict[str, str]:
+        """批次讀取多篇內文，回傳 {url: 內文} (只包含已儲存的網址)。"""
+        return {url: text for url in urls if (text := cls.get(url)) is not None}
+
+    @classmethod
+    def put(cls, url: str, text: str) -> None:
+        """寫入新聞內文並建立指紋 (空字串代表下載失敗，不儲存)。"""
+        if not text:
+            return
+        key = cls.key(url)
+        codec, body = cls._compress(text)
+        fingerprint = simhash.simhash(text)
+        conn = cls._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO articles (url_hash, url, codec, body, stored_at) VALUES (?, ?, ?, ?, ?)",
+                (key, url, codec, body, time.time()),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO article_fingerprints (url_hash, url, fingerprint) VALUES (?, ?, ?)",
+                (key, url, simhash.to_signed(fingerprint)),
+            )
+            conn.execute("DELETE FROM article_fingerprint_bands WHERE url_hash=?", (key,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO article_fingerprint_bands (band, url_hash) VALUES (?, ?)",
+                [(band, key) for band in simhash.bands(fingerprint)],
+            )
+        cls._remember(key, text)
+
+    @classmethod
+    def find_duplicate(cls, url: str, text: str, max_distance: Optional[int] = None) -> Optional[str]:
+        """
+        找出內容與 text 近似 (指紋漢明距離 <= max_distance) 的其他已儲存新聞。
+        Args:
+            url (str): 本篇網址 (排除自己)
+            text (str): 本篇內文
+            max_distance (int): 距離上限，預設 DUPLICATE_DISTANCE
+        Returns:
+            str: 最相近的新聞網址，找不到則回傳 None
+        """
+        max_distance = cls.DUPLICATE_DISTANCE if max_distance is None else max_distance
+        fingerprint = simhash.simhash(text) if text else 0
+        if fingerprint == 0:
+            return None
+        bands = simhash.bands(fingerprint)
+        rows = cls._conn().execute(
+            "SELECT url, fingerprint FROM article_fingerprints WHERE url_hash != ? AND url_hash IN "
+            f"(SELECT url_hash FROM article_fingerprint_bands WHERE band IN ({','.join('?' * len(bands))}))",
+            (cls.key(url), *bands),
+        ).fetchall()
+        best = None
+        for other_url, other in rows:
+            distance = simhash.hamming(fingerprint, simhash.to_unsigned(other))
+            if distance <= max_distance and (best is None or distance < best[0]):
+                best = (distance, other_url)
+        return best[1] if best else None
+
+    @classmethod
+    def get_tokens(cls, url: str, version: str) -> Optional[Dict[str, int]]:
+        """讀取該篇的詞頻，版本不符 (斷詞規則已變動) 視為沒有。"""
+        row = cls._conn().execute(
+            "SELECT counts FROM article_tokens WHERE url_hash=? AND version=?",
+            (cls.key(url), version),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @classmethod
+    def put_tokens(cls, url: str, version: str, counts: Dict[str, int]) -> None:
+        """寫入該篇的詞頻。"""
+        conn = cls._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO article_tokens (url_hash, version, counts) VALUES (?, ?, ?)",
+                (cls.key(url), version, json.dumps(counts, ensure_ascii=False)),
+            )
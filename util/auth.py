@@ -0,0 +1,20 @@
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPBasic, HTTPBasicCredentials
+import secrets
+
+from util.config import Env
+
+# 初始化 HTTPBasic 認證
+security = HTTPBasic()
+
+# 驗證函數 (帳密與 /docs 相同，讀取環境變數 DOCS_USERNAME / DOCS_PASSWORD)
+def verify_credentials(credentials: HTTPBasicCredentials = Depends(security)):
+    correct_username = secrets.compare_digest(credentials.username, Env.DOCS_USERNAME)
+    correct_password = secrets.compare_digest(credentials.password, Env.DOCS_PASSWORD)
+    if not (correct_username and correct_password):
+        raise HTTPException(
+            status_code=401,
+            detail="無效的憑證",
+            headers={"WWW-Authenticate": "Basic"},
+        )
+    return credentials
@@ -0,0 +1,231 @@
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from util.local_db import LocalDB
+from util.nowtime import TaiwanTime
+
+
+class ChipStore:
+    """
+    三大法人 / 融資融券 歷史資料的本地快取，以 (kind, stock_id, date) 為主鍵存放於 SQLite。
+
+    - kind: "chip" (三大法人) / "margin" (融資融券)
+    - coverage: 記錄每檔股票已向上游查詢過的日期區間，區間內沒有資料代表非交易日
+    - 籌碼資料每日 21:00 後才會更新，之前的「今天」視為未定案，僅在 RECHECK_MINUTES 內不重複查詢
+    - market days: 全市場批次匯入過的日期 (含非交易日)，上市、上櫃 (EXCHANGES) 都匯入成功的日期對所有股票都視為已查詢
+    """
+
+    DB_NAME = "chipData.db"
+    CHIP_UPDATE_HOUR = 21
+    RECHECK_MINUTES = 30
+    EXCHANGES = ("twse", "tpex")
+    _initialized = False
+
+    @classmethod
+    def _conn(cls):
+        conn = LocalDB.connect(cls.DB_NAME)
+        if not cls._initialized:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS chip_data (
+                    kind TEXT NOT NULL,
+                    stock_id TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (kind, stock_id, date)
+                );
+                CREATE TABLE IF NOT EXISTS chip_coverage (
+                    kind TEXT NOT NULL,
+                    stock_id TEXT NOT NULL,
+                    first_date TEXT NOT NULL,
+                    last_date TEXT NOT NULL,
+                    checked_at REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (kind, stock_id)
+                );
+                CREATE TABLE IF NOT EXISTS chip_market_exchanges (
+                    kind TEXT NOT NULL,
+                    exchange TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    rows INTEGER NOT NULL,
+                    ingested_at REAL NOT NULL,
+                    PRIMARY KEY (kind, exchange, date)
+                );
+                """
+            )
+            cls._initialized = True
+        return conn
+
+    @staticmethod
+    def _shift(date_str: str, days: int) -> str:
+        return (datetime.strptime(date_str, "%Y-%m-%d") + timedelta(days=days)).strftime("%Y-%m-%d")
+
+    @classmethod
+    def final_date(cls) -> str:
+        """已定案 (上游不會再變動) 的最後日期：21:00 前為昨天，之後為今天。"""
+        now = TaiwanTime.now()
+        final = now.date() if now.hour >= cls.CHIP_UPDATE_HOUR else now.date() - timedelta(days=1)
+        return final.strftime("%Y-%m-%d")
+
+    @classmethod
+    def _coverage(cls, kind: str, stock_id: str) -> Optional[Tuple[str, str, float]]:
+        row = cls._conn().execute(
+            "SELECT first_date, last_date, checked_at FROM chip_coverage WHERE kind=? AND stock_id=?",
+            (kind, stock_id),
+        ).fetchone()
+        return tuple(row) if row else None
+
+    @classmethod
+    def missing_ranges(cls, kind: str, stock_id: str, start: str, end: str) -> List[Tuple[str, str]]:
+        """
+        取得 [start, end] 中尚未向上游查詢過的日期區間。
+        Returns:
+            list: [(start, end), ...]，空 list 代表完全命中本地資料
+        """
+        coverage = cls._coverage(kind, stock_id)
+        if coverage is None:
+            ranges = [(start, end)]
+        else:
+            first, last, checked_at = coverage
+            ranges = []
+            if start < first:
+                ranges.append((start, min(end, cls._shift(first, -1))))
+            if end > last:
+                ranges.append((max(start, cls._shift(last, 1)), end))
+
+        # 扣除全市場已批次匯入的日期
+        ranges = [trimmed for r in ranges for trimmed in cls._trim_market_days(kind, *r)]
+
+        # 未定案的日期 (今天 21:00 前) 短時間內不重複查詢
+        final = cls.final_date()
+        recently_checked = coverage is not None and time.time() - coverage[2] < cls.RECHECK_MINUTES * 60
+        return [
+            (range_start, range_end) for range_start, range_end in ranges
+            if range_start <= final or not recently_checked
+        ]
+
+    @classmethod
+    def _trim_market_days(cls, kind: str, start: str, end: str) -> List[Tuple[str, str]]:
+        """去除區間頭尾已由全市場匯入涵蓋的日期，回傳剩餘需查詢的區間。"""
+        ingested = cls.market_days(kind, start, end)
+        while start <= end and start in ingested:
+            start = cls._shift(start, 1)
+        while end >= start and end in ingested:
+            end = cls._shift(end, -1)
+        return [(start, end)] if start <= end else []
+
+    @classmethod
+    def _bridged(cls, kind: str, start: str, end: str) -> bool:
+        """[start, end] 是否為空區間，或每一天都已由全市場匯入涵蓋。"""
+        if start > end:
+            return True
+        days = (datetime.strptime(end, "%Y-%m-%d") - datetime.strptime(start, "%Y-%m-%d")).days + 1
+        return len(cls.market_days(kind, start, end)) == days
+
+    @classmethod
+    def market_days(cls, kind: str, start: str, end: str) -> set:
+        """取得 [start, end] 中所有交易所都已完成全市場匯入的日期。"""
+        rows = cls._conn().execute(
+            "SELECT date FROM chip_market_exchanges WHERE kind=? AND date BETWEEN ? AND ? "
+            "GROUP BY date HAVING COUNT(DISTINCT exchange)=?",
+            (kind, start, end, len(cls.EXCHANGES)),
+        ).fetchall()
+        return {date for (date,) in rows}
+
+    @classmethod
+    def last_market_day(cls, kind: str) -> Optional[str]:
+        """所有交易所都已完成全市場匯入的最後日期，無資料則回傳 None。"""
+        row = cls._conn().execute(
+            "SELECT MAX(date) FROM (SELECT date FROM chip_market_exchanges WHERE kind=? "
+            "GROUP BY date HAVING COUNT(DISTINCT exchange)=?)",
+            (kind, len(cls.EXCHANGES)),
+        ).fetchone()
+        return row[0] if row else None
+
+    @classmethod
+    def market_exchanges(cls, kind: str, date: str) -> set:
+        """取得該日已完成全市場匯入的交易所。"""
+        rows = cls._conn().execute(
+            "SELECT exchange FROM chip_market_exchanges WHERE kind=? AND date=?",
+            (kind, date),
+        ).fetchall()
+        return {exchange for (exchange,) in rows}
+
+    @classmethod
+    def save_market(cls, kind: str, exchange: str, date: str, records: Dict[str, Dict[str, Any]]) -> None:
+        """
+        一次寫入單一交易所的單日全市場資料，並記錄該交易所當日已完成匯入。
+        Args:
+            kind (str): "chip" / "margin"
+            exchange (str): "twse" / "tpex"
+            date (str): 日期 (YYYY-MM-DD)
+            records (dict): {stock_id: 欄位資料}，空 dict 代表休市 (呼叫端需自行確認)
+        """
+        rows = [
+            (kind, stock_id, date, json.dumps(record, ensure_ascii=False))
+            for stock_id, record in records.items()
+        ]
+        conn = cls._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO chip_data (kind, stock_id, date, data) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO chip_market_exchanges (kind, exchange, date, rows, ingested_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, exchange, date, len(rows), time.time()),
+            )
+
+    @classmethod
+    def mark_covered(cls, kind: str, stock_id: str, start: str, end: str) -> None:
+        """記錄 [start, end] 已向上游查詢過 (超過已定案日期的部分不納入)。"""
+        final_end = min(end, cls.final_date())
+        coverage = cls._coverage(kind, stock_id)
+        first, last = (coverage[0], coverage[1]) if coverage else (None, None)
+        if final_end >= start:
+            if first is None:
+                first, last = start, final_end
+            # 只有與既有區間相連 (或中間全為已匯入的全市場日期) 才合併，避免中間留下未查詢的空洞
+            elif cls._bridged(kind, cls._shift(last, 1), cls._shift(start, -1)) \
+                    and cls._bridged(kind, cls._shift(final_end, 1), cls._shift(first, -1)):
+                first, last = min(start, first), max(final_end, last)
+        if first is None:
+            return
+        conn = cls._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO chip_coverage (kind, stock_id, first_date, last_date, checked_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, stock_id, first, last, time.time()),
+            )
+
+    @classmethod
+    def save(cls, kind: str, stock_id: str, df: pd.DataFrame) -> None:
+        """寫入 (覆寫) 以日期為 index 的資料。"""
+        if df is None or df.empty:
+            return
+        rows = [
+            (kind, stock_id, str(date), json.dumps(record, ensure_ascii=False))
+            for date, record in zip(df.index, df.to_dict(orient="records"))
+        ]
+        conn = cls._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO chip_data (kind, stock_id, date, data) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    @classmethod
+    def load(cls, kind: str, stock_id: str, start: str, end: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """讀取 [start, end] 的資料，index 為日期字串 (由舊到新)。"""
+        rows = cls._conn().execute(
+            "SELECT date, data FROM chip_data WHERE kind=? AND stock_id=? AND date BETWEEN ? AND ? ORDER BY date",
+            (kind, stock_id, start, end),
+        ).fetchall()
+        records: List[Dict[str, Any]] = [json.loads(data) for _, data in rows]
+        df = pd.DataFrame(records, index=[date for date, _ in rows])
+        if columns is not None:
+            df = df.reindex(columns=columns)
+        return df
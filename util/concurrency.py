@@ -0,0 +1,48 @@
+"""
+阻塞工作的執行緒池
+AI Agent 的工具在事件迴圈上執行，爬蟲/計算等阻塞工作需交給獨立的執行緒池，
+避免卡住事件迴圈，也不佔用 FastAPI 同步路由使用的 threadpool。
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+TOOL_MAX_WORKERS = 16
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="agent-tool")
+
+# 各資料來源同時進行的工具呼叫上限 (跨所有對話)，避免同一來源被大量請求
+SOURCE_LIMITS = {
+    "stock_list": 4,
+    "yahoo": 4,
+    "udn": 4,
+    "cnyes": 2,
+    "news_index": 8,
+    "etf": 2,
+}
+_source_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    在 tool_executor 執行阻塞函數並等待結果。
+    Args:
+        func (Callable): 阻塞函數
+        *args, **kwargs: 傳給 func 的參數
+    Returns:
+        Any: func 的回傳值
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(tool_executor, functools.partial(func, *args, **kwargs))
+
+
+def source_limit(source: str) -> asyncio.Semaphore:
+    """
+    取得資料來源的並行上限 (asyncio.Semaphore)，用法: async with source_limit("yahoo"): ...
+    Args:
+        source (str): SOURCE_LIMITS 中的來源名稱，未列出的來源上限為 TOOL_MAX_WORKERS
+    """
+    semaphore = _source_semaphores.get(source)
+    if semaphore is None:
+        semaphore = _source_semaphores[source] = asyncio.Semaphore(SOURCE_LIMITS.get(source, TOOL_MAX_WORKERS))
+    return semaphore
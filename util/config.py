@@ -7,12 +7,17 @@ load_dotenv(find_dotenv(), override=False)
 # 統一管理環境變數
 class Env:
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "")     # OpenAI 相容端點 (例如本地 LLM stub)，留空使用 OpenAI
+    LLM_STUB_LATENCY_MS: int = int(os.getenv("LLM_STUB_LATENCY_MS", 300))     # LLM stub 每次回應的延遲
+    LLM_STUB_TOOLS: str = os.getenv("LLM_STUB_TOOLS", "toolGetStockPrice,toolFetchStockNews")     # LLM stub 每回合呼叫的工具
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
     SUPABASE_KEY: str = os.getenv("SUPABASE_KEY", "")
     DOCS_PASSWORD: str = os.getenv("DOCS_PASSWORD", "")
     DOCS_USERNAME: str = os.getenv("DOCS_USERNAME", "")
     RELOAD: bool = os.getenv("RELOAD", "").lower() == "true"
+    CHIP_INGEST_ENABLE: bool = os.getenv("CHIP_INGEST_ENABLE", "true").lower() == "true"   # 每日全市場籌碼匯入排程
     SESSION_MAX_ITEMS: int = int(os.getenv("SESSION_MAX_ITEMS", 3))
+    TOOL_TOKEN_BUDGET: int = int(os.getenv("TOOL_TOKEN_BUDGET", 2000))     # AI 工具單次輸出的 token 上限 (粗估)
     PORT: int = int(os.getenv("PORT", 7860))    # Hugging Face Spaces 預設使用 7860 port
     
 env = Env()
\ No newline at end of file
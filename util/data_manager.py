@@ -3,6 +3,7 @@ from typing import Any, Dict, Optional
 
 from services.stock_data import getStockPrice
 
+from util.article_store import ArticleStore
 from util.logger import Log, Color
 from util.nowtime import TaiwanTime
 from util.supabase_client import supabase
@@ -13,7 +14,7 @@ class DataManager:
     依照 stock_id / date / data / type(面向) 存放於 Supabase，並在本地記憶體以陣列/字典快取。
     
     - stockScores: 股票各面向分數 (basic/chip/tech/news)
-    - newsScores: 個別新聞情感分數 (以 url 為主鍵)
+    - newsScores: 個別新聞情感分數 (以 url 為主鍵)，內文另存於本地 ArticleStore，分數查詢不帶 content
     
     更新時間:
     - basic_data 每日 17:00 後更新
@@ -23,6 +24,7 @@ class DataManager:
 
     STOCK_SCORE_TABLE = "stockScores"
     NEWS_TABLE = "newsScores"
+    NEWS_SCORE_COLUMNS = "url,positive,neutral,negative,title,publishTime"
     BASIC_UPDATE_HOUR = 17
     CHIP_UPDATE_HOUR = 21
     TECH_UPDATE_HOUR = 14
@@ -248,13 +250,14 @@ class DataManager:
             "positive": positive,
             "neutral": neutral,
             "negative": negative,
-            "content": content,
         }
         if title is not None:
             payload["title"] = title
         if publish_time is not None:
             payload["publishTime"] = datetime.fromtimestamp(publish_time, tz=TaiwanTime.TIMEZONE).isoformat()
 
+        # 內文只存在 ArticleStore，newsScores 與記憶體快取僅保留分數
+        ArticleStore.put(url, content)
         cls._cache_set(cls.NEWS_TABLE, key_fields, payload)
 
         try:
@@ -269,31 +272,61 @@ class DataManager:
             return None
 
     @classmethod
-    def get_news_score(cls, url: str) -> Optional[Dict[str, Any]]:
+    def get_news_score(cls, url: str, include_content: bool = True) -> Optional[Dict[str, Any]]:
         """
         取得新聞情感分數從 newsScores 表。
         
         Args:
             url: 新聞網址 (主鍵)
+            include_content: 是否一併附上新聞內文 (由 ArticleStore 讀取)
         """
         key_fields = {"url": url}
 
-        cached = cls._cache_get(cls.NEWS_TABLE, key_fields)
-        if cached:
-            return cached
+        payload = cls._cache_get(cls.NEWS_TABLE, key_fields)
+        if not payload:
+            try:
+                response = (
+                    supabase.table(cls.NEWS_TABLE)
+                    .select(cls.NEWS_SCORE_COLUMNS)
+                    .eq("url", url)
+                    .execute()
+                )
+                if not getattr(response, "data", None):
+                    return None
+                payload = response.data[0]
+                cls._cache_set(cls.NEWS_TABLE, key_fields, payload)
+            except Exception as exc:
+                Log(f"[DataManager] newsScores 讀取失敗: {exc}", color=Color.RED)
+                return None
+
+        if not include_content:
+            return payload
+        return {**payload, "content": cls.get_news_content(url)}
+
+    @classmethod
+    def get_news_content(cls, url: str) -> Optional[str]:
+        """
+        取得新聞內文：讀取本地 ArticleStore，沒有才向 newsScores 取舊資料的 content 並存回本地。
+        
+        Args:
+            url: 新聞網址 (主鍵)
+        """
+        content = ArticleStore.get(url)
+        if content is not None:
+            return content
 
         try:
             response = (
                 supabase.table(cls.NEWS_TABLE)
-                .select("*")
+                .select("content")
                 .eq("url", url)
                 .execute()
             )
             if getattr(response, "data", None):
-                payload = response.data[0]
-                cls._cache_set(cls.NEWS_TABLE, key_fields, payload)
-                return payload
+                content = response.data[0].get("content")
+                ArticleStore.put(url, content)
+                return content
             return None
         except Exception as exc:
-            Log(f"[DataManager] newsScores 讀取失敗: {exc}", color=Color.RED)
+            Log(f"[DataManager] newsScores 內文讀取失敗: {exc}", color=Color.RED)
             return None
@@ -0,0 +1,41 @@
+"""
+本地 SQLite 連線管理模組
+每個執行緒對每個資料庫檔案共用一條連線 (WAL 模式)，避免每次查詢重新開檔。
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict
+
+
+class LocalDB:
+    """本地 SQLite 連線池 (每執行緒一條連線)"""
+
+    DATA_DIR = "data"
+    _local = threading.local()
+
+    @classmethod
+    def path(cls, filename: str) -> str:
+        """取得 data/ 底下的檔案路徑。"""
+        os.makedirs(cls.DATA_DIR, exist_ok=True)
+        return os.path.join(cls.DATA_DIR, filename)
+
+    @classmethod
+    def connect(cls, filename: str) -> sqlite3.Connection:
+        """
+        取得目前執行緒對指定資料庫的連線，第一次呼叫時建立並啟用 WAL。
+        Args:
+            filename (str): data/ 底下的資料庫檔名，例如 "chipData.db"
+        Returns:
+            sqlite3.Connection: 可重複使用的連線
+        """
+        connections: Dict[str, sqlite3.Connection] = getattr(cls._local, "connections", None)
+        if connections is None:
+            connections = cls._local.connections = {}
+        conn = connections.get(filename)
+        if conn is None:
+            conn = sqlite3.connect(cls.path(filename), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            connections[filename] = conn
+        return conn
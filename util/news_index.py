@@ -0,0 +1,204 @@
+import math
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from util.article_store import ArticleStore
+from util.local_db import LocalDB
+
+
+class NewsIndex:
+    """
+    已儲存新聞的全文倒排索引 (與 ArticleStore 同一個資料庫)，以 BM25 排序。
+
+    - news_docs: 每篇新聞的標題、發布時間與詞數；補建索引時不知道發布時間的以儲存時間暫代 (time_estimated=1)，
+      之後取得真實發布時間時更新，暫代的新聞不參與日期篩選
+    - news_postings: (詞, 新聞) → 詞頻，詞彙一律轉小寫
+    - 詞彙來源為 Tokenizer 斷詞後的詞頻 (與詞雲相同)
+    """
+
+    K1 = 1.5
+    B = 0.75
+    _initialized = False
+    _lock = threading.Lock()
+
+    @classmethod
+    def _conn(cls):
+        conn = LocalDB.connect(ArticleStore.DB_NAME)
+        if not cls._initialized:
+            ArticleStore._conn()   # 確保 articles 表已建立 (unindexed() 需要)
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS news_docs (
+                    url_hash TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    title TEXT,
+                    publish_time REAL NOT NULL,
+                    length INTEGER NOT NULL,
+                    time_estimated INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_docs_time ON news_docs (publish_time);
+                CREATE TABLE IF NOT EXISTS news_postings (
+                    term TEXT NOT NULL,
+                    url_hash TEXT NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY (term, url_hash)
+                ) WITHOUT ROWID;
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(news_docs)")}
+            if "time_estimated" not in columns:
+                # 舊版補建的索引以儲存時間作為發布時間，標記為暫代
+                with conn:
+                    conn.execute("ALTER TABLE news_docs ADD COLUMN time_estimated INTEGER NOT NULL DEFAULT 0")
+                    conn.execute(
+                        "UPDATE news_docs SET time_estimated=1 WHERE publish_time = "
+                        "(SELECT a.stored_at FROM articles a WHERE a.url_hash = news_docs.url_hash)"
+                    )
+            cls._initialized = True
+        return conn
+
+    @staticmethod
+    def _normalize(counts: Dict[str, int]) -> Counter:
+        terms = Counter()
+        for term, tf in counts.items():
+            terms[term.lower()] += tf
+        return terms
+
+    @classmethod
+    def missing(cls, urls: Iterable[str]) -> List[str]:
+        """尚未建立索引的網址。"""
+        urls = list(urls)
+        if not urls:
+            return []
+        keys = {ArticleStore.key(url): url for url in urls}
+        rows = cls._conn().execute(
+            f"SELECT url_hash FROM news_docs WHERE url_hash IN ({','.join('?' * len(keys))})",
+            tuple(keys),
+        ).fetchall()
+        indexed = {key for (key,) in rows}
+        return [url for key, url in keys.items() if key not in indexed]
+
+    @classmethod
+    def add(
+        cls,
+        url: str,
+        counts: Dict[str, int],
+        publish_time: float,
+        title: Optional[str] = None,
+        time_estimated: bool = False,
+    ) -> None:
+        """
+        建立 (或覆寫) 一篇新聞的索引。
+        Args:
+            url (str): 新聞網址
+            counts (dict): 斷詞後的詞頻
+            publish_time (float): 發布時間戳 (秒)
+            title (str): 新聞標題
+            time_estimated (bool): publish_time 是否為暫代值 (非真實發布時間)
+        """
+        key = ArticleStore.key(url)
+        terms = cls._normalize(counts)
+        conn = cls._conn()
+        with cls._lock, conn:
+            conn.execute("DELETE FROM news_postings WHERE url_hash=?", (key,))
+            conn.executemany(
+                "INSERT INTO news_postings (term, url_hash, tf) VALUES (?, ?, ?)",
+                [(term, key, tf) for term, tf in terms.items()],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO news_docs (url_hash, url, title, publish_time, length, time_estimated) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, url, title, publish_time, sum(terms.values()), int(time_estimated)),
+            )
+
+    @classmethod
+    def update_publish_times(cls, articles: Iterable[Tuple[str, float, Optional[str]]]) -> int:
+        """
+        以真實發布時間取代暫代值 (只更新 time_estimated 的新聞)。
+        Args:
+            articles (iterable): [(url, 發布時間戳, 標題), ...]
+        Returns:
+            int: 更新的篇數
+        """
+        rows = [(float(timestamp), title, ArticleStore.key(url)) for url, timestamp, title in articles]
+        if not rows:
+            return 0
+        conn = cls._conn()
+        with cls._lock, conn:
+            cursor = conn.executemany(
+                "UPDATE news_docs SET publish_time=?, title=COALESCE(title, ?), time_estimated=0 "
+                "WHERE url_hash=? AND time_estimated=1",
+                rows,
+            )
+        return cursor.rowcount
+
+    @classmethod
+    def unindexed(cls, limit: int = 200) -> List[Tuple[str, float]]:
+        """ArticleStore 中尚未建立索引的新聞 [(url, 儲存時間), ...]。"""
+        return cls._conn().execute(
+            "SELECT a.url, a.stored_at FROM articles a LEFT JOIN news_docs d ON a.url_hash = d.url_hash "
+            "WHERE d.url_hash IS NULL LIMIT ?",
+            (limit,),
+        ).fetchall()
+
+    @classmethod
+    def search(
+        cls,
+        terms: Iterable[str],
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        limit: int = 10,
+    ) -> List[Dict[str, Any]]:
+        """
+        以 BM25 搜尋新聞。
+        Args:
+            terms (list): 查詢詞 (已斷詞)
+            start (float): 發布時間下限 (時間戳，含)；有日期篩選時不含發布時間未知的新聞
+            end (float): 發布時間上限 (時間戳，含)
+            limit (int): 回傳筆數
+        Returns:
+            list: [{url, title, publish_time, score}, ...] 依分數由高到低
+        """
+        query = list(dict.fromkeys(term.lower() for term in terms if term.strip()))
+        if not query:
+            return []
+        conn = cls._conn()
+        total_docs, avg_length = conn.execute("SELECT COUNT(*), AVG(length) FROM news_docs").fetchone()
+        if not total_docs:
+            return []
+        avg_length = avg_length or 1
+
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("d.publish_time >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("d.publish_time <= ?")
+            params.append(end)
+        if conditions:
+            conditions.append("d.time_estimated = 0")
+        time_filter = "".join(f" AND {c}" for c in conditions)
+
+        scores: Dict[str, float] = {}
+        docs: Dict[str, Tuple[str, Optional[str], float]] = {}
+        for term in query:
+            (doc_freq,) = conn.execute("SELECT COUNT(*) FROM news_postings WHERE term=?", (term,)).fetchone()
+            if not doc_freq:
+                continue
+            idf = math.log(1 + (total_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+            rows = conn.execute(
+                "SELECT d.url_hash, d.url, d.title, d.publish_time, d.length, p.tf "
+                "FROM news_postings p JOIN news_docs d ON p.url_hash = d.url_hash "
+                f"WHERE p.term=?{time_filter}",
+                (term, *params),
+            ).fetchall()
+            for key, url, title, publish_time, length, tf in rows:
+                norm = tf + cls.K1 * (1 - cls.B + cls.B * length / avg_length)
+                scores[key] = scores.get(key, 0.0) + idf * tf * (cls.K1 + 1) / norm
+                docs[key] = (url, title, publish_time)
+
+        ranked = sorted(scores.items(), key=lambda item: (item[1], docs[item[0]][2]), reverse=True)[:limit]
+        return [
+            {"url": docs[key][0], "title": docs[key][1], "publish_time": docs[key][2], "score": round(score, 4)}
+            for key, score in ranked
+        ]
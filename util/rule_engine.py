@@ -0,0 +1,161 @@
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+Condition = Callable[["RuleContext"], np.ndarray]
+
+
+class ScoreRule(NamedTuple):
+    """條件成立加 weight，否則加 otherwise。 (等同 np.where(cond, weight, otherwise))"""
+    column: str
+    condition: Condition
+    weight: float
+    otherwise: float = 0.0
+
+
+class TierRule(NamedTuple):
+    """多段條件，依序取第一個成立的權重。 (等同巢狀 np.where)"""
+    column: str
+    tiers: Sequence[Tuple[Condition, float]]
+    default: float = 0.0
+
+
+class ValueRule(NamedTuple):
+    """直接加上向量化計算出的分數陣列。 (適合一次處理多欄位的規則)"""
+    column: str
+    value: Callable[["RuleContext"], np.ndarray]
+
+
+class LabelRule(NamedTuple):
+    """依分數區間給予標籤。 (等同 pd.cut)"""
+    column: str
+    source: str
+    bins: Sequence[float]
+    labels: Sequence[Any]
+    right: bool = True
+
+
+class StatusRule(NamedTuple):
+    """依序比對狀態描述，取第一個成立者。 (等同 np.select)"""
+    column: str
+    rules: Dict[str, Condition]
+    default: str
+
+
+class RuleContext:
+    """
+    規則求值環境：提供目前值與前一期值 (shift(1)) 的 numpy 陣列。
+    相同欄位的陣列只會建立一次，供所有規則共用。
+    """
+
+    def __init__(self, df: pd.DataFrame, tail: Optional[int] = None):
+        rows = len(df) if tail is None else min(int(tail), len(df))
+        # 多取一筆，讓第一筆的前一期值仍為真實資料
+        window = df.iloc[-(rows + 1):] if rows < len(df) else df
+        self._window = window
+        self._offset = len(window) - rows
+        self._current: Dict[str, np.ndarray] = {}
+        self._previous: Dict[str, np.ndarray] = {}
+        self.index = window.index[self._offset:]
+
+    def _values(self, name: str) -> np.ndarray:
+        return self._window[name].to_numpy(dtype=float)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name not in self._current:
+            self._current[name] = self._values(name)[self._offset:]
+        return self._current[name]
+
+    def prev(self, name: str) -> np.ndarray:
+        if name not in self._previous:
+            values = self._values(name)
+            shifted = np.empty_like(values)
+            shifted[:1] = np.nan
+            shifted[1:] = values[:-1]
+            self._previous[name] = shifted[self._offset:]
+        return self._previous[name]
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
+class RuleSet:
+    """
+    將規則表編譯成向量化的評分器。
+
+    - 分數欄位依規則順序累加，最後依 score_columns 加總為 total_column
+    - 標籤依分數區間以 np.searchsorted 求得 (與 pd.cut 相同)
+    - 狀態以 np.select 求得
+    """
+
+    def __init__(
+        self,
+        score_rules: Sequence[Any] = (),
+        label_rules: Sequence[LabelRule] = (),
+        status_rules: Sequence[StatusRule] = (),
+        total_column: Optional[str] = None,
+    ):
+        self.score_columns: List[str] = []
+        self._score_rules: Dict[str, List[Any]] = {}
+        for rule in score_rules:
+            if rule.column not in self._score_rules:
+                self.score_columns.append(rule.column)
+                self._score_rules[rule.column] = []
+            self._score_rules[rule.column].append(rule)
+
+        self.total_column = total_column
+        # 預先轉為 numpy，避免每次求值重建
+        self._label_rules = [
+            (rule.column, rule.source, np.asarray(rule.bins, dtype=float),
+             np.asarray(rule.labels, dtype=object), "left" if rule.right else "right")
+            for rule in label_rules
+        ]
+        self._status_rules = [
+            (rule.column, list(rule.rules.values()), list(rule.rules.keys()), rule.default)
+            for rule in status_rules
+        ]
+
+    @staticmethod
+    def _apply_score_rule(rule: Any, ctx: RuleContext) -> np.ndarray:
+        if isinstance(rule, TierRule):
+            conditions = [cond(ctx) for cond, _ in rule.tiers]
+            weights = [weight for _, weight in rule.tiers]
+            return np.select(conditions, weights, default=rule.default)
+        if isinstance(rule, ValueRule):
+            return np.asarray(rule.value(ctx), dtype=float)
+        return np.where(rule.condition(ctx), rule.weight, rule.otherwise)
+
+    def evaluate(self, df: pd.DataFrame, tail: Optional[int] = None) -> pd.DataFrame:
+        """
+        對 DataFrame 求出所有分數、標籤與狀態欄位。
+        Args:
+            df (DataFrame): 含規則所需欄位的資料 (時間由舊到新)
+            tail (int): 僅計算最後 N 筆，預設 None 代表全部
+        Returns:
+            DataFrame: 與 df 最後 N 筆相同 index 的結果欄位
+        """
+        ctx = RuleContext(df, tail=tail)
+        result: Dict[str, np.ndarray] = {}
+
+        for column in self.score_columns:
+            score = np.zeros(len(ctx))
+            for rule in self._score_rules[column]:
+                score += self._apply_score_rule(rule, ctx)
+            result[column] = score
+
+        if self.total_column:
+            total = np.zeros(len(ctx))
+            for column in self.score_columns:
+                total += result[column]
+            result[self.total_column] = total
+
+        for column, source, bins, labels, side in self._label_rules:
+            values = result[source] if source in result else ctx[source]
+            positions = np.searchsorted(bins, values, side=side) - 1
+            result[column] = labels[np.clip(positions, 0, len(labels) - 1)]
+
+        for column, conditions, choices, default in self._status_rules:
+            result[column] = np.select([cond(ctx) for cond in conditions], choices, default=default)
+
+        return pd.DataFrame(result, index=ctx.index)
@@ -0,0 +1,142 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from util.local_db import LocalDB
+
+
+class SentimentAggregate:
+    """
+    每檔股票的新聞情感滾動加權平均，存放於 SQLite。
+
+    - 每篇新聞依發布時間指數衰減加權 (HALF_LIFE_DAYS 天權重減半)，越新的新聞影響越大
+    - 加總值以最新一篇的發布時間為基準，新文章加入時只需調整一次基準，讀取為 O(1)
+    - members: 已計入的新聞 (同一篇不會重複加入)
+    """
+
+    DB_NAME = "newsSentiment.db"
+    HALF_LIFE_DAYS = 3
+    _initialized = False
+    _lock = threading.Lock()
+
+    @classmethod
+    def _conn(cls):
+        conn = LocalDB.connect(cls.DB_NAME)
+        if not cls._initialized:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS sentiment_aggregates (
+                    stock_id TEXT PRIMARY KEY,
+                    ref_time REAL NOT NULL,
+                    weight_sum REAL NOT NULL,
+                    positive_sum REAL NOT NULL,
+                    neutral_sum REAL NOT NULL,
+                    negative_sum REAL NOT NULL,
+                    count INTEGER NOT NULL,
+                    checked_at REAL NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS sentiment_members (
+                    stock_id TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    publish_time REAL NOT NULL,
+                    PRIMARY KEY (stock_id, url)
+                );
+                CREATE INDEX IF NOT EXISTS idx_members_time ON sentiment_members (stock_id, publish_time);
+                """
+            )
+            cls._initialized = True
+        return conn
+
+    @classmethod
+    def _decay(cls, seconds: float) -> float:
+        """經過 seconds 秒後的權重比例。"""
+        return 0.5 ** (seconds / (cls.HALF_LIFE_DAYS * 86400))
+
+    @classmethod
+    def add(cls, stock_id: str, url: str, publish_time: float, positive: float, neutral: float, negative: float) -> bool:
+        """
+        將一篇新聞的分數計入該股票的滾動平均。
+        Args:
+            stock_id (str): 股票代號
+            url (str): 新聞網址
+            publish_time (float): 發布時間戳 (秒)
+            positive, neutral, negative (float): 情感機率
+        Returns:
+            bool: 是否為新加入 (已計入過則回傳 False)
+        """
+        conn = cls._conn()
+        with cls._lock, conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO sentiment_members (stock_id, url, publish_time) VALUES (?, ?, ?)",
+                (stock_id, url, publish_time),
+            ).rowcount
+            if not inserted:
+                return False
+
+            row = conn.execute(
+                "SELECT ref_time, weight_sum, positive_sum, neutral_sum, negative_sum, count FROM sentiment_aggregates WHERE stock_id=?",
+                (stock_id,),
+            ).fetchone()
+            ref_time, weight_sum, pos_sum, neu_sum, neg_sum, count = row if row else (publish_time, 0.0, 0.0, 0.0, 0.0, 0)
+
+            if publish_time > ref_time:
+                # 以較新的時間為基準，既有加總一起衰減
+                scale = cls._decay(publish_time - ref_time)
+                weight_sum, pos_sum, neu_sum, neg_sum = (v * scale for v in (weight_sum, pos_sum, neu_sum, neg_sum))
+                ref_time = publish_time
+            weight = cls._decay(ref_time - publish_time)
+
+            conn.execute(
+                "INSERT OR REPLACE INTO sentiment_aggregates "
+                "(stock_id, ref_time, weight_sum, positive_sum, neutral_sum, negative_sum, count, checked_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE((SELECT checked_at FROM sentiment_aggregates WHERE stock_id=?), 0))",
+                (
+                    stock_id, ref_time,
+                    weight_sum + weight,
+                    pos_sum + weight * positive,
+                    neu_sum + weight * neutral,
+                    neg_sum + weight * negative,
+                    count + 1,
+                    stock_id,
+                ),
+            )
+        return True
+
+    @classmethod
+    def touch(cls, stock_id: str) -> None:
+        """記錄該股票剛檢查過最新新聞。"""
+        conn = cls._conn()
+        with conn:
+            conn.execute("UPDATE sentiment_aggregates SET checked_at=? WHERE stock_id=?", (time.time(), stock_id))
+
+    @classmethod
+    def get(cls, stock_id: str) -> Optional[Dict[str, Any]]:
+        """
+        取得該股票目前的加權平均。
+        Returns:
+            dict: positive / neutral / negative 加權平均、count 篇數、latest 最新新聞時間、checked_at 上次檢查時間；無資料則回傳 None
+        """
+        row = cls._conn().execute(
+            "SELECT ref_time, weight_sum, positive_sum, neutral_sum, negative_sum, count, checked_at FROM sentiment_aggregates WHERE stock_id=?",
+            (stock_id,),
+        ).fetchone()
+        if not row or not row[1]:
+            return None
+        ref_time, weight_sum, pos_sum, neu_sum, neg_sum, count, checked_at = row
+        return {
+            "positive": pos_sum / weight_sum,
+            "neutral": neu_sum / weight_sum,
+            "negative": neg_sum / weight_sum,
+            "count": count,
+            "latest": ref_time,
+            "checked_at": checked_at,
+        }
+
+    @classmethod
+    def recent_urls(cls, stock_id: str, limit: int = 10) -> List[str]:
+        """最近計入的新聞網址 (由新到舊)。"""
+        rows = cls._conn().execute(
+            "SELECT url FROM sentiment_members WHERE stock_id=? ORDER BY publish_time DESC LIMIT ?",
+            (stock_id, limit),
+        ).fetchall()
+        return [url for (url,) in rows]
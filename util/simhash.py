@@ -0,0 +1,84 @@
+"""
+SimHash 文字指紋
+以正規化後內文的字元 n-gram 計算 64 位元指紋，內容相近的文章指紋的漢明距離也小。
+"""
+import hashlib
+import re
+from collections import Counter
+from typing import List
+
+import numpy as np
+
+FINGERPRINT_BITS = 64
+BAND_BITS = 8               # 切成 8 段，漢明距離 <= 7 的指紋至少有一段完全相同
+NGRAM = 3
+
+_NORMALIZE_PATTERN = re.compile(r'[^\u4e00-\u9fa5a-z0-9]')
+
+
+def normalize(text: str) -> str:
+    """移除空白、標點與大小寫差異，只保留中文字、英文字母與數字。"""
+    return _NORMALIZE_PATTERN.sub('', text.lower())
+
+
+def simhash(text: str, ngram: int = NGRAM) -> int:
+    """
+    計算內文的 64 位元 SimHash。
+    Args:
+        text (str): 內文 (未正規化)
+        ngram (int): 字元 n-gram 長度
+    Returns:
+        int: 指紋 (0 ~ 2^64-1)，空白內文回傳 0
+    """
+    text = normalize(text)
+    if not text:
+        return 0
+    shingles = Counter(text[i:i + ngram] for i in range(max(1, len(text) - ngram + 1)))
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+        dtype="<u8", count=len(shingles),
+    )
+    weights = np.fromiter(shingles.values(), dtype=np.int64, count=len(shingles))
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")   # (n, 64)，第 j 欄為第 j 位元
+    votes = weights @ (bits.astype(np.int64) * 2 - 1)
+    return sum(1 << i for i in np.flatnonzero(votes > 0).tolist())
+
+
+def hamming(a: int, b: int) -> int:
+    """兩個指紋的漢明距離。"""
+    return (a ^ b).bit_count()
+
+
+def bands(fingerprint: int) -> List[int]:
+    """
+    將指紋切成 FINGERPRINT_BITS / BAND_BITS 段，供索引查詢候選。
+    每段以 (段號 << BAND_BITS) | 段值 表示，不同段的相同值不會互相命中。
+    """
+    mask = (1 << BAND_BITS) - 1
+    return [(i << BAND_BITS) | ((fingerprint >> (i * BAND_BITS)) & mask) for i in range(FINGERPRINT_BITS // BAND_BITS)]
+
+
+def to_signed(fingerprint: int) -> int:
+    """轉為 SQLite 可存放的有號 64 位元整數。"""
+    return fingerprint - (1 << 64) if fingerprint >= (1 << 63) else fingerprint
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def dedupe(texts: List[str], max_distance: int) -> List[int]:
+    """
+    去除近似重複的內文 (保留先出現者)。
+    Returns:
+        list: 保留的內文位置
+    """
+    kept: List[int] = []
+    kept_fingerprints: List[int] = []
+    for i, text in enumerate(texts):
+        fingerprint = simhash(text)
+        if any(hamming(fingerprint, other) <= max_distance for other in kept_fingerprints):
+            continue
+        kept.append(i)
+        kept_fingerprints.append(fingerprint)
+    return kept
@@ -11,6 +11,7 @@ class StockList:
     TWSE_URL = "https://mopsfin.twse.com.tw/opendata/t187ap03_L.csv"
     TPEX_URL = "https://mopsfin.twse.com.tw/opendata/t187ap03_O.csv"
     _cache: Optional[pd.DataFrame] = None
+    _version: int = 0       # 每次重新下載清單時遞增
 
     @staticmethod
     def _strip_suffix(stock_id: str) -> str:
@@ -53,14 +54,22 @@ class StockList:
         """第一次呼叫時下載並快取，之後直接使用記憶體中的 DataFrame。"""
         if cls._cache is None:
             cls._cache = cls._download()
+            cls._version += 1
         return cls._cache
 
     @classmethod
     def refresh(cls) -> pd.DataFrame:
         """重新下載並覆寫快取。"""
         cls._cache = cls._download()
+        cls._version += 1
         return cls._cache
 
+    @classmethod
+    def version(cls) -> int:
+        """股票清單的版本號，清單重新下載後會改變，可用來判斷衍生的索引是否需要重建。"""
+        cls._ensure_cache()
+        return cls._version
+
     @classmethod
     def get_all(cls) -> pd.DataFrame:
         """取得股票清單副本，避免外部修改快取內容。"""
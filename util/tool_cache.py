@@ -0,0 +1,78 @@
+"""
+AI Agent 工具結果快取 (以對話為單位)
+同一對話中以相同參數重複呼叫工具時，直接回傳先前的結果，不再重新爬取。
+"""
+import json
+from contextvars import ContextVar
+from datetime import time as dt_time
+from functools import wraps
+from typing import Callable, Optional, Union
+
+from util.nowtime import TaiwanTime
+from util.ttl_cache import TTLCache
+
+# 目前執行中的對話 ID (由 ask_AI_Agent / stream_AI_Agent 設定，工具執行時會自動繼承)
+current_session_id: ContextVar[Optional[str]] = ContextVar("current_session_id", default=None)
+
+tool_cache = TTLCache(maxsize=2048, ttl=600)
+
+MARKET_OPEN = dt_time(9, 0)
+MARKET_CLOSE = dt_time(13, 35)
+
+
+def price_ttl() -> int:
+    """盤中報價變動快，只快取 60 秒；收盤後歷史資料不再變動，快取 30 分鐘。"""
+    now = TaiwanTime.now()
+    if now.weekday() < 5 and MARKET_OPEN <= now.time() <= MARKET_CLOSE:
+        return 60
+    return 30 * 60
+
+# 各類資料的快取秒數 (可為函數，呼叫時才決定)
+TOOL_TTL = {
+    "lookup": 24 * 3600,    # 股票代號查詢
+    "price": price_ttl,     # 股價 (含即時報價)
+    "news": 10 * 60,        # 即時爬取的新聞
+    "search": 5 * 60,       # 本地新聞搜尋
+    "etf": 24 * 3600,       # ETF 成分股
+}
+
+
+def _normalize(value):
+    """參數正規化：字串去除空白並統一大小寫，容器遞迴處理。"""
+    if isinstance(value, str):
+        return value.strip().upper()
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in sorted(value.items())}
+    return value
+
+
+def memoize_tool(kind: str, ttl: Union[int, Callable[[], int], None] = None):
+    """
+    工具結果快取裝飾器，鍵為 (對話 ID, 工具名稱, 正規化參數)。
+    沒有對話 ID 或結果為錯誤訊息 ("Error" 開頭) 時不快取。
+    Args:
+        kind (str): 資料類型 (決定快取秒數，見 TOOL_TTL)
+        ttl (int | Callable): 自訂快取秒數，預設依 kind
+    """
+    ttl = TOOL_TTL[kind] if ttl is None else ttl
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            session_id = current_session_id.get()
+            if session_id is None:
+                return await func(*args, **kwargs)
+
+            key = (session_id, func.__name__, json.dumps(_normalize([args, kwargs]), ensure_ascii=False, default=str))
+            cached = tool_cache.get(key)
+            if cached is not None:
+                return cached
+
+            result = await func(*args, **kwargs)
+            if not (isinstance(result, str) and result.startswith("Error")):
+                tool_cache.set(key, result, ttl=ttl() if callable(ttl) else ttl)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,187 @@
+"""
+AI Agent 工具輸出格式化
+將 DataFrame / 新聞轉為精簡的 CSV 式文字，並控制在 token 預算內，降低每回合的輸入 token。
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import pandas as pd
+
+from util.config import Env
+
+# 週K 合併方式 (未列出的欄位取該週最後一筆；多檔股票的欄位為 "代號:欄位")
+WEEKLY_AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+WEEKLY_SUM_COLUMNS = ("外資", "投信", "自營商", "三大法人合計")
+
+_CJK_PATTERN = re.compile(r'[\u3000-\u9fff\uff00-\uffef]')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗估 token 數：中日文字元約 1 token，其餘約 4 字元 1 token。"""
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _format_value(value) -> str:
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    if isinstance(value, float):
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    return str(value)
+
+
+def format_table(df: pd.DataFrame, index_label: str = "Date") -> str:
+    """將 DataFrame 轉為 CSV 式文字 (第一行為欄位名稱)。"""
+    lines = [",".join([index_label, *map(str, df.columns)])]
+    for index, row in zip(df.index, df.itertuples(index=False)):
+        lines.append(",".join([str(index), *(_format_value(v) for v in row)]))
+    return "\n".join(lines)
+
+
+def _sum_or_nan(values: pd.Series) -> float:
+    """整週都沒有資料時保留 NaN (而不是 0)。"""
+    return values.sum(min_count=1)
+
+
+def to_weekly(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    將日資料 (index 為 YYYY-MM-DD) 合併為週資料，index 為該週最後一個交易日。
+    """
+    if df.empty:
+        return df
+    dates = pd.to_datetime(df.index)
+    weeks = dates.to_period("W-FRI")
+    agg = {}
+    for column in df.columns:
+        base = str(column).rsplit(":", 1)[-1]
+        how = WEEKLY_AGG.get(base.capitalize(), "sum" if base in WEEKLY_SUM_COLUMNS else "last")
+        agg[column] = _sum_or_nan if how == "sum" else how
+    weekly = df.groupby(weeks).agg(agg)
+    weekly.index = pd.Series(df.index, index=weeks).groupby(level=0).last().values
+    return weekly
+
+
+def format_price_history(
+    df: pd.DataFrame,
+    columns: Optional[Sequence[str]] = None,
+    max_daily_rows: int = 30,
+    budget: Optional[int] = None,
+) -> str:
+    """
+    精簡股價資料：
+    - 只保留 columns 指定的欄位 (預設全部)
+    - 超過 max_daily_rows 的較早資料改為週K
+    - 仍超過 token 預算時，減少日K筆數，最後捨棄最舊的週K
+    Args:
+        df (DataFrame): 股價資料 (時間由舊到新)
+        columns (list): 保留的欄位 (不分大小寫)
+        max_daily_rows (int): 保留日K的筆數
+        budget (int): token 預算，預設 Env.TOOL_TOKEN_BUDGET
+    Returns:
+        str: CSV 式文字 (週K 段落前有註記)
+    """
+    budget = Env.TOOL_TOKEN_BUDGET if budget is None else budget
+    if columns is not None:
+        wanted = {str(c).lower() for c in columns}
+        df = df[[c for c in df.columns if str(c).lower() in wanted]]
+    if df.empty:
+        return "No data"
+
+    def render(daily_rows: int, weekly_drop: int = 0) -> str:
+        daily = df.iloc[-daily_rows:] if daily_rows else df.iloc[0:0]
+        older = df.iloc[:len(df) - len(daily)]
+        parts = []
+        if not older.empty:
+            weekly = to_weekly(older).iloc[weekly_drop:]
+            if not weekly.empty:
+                parts.append(f"# 週K (日期為該週最後交易日) {weekly.index[0]}~{weekly.index[-1]}")
+                parts.append(format_table(weekly))
+        if not daily.empty:
+            parts.append("# 日K")
+            parts.append(format_table(daily))
+        return "\n".join(parts)
+
+    daily_rows = min(max_daily_rows, len(df))
+    text = render(daily_rows)
+    while estimate_tokens(text) > budget and daily_rows > 5:
+        daily_rows = max(5, daily_rows // 2)
+        text = render(daily_rows)
+
+    weekly_drop = 0
+    weekly_count = len(to_weekly(df.iloc[:len(df) - daily_rows])) if len(df) > daily_rows else 0
+    while estimate_tokens(text) > budget and weekly_drop < weekly_count:
+        weekly_drop += max(1, (weekly_count - weekly_drop) // 4)
+        text = render(daily_rows, min(weekly_drop, weekly_count))
+    return text
+
+
+def align_symbols(frames: Dict[str, pd.DataFrame], columns: Sequence[str]) -> pd.DataFrame:
+    """
+    將多檔股票的資料對齊到同一個日期 index，欄位名稱為 "代號:欄位"。
+    Args:
+        frames (dict): {代號: DataFrame (index 為 YYYY-MM-DD)}
+        columns (list): 每檔保留的欄位 (不分大小寫)
+    Returns:
+        DataFrame: 日期由舊到新，缺值為 NaN
+    """
+    wanted = [str(c).lower() for c in columns]
+    parts = []
+    for symbol, df in frames.items():
+        keep = sorted((c for c in df.columns if str(c).lower() in wanted), key=lambda c: wanted.index(str(c).lower()))
+        part = df[keep].copy()
+        part.columns = [f"{symbol}:{c}" for c in keep]
+        parts.append(part)
+    if not parts:
+        return pd.DataFrame()
+    return pd.concat(parts, axis=1).sort_index()
+
+
+def lead(text: str, max_chars: int) -> str:
+    """取內文開頭 (導言) 至多 max_chars 字，盡量在句號處截斷。"""
+    text = re.sub(r"\s+", " ", text or "").strip()
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    end = max(cut.rfind("。"), cut.rfind("！"), cut.rfind("？"))
+    return (cut[:end + 1] if end >= max_chars // 2 else cut) + "…"
+
+
+def format_articles(
+    articles: Iterable[dict],
+    lead_chars: int = 200,
+    budget: Optional[int] = None,
+    full_text: bool = False,
+) -> str:
+    """
+    將新聞轉為精簡文字：每篇一段「日期 | 標題」加上導言。
+    超過 token 預算時逐步縮短導言，最後捨棄較舊的新聞。
+    Args:
+        articles (list): [{"Date", "Title", "Content"}, ...] (由新到舊)
+        lead_chars (int): 導言字數
+        budget (int): token 預算，預設 Env.TOOL_TOKEN_BUDGET
+        full_text (bool): 是否保留全文 (仍受預算限制)
+    Returns:
+        str: 新聞文字
+    """
+    budget = Env.TOOL_TOKEN_BUDGET if budget is None else budget
+    articles: List[dict] = list(articles)
+    if not articles:
+        return "No news"
+
+    def render(items: List[dict], chars: Optional[int]) -> str:
+        blocks = []
+        for article in items:
+            content = article.get("Content") or ""
+            body = re.sub(r"\s+", " ", content).strip() if chars is None else lead(content, chars)
+            blocks.append(f"{article.get('Date', '')} | {article.get('Title', '')}\n{body}")
+        return "\n\n".join(blocks)
+
+    chars = None if full_text else lead_chars
+    text = render(articles, chars)
+    while estimate_tokens(text) > budget and (chars is None or chars > 60):
+        chars = max(60, (chars or max(len(a.get("Content") or "") for a in articles)) // 2)
+        text = render(articles, chars)
+    while estimate_tokens(text) > budget and len(articles) > 1:
+        articles = articles[:-1]
+        text = render(articles, chars)
+    return text